@@ -1,12 +1,19 @@
 import os
-import psycopg2
-import json
 
-DATABASE_URL = os.getenv("DATABASE_URL")  # Mets l'URL Railway dans tes variables d'environnement
+from utils import db, relational
+from utils.manifest import BackupManifest
+
 DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
 
+UPSERT_SQL = """
+    INSERT INTO json_backups (filename, content)
+    VALUES (%s, %s)
+    ON CONFLICT (filename) DO UPDATE SET content = EXCLUDED.content
+"""
+
 def get_conn():
-    return psycopg2.connect(DATABASE_URL)
+    # Connexion empruntée au pool partagé, validée et rendue à la sortie du bloc
+    return db.connection()
 
 def save_json_file_to_db(filename):
     filepath = os.path.join(DATA_DIR, filename)
@@ -17,18 +24,35 @@ def save_json_file_to_db(filename):
         content = f.read()
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO json_backups (filename, content)
-                VALUES (%s, %s)
-                ON CONFLICT (filename) DO UPDATE SET content = EXCLUDED.content
-            """, (filename, content))
-            conn.commit()
+            cur.execute(UPSERT_SQL, (filename, content))
     print(f"Backup de {filename} effectué.")
 
+def backup_changed_files(filenames, manifest=None):
+    """Envoie en une seule transaction les fichiers dont le contenu a changé."""
+    if manifest is None:
+        manifest = BackupManifest(DATA_DIR)
+    changed, stats = manifest.scan(DATA_DIR, filenames)
+    if changed:
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.executemany(UPSERT_SQL, [(e["filename"], e["content"]) for e in changed])
+    # Le manifeste n'est mis à jour qu'une fois la transaction validée
+    manifest.record(changed)
+    manifest.save()
+    stats["rows_sent"] = len(changed)
+    stats["bytes_sent"] = sum(e["size"] for e in changed)
+    return stats
+
 def main():
     json_files = [f for f in os.listdir(DATA_DIR) if f.endswith('.json')]
-    for filename in json_files:
-        save_json_file_to_db(filename)
+    if relational.is_enabled():
+        # Ces fichiers sont synchronisés ligne par ligne dans leurs tables
+        json_files = [f for f in json_files if not relational.is_relational_file(f)]
+    stats = backup_changed_files(json_files)
+    print(
+        f"Backup terminé : {stats['rows_sent']} fichier(s) envoyé(s) ({stats['bytes_sent']} octets), "
+        f"{stats['rows_skipped']} inchangé(s) ignoré(s) ({stats['bytes_skipped']} octets)."
+    )
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,94 @@
+"""
+Compare les temps de chargement et d'écriture d'un levels.json synthétique.
+
+Usage : python benchmarks/bench_codec.py [nombre_utilisateurs]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import codec  # noqa: E402
+from utils.datastore import DataStore  # noqa: E402
+
+
+def make_levels(users):
+    rng = random.Random(42)
+    return {
+        str(700000000000000000 + i): {"xp": rng.randint(0, 20000), "level": rng.randint(1, 100)}
+        for i in range(users)
+    }
+
+
+def timed(func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    levels = make_levels(users)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "levels.json")
+        hot_path = os.path.join(tmp, codec.HOTSTART_FILENAME)
+        results = []
+
+        def dump_json_indent():
+            with open(path, "w") as f:
+                json.dump(levels, f, indent=2)
+        results.append(("json.dump indent=2", timed(dump_json_indent), os.path.getsize(path)))
+
+        def dump_json():
+            with open(path, "w") as f:
+                json.dump(levels, f)
+        results.append(("json.dump compact", timed(dump_json), os.path.getsize(path)))
+
+        def load_json():
+            with open(path, "r") as f:
+                json.load(f)
+        results.append(("json.load", timed(load_json), os.path.getsize(path)))
+
+        def dump_codec():
+            with open(path, "w") as f:
+                f.write(codec.dumps(levels))
+        results.append((f"codec.dumps ({codec.ENGINE})", timed(dump_codec), os.path.getsize(path)))
+
+        def load_codec():
+            with open(path, "rb") as f:
+                codec.loads(f.read())
+        results.append((f"codec.loads ({codec.ENGINE})", timed(load_codec), os.path.getsize(path)))
+
+        stamp = codec.file_stamp(path)
+        results.append(("hotstart write (marshal)",
+                        timed(lambda: codec.write_hotstart(hot_path, {"levels": (stamp, levels)})),
+                        os.path.getsize(hot_path)))
+        results.append(("hotstart read (marshal)", timed(lambda: codec.read_hotstart(hot_path)),
+                        os.path.getsize(hot_path)))
+
+        # Démarrage complet via le DataStore : JSON puis instantané binaire
+        store = DataStore(tmp)
+        store.register("levels", "levels.json")
+        os.remove(hot_path)
+        results.append(("DataStore.load (JSON)", timed(lambda: DataStore.load(store, "levels"), repeat=1), None))
+        store.save_hotstart()
+        cold = DataStore(tmp)
+        cold.register("levels", "levels.json")
+        results.append(("DataStore.load (hotstart)", timed(lambda: cold.load("levels"), repeat=1), None))
+
+    print(f"levels.json synthétique : {users} utilisateurs")
+    for label, seconds, size in results:
+        size_text = f"{size / 1024:9.0f} Ko" if size is not None else ""
+        print(f"  {label:<28} {seconds * 1000:9.1f} ms {size_text}")
+
+
+if __name__ == "__main__":
+    main()
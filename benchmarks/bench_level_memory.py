@@ -0,0 +1,62 @@
+"""
+Compare la mémoire occupée par les niveaux : ancien dictionnaire global contre table en colonnes.
+
+L'ancien format garde un dictionnaire {"xp", "level"} par membre, indexé par
+l'id en texte ; la table d'un serveur range ids, niveaux et XP dans trois
+tableaux `array`. Mesure faite avec tracemalloc.
+
+Usage : python benchmarks/bench_level_memory.py [nombre_membres]
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.guild_levels import LevelTable  # noqa: E402
+
+
+def make_rows(count):
+    rng = random.Random(42)
+    ids = rng.sample(range(300000000000000000, 1300000000000000000), count)
+    return [(user_id, rng.randint(1, 60), rng.randint(0, 5_000_000)) for user_id in ids]
+
+
+def measure(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    data = build()
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return data, size, elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rows = make_rows(count)
+    legacy, legacy_size, _ = measure(lambda: {str(u): {"xp": x, "level": lv} for u, lv, x in rows})
+    table, table_size, build_time = measure(lambda: LevelTable(1, rows))
+
+    probes = [row[0] for row in random.Random(7).sample(rows, min(count, 100_000))]
+    start = time.perf_counter()
+    for user_id in probes:
+        legacy[str(user_id)]["xp"]
+    legacy_lookup = time.perf_counter() - start
+    start = time.perf_counter()
+    for user_id in probes:
+        table.get(user_id)
+    table_lookup = time.perf_counter() - start
+
+    print(f"{count} membres")
+    print(f"dictionnaire global : {legacy_size / count:6.1f} octets/membre")
+    print(f"table en colonnes   : {table_size / count:6.1f} octets/membre "
+          f"({legacy_size / table_size:.1f}x moins, construite en {build_time:.2f} s)")
+    print(f"lecture : {len(probes) / legacy_lookup:12,.0f}/s (dictionnaire) contre "
+          f"{len(probes) / table_lookup:12,.0f}/s (table)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Mesure la durée des opérations de changement de saison sur une table de niveaux.
+
+Usage : python benchmarks/bench_seasons.py [nombre_membres]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import seasons  # noqa: E402
+from utils.guild_levels import LevelTable  # noqa: E402
+from utils.levels import get_curve  # noqa: E402
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    curve = get_curve("doublement")
+    rng = random.Random(42)
+    rows = []
+    for i in range(count):
+        level = rng.randint(1, 30)
+        rows.append((300000000000000000 + i, level, rng.randrange(curve.xp_for_level(level))))
+    table = LevelTable(1, rows)
+    print(f"{count} membres, NumPy {'présent' if seasons.np is not None else 'absent'}")
+    for operation, value, target in [("decroissance", 0.5, None), ("echelle", 2.0, None),
+                                     ("plancher", 1, None), ("courbe", None, get_curve("quadratique"))]:
+        start = time.perf_counter()
+        result = seasons.transform(table, curve, operation, value, target)
+        elapsed = time.perf_counter() - start
+        print(f"{operation:<13}: {elapsed * 1000:8.1f} ms ({result.changed} niveau(x) modifié(s))")
+
+
+if __name__ == "__main__":
+    main()
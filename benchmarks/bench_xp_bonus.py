@@ -0,0 +1,82 @@
+"""
+Compare le calcul du bonus d'XP par message : parcours des rôles du membre contre cache par membre.
+
+Le parcours reprend l'ancien code de on_message (dictionnaire des paliers
+reconstruit à chaque message, puis une recherche linéaire du type
+discord.utils.get pour chacun des 10 grades et pour le rôle spécial).
+
+Usage : python benchmarks/bench_xp_bonus.py [nombre_messages]
+"""
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.xp import XPBonusCache  # noqa: E402
+
+PALIER_ROLES = {palier: 1417893183903502468 + palier for palier in range(10, 101, 10)}
+SPECIAL_XP_ROLE_ID = 1393303261519417385
+
+
+def get_role(roles, role_id):
+    # Même recherche que discord.utils.get(member.roles, id=role_id)
+    for role in roles:
+        if role.id == role_id:
+            return role
+    return None
+
+
+def make_members(count, roles_per_member=15):
+    rng = random.Random(42)
+    guild = SimpleNamespace(id=1393301496283795640)
+    pool = [SimpleNamespace(id=1400000000000000000 + i) for i in range(200)]
+    grades = [SimpleNamespace(id=role_id) for role_id in PALIER_ROLES.values()]
+    special = SimpleNamespace(id=SPECIAL_XP_ROLE_ID)
+    members = []
+    for i in range(count):
+        roles = rng.sample(pool, roles_per_member) + rng.sample(grades, rng.randint(0, 3))
+        if rng.random() < 0.05:
+            roles.append(special)
+        members.append(SimpleNamespace(id=700000000000000000 + i, guild=guild, roles=roles))
+    return members
+
+
+def bonus_scan(member):
+    palier_roles = dict(PALIER_ROLES)
+    bonus_grade = 0
+    for i, role_id in enumerate(palier_roles.values(), start=1):
+        if get_role(member.roles, role_id):
+            bonus_grade += i
+    has_special = get_role(member.roles, SPECIAL_XP_ROLE_ID) is not None
+    return bonus_grade, has_special
+
+
+def main():
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    members = make_members(500)
+    rng = random.Random(7)
+    authors = [rng.choice(members) for _ in range(messages)]
+    cache = XPBonusCache(PALIER_ROLES, SPECIAL_XP_ROLE_ID)
+    assert all(cache.get(m) == bonus_scan(m) for m in members)
+
+    start = time.perf_counter()
+    for member in authors:
+        bonus_scan(member)
+    scan = time.perf_counter() - start
+
+    cache = XPBonusCache(PALIER_ROLES, SPECIAL_XP_ROLE_ID)
+    start = time.perf_counter()
+    for member in authors:
+        cache.get(member)
+    cached = time.perf_counter() - start
+
+    print(f"{messages} messages, {len(members)} membres")
+    print(f"parcours des rôles : {messages / scan:12,.0f} messages/s")
+    print(f"cache par membre   : {messages / cached:12,.0f} messages/s ({scan / cached:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
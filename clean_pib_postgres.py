@@ -1,11 +1,14 @@
 import os
-import psycopg2
 import json
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+from utils import db
+from utils.manifest import BackupManifest
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
 
 def get_conn():
-    return psycopg2.connect(DATABASE_URL)
+    # Connexion empruntée au pool partagé, validée et rendue à la sortie du bloc
+    return db.connection()
 
 def clean_pib_data():
     """Nettoie les données PIB dans PostgreSQL pour ne garder que la structure PIB pure."""
@@ -24,8 +27,9 @@ def clean_pib_data():
             
             # Supprimer les anciennes données personnel.json si elles existent
             cur.execute("DELETE FROM json_backups WHERE filename = %s", ("personnel.json",))
-            
-            conn.commit()
+    
+    # Les lignes distantes ne correspondent plus aux fichiers locaux : on les oublie du manifeste
+    BackupManifest(DATA_DIR).forget("pib.json", "personnel.json")
     
     print("Nettoyage des données PIB dans PostgreSQL effectué.")
     print("Structure PIB réinitialisée (vide).")
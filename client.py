@@ -1,14 +1,10 @@
-def save_all_json_to_postgres():
-    """Sauvegarde tous les fichiers JSON dans PostgreSQL via backup_json_to_postgres.py."""
-    try:
-        os.system(f"python3 backup_json_to_postgres.py")
-    except Exception as e:
-        print(f"Erreur lors de la sauvegarde PostgreSQL : {e}")
-
 def restore_all_json_from_postgres():
-    """Restaure tous les fichiers JSON depuis PostgreSQL via restore_json_from_postgres.py."""
+    """Restaure les fichiers JSON depuis PostgreSQL, seulement si le dossier de données est vide (nouveau déploiement)."""
     try:
-        os.system(f"python3 restore_json_from_postgres.py")
+        if has_local_data(DATA_DIR):
+            print("Données locales présentes : pas de restauration PostgreSQL.")
+            return
+        restore_all()
     except Exception as e:
         print(f"Erreur lors de la restauration PostgreSQL : {e}")
 import os
@@ -20,23 +16,10 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 import json
-xp_system_status_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "xp_system_status.json")
-def load_xp_system_status():
-    if os.path.exists(xp_system_status_path):
-        with open(xp_system_status_path, 'r') as f:
-            return json.load(f)
-    return {"servers": {}}
-
-def save_xp_system_status(status):
-    with open(xp_system_status_path, 'w') as f:
-        json.dump(status, f, indent=4)
-
-xp_system_status = load_xp_system_status()
 import time
 import datetime
 import asyncio
 import typing
-import random
 import sys
 import atexit
 import signal
@@ -52,6 +35,25 @@ import cartopy.crs as ccrs
 from PIL import Image, ImageDraw, ImageFont # type: ignore
 from dotenv import load_dotenv
 from discord.ext.tasks import loop
+from utils import db
+from utils.pg_sync import PostgresSync
+from restore_json_from_postgres import has_local_data, restore_all
+from utils import relational
+from utils import seasons
+from utils.datastore import DataStore, open_backend
+from utils.journal import TransactionJournal
+from utils.wal import BalanceWAL, TrackedDict
+from utils.ledger import Ledger, CENTRAL_BANK
+from utils.replay import EconomyHistory, ReplayError, loan_key
+from utils.integrity import IntegrityMonitor, check_balance, check_loan
+from utils.xp import XPAccumulator, XPBonusCache, XP_FLUSH_INTERVAL
+from utils.levels import get_curve
+from utils.guild_levels import GuildLevels
+from utils.debts import DebtIndex, loan_debt
+from utils.loan_book import LoanBook
+from utils.pib import PIBTable
+from utils.ranking import PageCache, RankedIndex, amount_key
+from utils.announce import AnnouncementQueue
 
 # Chargement des variables d'environnement
 load_dotenv()
@@ -88,6 +90,22 @@ HELP_VIEW_BOTTOM_URL = "https://cdn.discordapp.com/attachments/14118652910419313
 
 # === Configuration générale du bot ===
 PRIMARY_GUILD_ID = 1393301496283795640
+# Rôles de grade attribués tous les 10 niveaux ; chaque grade possédé donne de l'XP bonus
+PALIER_ROLES = {
+    10: 1417893183903502468,
+    20: 1417893555376230570,
+    30: 1417893729066291391,
+    40: 1417893878136176680,
+    50: 1417894464122261555,
+    60: 1417894846844244139,
+    70: 1417895041862733986,
+    80: 1417895157553958922,
+    90: 1417895282443812884,
+    100: 1417895415273099404
+}
+# Rôle spécial : barème d'XP majoré
+SPECIAL_XP_ROLE_ID = 1393303261519417385
+LEVEL_UP_GIF_URL = "https://cdn.discordapp.com/attachments/1412872314525192233/1417983114390536363/PAX_RUINAE_5.gif?ex=68cc772f&is=68cb25af&hm=f095b505d44febce0e7a8cbf52fea9ac14c79aacaa17762ec66cb4d22ccc6b4d&"
 PERMANENT_STATUS_TEXT = "Gestionne les Nations"
 
 # Chemins des fichiers de données
@@ -106,62 +124,117 @@ PAYS_IMAGES_FILE = os.path.join(DATA_DIR, "pays_images.json")
 MUTE_LOG_FILE = os.path.join(DATA_DIR, "mute_log_channel.json")
 WARNINGS_FILE = os.path.join(DATA_DIR, "warnings.json")
 
-# === XP/LEVEL SYSTEM ===
-LVL_FILE = os.path.join(DATA_DIR, "levels.json")
-LVL_LOG_CHANNEL_FILE = os.path.join(DATA_DIR, "lvl_log_channel.json")
-
-def load_levels():
-    if not os.path.exists(LVL_FILE):
-        with open(LVL_FILE, "w") as f:
-            json.dump({}, f)
-    try:
-        with open(LVL_FILE, "r") as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Erreur lors du chargement des niveaux: {e}")
-        return {}
+# === SYNCHRONISATION POSTGRESQL (écriture différée) ===
+# Intervalle (en secondes) entre deux envois des fichiers modifiés vers PostgreSQL
+PG_SYNC_INTERVAL = int(os.getenv("PG_SYNC_INTERVAL", "30"))
+# PG_RELATIONAL=1 : soldes, niveaux, emprunts, avertissements et transactions sont
+# synchronisés ligne par ligne dans leurs tables au lieu de json_backups
+PG_RELATIONAL = relational.is_enabled()
+pg_sync = PostgresSync(DATA_DIR, exclude=relational.is_relational_file if PG_RELATIONAL else ())
 
-def save_levels(data):
+def save_all_json_to_postgres(*filenames):
+    """Marque les fichiers JSON modifiés pour la prochaine synchronisation PostgreSQL."""
     try:
-        with open(LVL_FILE, "w") as f:
-            json.dump(data, f)
+        pg_sync.mark_dirty(*filenames)
+        if PG_RELATIONAL:
+            rel_sync.mark_dirty(*filenames)
     except Exception as e:
-        print(f"Erreur lors de la sauvegarde des niveaux: {e}")
-
-def load_lvl_log_channel():
-    if not os.path.exists(LVL_LOG_CHANNEL_FILE):
-        with open(LVL_LOG_CHANNEL_FILE, "w") as f:
-            json.dump({}, f)
-    try:
-        with open(LVL_LOG_CHANNEL_FILE, "r") as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Erreur lors du chargement du salon de log lvl: {e}")
-        return {}
+        print(f"Erreur lors de la sauvegarde PostgreSQL : {e}")
 
-def save_lvl_log_channel(data):
-    try:
-        with open(LVL_LOG_CHANNEL_FILE, "w") as f:
-            json.dump(data, f)
-    except Exception as e:
-        print(f"Erreur lors de la sauvegarde du salon de log lvl: {e}")
+# === XP/LEVEL SYSTEM ===
+LVL_FILE = os.path.join(DATA_DIR, "levels.json")
+LVL_LOG_CHANNEL_FILE = os.path.join(DATA_DIR, "lvl_log_channel.json")
 
-levels = load_levels()
-lvl_log_channel_data = load_lvl_log_channel()
+# === STOCKAGE DES DONNÉES ===
+# Chaque fichier JSON est déclaré une seule fois ; la copie en mémoire fait foi
+# et les écritures sont faites hors de la boucle d'événements.
+# DATA_BACKEND=sqlite : collections stockées dans une base SQLite (WAL) au lieu des fichiers JSON
+store = DataStore(DATA_DIR, on_write=save_all_json_to_postgres, backend=open_backend(DATA_DIR))
+# Avec SQLite, les fichiers JSON envoyés vers PostgreSQL sont exportés de la base juste avant l'envoi
+pg_sync.prepare = store.export_json
+
+# Les modifications des soldes sont suivies clé par clé pour le journal (WAL)
+balances = store.register("balances", "balances.json", default=TrackedDict)
+# Partage la copie maîtresse de balances : sert de sauvegarde de secours
+store.register("balances_backup", "balances_backup.json", default=lambda: balances)
+log_channel_data = store.register("log_channel", "log_channel.json")
+message_log_channel_data = store.register("message_log_channel", "message_log_channel.json")
+loans = store.register("loans", "loans.json", default=list)
+pib_data = store.register("pib", "pib.json", create=False, delete_when_empty=True)
+pays_log_channel_data = store.register("pays_log_channel", "pays_log_channel.json")
+pays_images = store.register("pays_images", "pays_images.json")
+mute_log_channel_data = store.register("mute_log_channel", "mute_log_channel.json")
+active_mutes = store.register("active_mutes", "active_mutes.json")
+warnings = store.register("warnings", "warnings.json")
+lvl_log_channel_data = store.register("lvl_log_channel", "lvl_log_channel.json")
+xp_system_status = store.register("xp_system_status", "xp_system_status.json", default=lambda: {"servers": {}}, create=False)
+calendrier_store = store.register("calendrier", "calendrier.json", create=False, delete_when_empty=True)
+invited_ids_data = store.register("invites", "invites.json", default=list, create=False)
+# Comptes système du grand livre (Banque centrale, argent détruit)
+ledger_state = store.register("ledger", "ledger.json")
+# Entrées à revérifier et compteurs du contrôle d'intégrité
+integrity_state = store.register("integrity", "integrity.json")
+
+# Journal des modifications de soldes : balances.json n'est réécrit qu'aux points de contrôle.
+# Le journal reste local (jamais synchronisé vers PostgreSQL).
+BALANCE_WAL_FILE = os.path.join(DATA_DIR, "balances.wal")
+balance_wal = BalanceWAL(BALANCE_WAL_FILE)
+
+# Historique des transactions : journal en ajout seul, segmenté, sans limite de taille
+journal = TransactionJournal(DATA_DIR, on_write=save_all_json_to_postgres)
+
+# Synchronisation ligne par ligne des collections relationnelles (si PG_RELATIONAL=1)
+rel_sync = relational.RelationalSync(store)
+
+def on_ledger_post(record):
+    """Persiste une écriture du grand livre : soldes (WAL), comptes système et copie relationnelle."""
+    save_balances(balances)
+    store.save("ledger")
+    if PG_RELATIONAL:
+        rel_sync.queue_transaction(record)
+
+# Grand livre en partie double : tout mouvement d'argent passe par lui
+ledger = Ledger(balances, ledger_state, journal, on_post=on_ledger_post)
+
+# Instantanés de l'économie et reconstruction par rejeu du journal
+economy_history = EconomyHistory(store, journal, os.path.join(DATA_DIR, "economy_snapshots"))
+
+# Contrôle d'intégrité à l'écriture : seules les entrées en infraction sont revérifiées
+integrity = IntegrityMonitor(integrity_state, on_change=lambda: store.save("integrity"))
+integrity.register("balances", check_balance)
+integrity.register("loans", check_loan, key=loan_key)
+
+# Dette par pays et par demandeur, tenue à jour à chaque enregistrement des emprunts
+debt_index = DebtIndex(loan_key)
+# Emprunts indexés par id, demandeur et prêteur : les modifications de loans passent par lui
+loan_book = LoanBook(loans, loan_key)
+
+# Niveaux par serveur (levels_<guild_id>.json), chargés au premier accès ; l'ancien
+# levels.json global est importé une fois dans la table du serveur principal
+guild_levels = GuildLevels(DATA_DIR, on_write=save_all_json_to_postgres,
+                           legacy_file=LVL_FILE, legacy_guild_id=PRIMARY_GUILD_ID, track_changes=PG_RELATIONAL)
+# Avec PG_RELATIONAL=1, seuls les membres modifiés sont envoyés (table guild_levels)
+rel_sync.guild_levels = guild_levels
+# Gains d'XP des messages : les tables modifiées sont sauvegardées par paquets
+xp_accumulator = XPAccumulator(guild_levels.save_dirty)
+# Bonus d'XP par membre, tenu à jour par les changements de rôles
+xp_bonus_cache = XPBonusCache(PALIER_ROLES, SPECIAL_XP_ROLE_ID)
+# Annonces de niveau regroupées par salon et envoyées en arrière-plan
+level_announcements = AnnouncementQueue()
+
+# Classement trié des soldes, mis à jour à chaque changement (ceux des niveaux sont tenus par guild_levels)
+balance_ranking = RankedIndex(amount_key)
+
+# Courbe de niveaux choisie par LEVEL_CURVE : seuils précalculés une fois
+level_curve = get_curve()
 
 def xp_for_level(level):
-    if level > 100:
-        return None
-    if level <= 1:
-        return 10
-    elif level == 2:
-        return 20
-    else:
-        return 2 * xp_for_level(level - 1)
+    """XP à gagner pour passer au niveau suivant (None au-delà du niveau maximal)."""
+    return level_curve.xp_for_level(level)
 
 def get_progress_bar(xp, level):
     total = xp_for_level(level)
-    percent = int((xp / total) * 100) if total > 0 else 0
+    percent = min(int((xp / total) * 100), 100) if total else 100
     filled = percent // 10
     if percent == 0:
         bar = "<:Barre2_Vide:1417667900596027522>"
@@ -178,43 +251,6 @@ def get_progress_bar(xp, level):
         bar += "<:Barre3_Vide:1417667902471147520>"
     return f"{bar} — {percent}%"
 
-# === WARNING SYSTEM ===
-def load_warnings():
-    if not os.path.exists(WARNINGS_FILE):
-        with open(WARNINGS_FILE, "w") as f:
-            json.dump({}, f)
-    try:
-        with open(WARNINGS_FILE, "r") as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Erreur lors du chargement des avertissements: {e}")
-        return {}
-
-def save_warnings(warnings_data):
-    try:
-        with open(WARNINGS_FILE, "w") as f:
-            json.dump(warnings_data, f, indent=2)
-        # Backup PostgreSQL
-        try:
-            import psycopg2, os
-            DATABASE_URL = os.getenv("DATABASE_URL")
-            if DATABASE_URL:
-                with psycopg2.connect(DATABASE_URL) as conn:
-                    with conn.cursor() as cur:
-                        cur.execute("DELETE FROM json_backups WHERE filename = %s", ("warnings.json",))
-                        with open(WARNINGS_FILE, "r") as f:
-                            content = f.read()
-                        cur.execute("""
-                            INSERT INTO json_backups (filename, content, updated_at)
-                            VALUES (%s, %s, NOW())
-                            ON CONFLICT (filename) DO UPDATE SET content = EXCLUDED.content, updated_at = NOW()
-                        """, ("warnings.json", content))
-                    conn.commit()
-        except Exception as e:
-            print(f"[DEBUG] Erreur sauvegarde PostgreSQL warnings: {e}")
-    except Exception as e:
-        print(f"Erreur lors de la sauvegarde des avertissements: {e}")
-
 # Configuration PIB
 PIB_DEFAULT = 0
 
@@ -275,6 +311,8 @@ class MyBot(commands.Bot):
         # Démarrer les tâches planifiées
         auto_save_economy.start()
         verify_and_fix_balances.start()
+        postgres_sync_task.start()
+        xp_flush_task.start()
         
         print("Bot prêt et tâches planifiées démarrées.")
 
@@ -321,19 +359,7 @@ async def on_guild_join(guild: discord.Guild):
         print(f"[WARN] Échec de synchronisation sur la guild {guild.id} : {exc}")
 
 
-# Variables globales pour les données
-balances = {}
-log_channel_data = {}
-# Variables globales pour les données
-balances = {}
-log_channel_data = {}
-message_log_channel_data = {}
-loans = []
-pib_data = {}
-pays_log_channel_data = {}
-pays_images = {}
-mute_log_channel_data = {}
-warnings = {}
+# Variables globales pour les données (les données persistées sont déclarées dans le DataStore)
 bonus_xp_active = {}  # {guild_id: end_time}
 
 # Chargement des balances et autres données après la définition de la fonction
@@ -349,242 +375,128 @@ def format_number(number):
 # Fonction pour charger toutes les données
 def load_all_data():
     """Charge toutes les données nécessaires au démarrage."""
-    global balances, log_channel_data, message_log_channel_data, loans, pib_data, pays_log_channel_data, pays_images, mute_log_channel_data, warnings
-    
-    # Chargement de toutes les données
-    balances.update(load_balances())
-    log_channel_data.update(load_log_channel())
-    message_log_channel_data.update(load_message_log_channel())
-    loans.extend(load_loans())
-    pib_data.update(load_pib())
-    pays_log_channel_data.update(load_pays_log_channel())
-    pays_images.update(load_pays_images())
-    warnings.update(load_warnings())
-## Fonction de chargement du canal de statut supprimée (obsolète)
-
-def load_pays_images():
-    """Charge les images des pays depuis le fichier."""
-    if not os.path.exists(PAYS_IMAGES_FILE):
-        with open(PAYS_IMAGES_FILE, "w") as f:
-            json.dump({}, f)
-    try:
-        with open(PAYS_IMAGES_FILE, "r") as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Erreur lors du chargement des images de pays: {e}")
-        return {}
-
-def save_pays_images(data):
-    """Sauvegarde les images des pays dans le fichier."""
-    try:
-        with open(PAYS_IMAGES_FILE, "w") as f:
-            json.dump(data, f)
-    except Exception as e:
-        print(f"Erreur lors de la sauvegarde des images de pays: {e}")
-
-
+    store.load_all()
+    load_balances()
+    # Le premier démarrage importe l'ancien transactions.json dans le journal
+    journal.open(legacy_file=TRANSACTION_LOG_FILE)
+    if "opened_seq" not in ledger_state:
+        # Premier démarrage du grand livre : bilan d'ouverture à partir des soldes actuels
+        ledger.open()
+        store.save("ledger")
+    economy_history.track()
+    if economy_history.latest() is None:
+        # Premier instantané : point de départ de toute reconstruction
+        economy_history.snapshot()
+    if not integrity.scanned:
+        # Premier démarrage du contrôle incrémental : un seul parcours complet
+        integrity.full_scan("balances", balances)
+        integrity.full_scan("loans", loans)
+        store.save("integrity")
+    balance_ranking.rebuild(balances)
+    loan_book.rebuild()
+    debt_index.rebuild(loans)
+    converted = pib_table.normalize()
+    if converted:
+        print(f"[PIB] {converted} entrée(s) converties au format {{\"pib\": montant}}")
+        save_pib("normalisation")
+    print("Chargement des données terminé")
 
 def load_balances():
-    """Charge les données des balances depuis le fichier."""
-    balances_data = {}
-    
-    # Essayer de charger le fichier principal
-    try:
-        if os.path.exists(BALANCE_FILE):
-            with open(BALANCE_FILE, "r") as f:
-                balances_data = json.load(f)
-                print(f"Balances chargées depuis {BALANCE_FILE}: {len(balances_data)} entrées")
-    except Exception as e:
-        print(f"Erreur lors du chargement des balances principales: {e}")
-    
-    # Si le fichier principal est vide ou corrompu, essayer le backup
-    if not balances_data and os.path.exists(BALANCE_BACKUP_FILE):
-        try:
-            with open(BALANCE_BACKUP_FILE, "r") as f:
-                balances_data = json.load(f)
-                print(f"Balances restaurées depuis la sauvegarde: {len(balances_data)} entrées")
-        except Exception as e:
-            print(f"Erreur lors du chargement de la sauvegarde des balances: {e}")
-    
-    # Si aucun fichier n'existe, créer un fichier vide
-    if not balances_data:
-        balances_data = {}
-        print("Création d'un nouveau fichier de balances")
-    
-    # Créer les fichiers s'ils n'existent pas
-    if not os.path.exists(BALANCE_FILE):
-        with open(BALANCE_FILE, "w") as f:
-            json.dump(balances_data, f)
-    if not os.path.exists(BALANCE_BACKUP_FILE):
-        with open(BALANCE_BACKUP_FILE, "w") as f:
-            json.dump(balances_data, f)
-    
-    return balances_data
+    """Charge les balances, en se rabattant sur la sauvegarde de secours si besoin."""
+    store.load("balances")
+    if balances:
+        print(f"Balances chargées depuis {BALANCE_FILE}: {len(balances)} entrées")
+    else:
+        # Si le fichier principal est vide ou corrompu, essayer le backup
+        store.load("balances_backup")
+        if balances:
+            print(f"Balances restaurées depuis la sauvegarde: {len(balances)} entrées")
+    # Rejoue les modifications enregistrées depuis le dernier point de contrôle
+    replayed = balance_wal.replay(balances)
+    balances.take_changes()
+    if replayed:
+        print(f"Balances : {replayed} entrée(s) du journal rejouée(s)")
+        checkpoint_balances()
+    return balances
 
 def save_balances(balances_data):
-    """Sauvegarde les balances dans le fichier."""
-    # Sauvegarde principale
-    try:
-        with open(BALANCE_FILE, "w") as f:
-            json.dump(balances_data, f)
-    except Exception as e:
-        print(f"Erreur lors de la sauvegarde des balances: {e}")
-    
-    # Sauvegarde de secours (moins fréquente pour éviter l'usure du disque)
-    if random.random() < 0.2:  # 20% de chance de faire un backup
-        try:
-            with open(BALANCE_BACKUP_FILE, "w") as f:
-                json.dump(balances_data, f)
-        except Exception as e:
-            print(f"Erreur lors de la sauvegarde de secours des balances: {e}")
-
-def load_log_channel():
-    """Charge les données du canal de log."""
-    if not os.path.exists(LOG_FILE):
-        with open(LOG_FILE, "w") as f:
-            json.dump({}, f)
-    try:
-        with open(LOG_FILE, "r") as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Erreur lors du chargement des logs: {e}")
-        return {}
-
-def save_log_channel(data):
-    """Sauvegarde les données du canal de log."""
-    try:
-        with open(LOG_FILE, "w") as f:
-            json.dump(data, f)
-    except Exception as e:
-        print(f"Erreur lors de la sauvegarde des logs: {e}")
-
-def load_message_log_channel():
-    """Charge les données du canal de log des messages."""
-    if not os.path.exists(MESSAGE_LOG_FILE):
-        with open(MESSAGE_LOG_FILE, "w") as f:
-            json.dump({}, f)
-    try:
-        with open(MESSAGE_LOG_FILE, "r") as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Erreur lors du chargement des logs de messages: {e}")
-        return {}
-
-def save_message_log_channel(data):
-    """Sauvegarde les données du canal de log des messages."""
-    try:
-        with open(MESSAGE_LOG_FILE, "w") as f:
-            json.dump(data, f)
-    except Exception as e:
-        print(f"Erreur lors de la sauvegarde des logs de messages: {e}")
-
-def load_loans():
-    """Charge les données des prêts."""
-    if not os.path.exists(LOANS_FILE):
-        with open(LOANS_FILE, "w") as f:
-            json.dump([], f)
-    try:
-        with open(LOANS_FILE, "r") as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Erreur lors du chargement des prêts: {e}")
-        return []
-
-def save_loans(loans_data):
-    """Sauvegarde les données des prêts."""
-    try:
-        with open(LOANS_FILE, "w") as f:
-            json.dump(loans_data, f)
-    except Exception as e:
-        print(f"Erreur lors de la sauvegarde des prêts: {e}")
-
-def load_pib():
-    """Charge les données du PIB."""
-    if not os.path.exists(PIB_FILE):
-        return {}  # Ne crée pas le fichier, retourne juste un dict vide
-    try:
-        with open(PIB_FILE, "r") as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Erreur lors du chargement du PIB: {e}")
-        return {}
-
-def save_pib(pib_data):
-    """Sauvegarde les données du PIB et synchronise avec PostgreSQL."""
-    try:
-        # Si le dictionnaire est vide, supprimer le fichier
-        if not pib_data:
-            if os.path.exists(PIB_FILE):
-                os.remove(PIB_FILE)
-                print("Fichier pib.json supprimé car aucun pays n'a de PIB.")
+    """Enregistre dans le journal les soldes modifiés (le fichier complet est écrit aux points de contrôle)."""
+    if balances_data is not balances:
+        balances.clear()
+        balances.update(balances_data)
+    changed = list(balances.changed)
+    violations = integrity.validate("balances", balances, changed)
+    if violations:
+        print(f"[INTÉGRITÉ] Soldes en infraction, à revérifier : {violations}")
+    for account_id in changed:
+        if account_id in balances:
+            balance_ranking.update(account_id, balances[account_id])
         else:
-            # Créer le fichier seulement s'il y a des données
-            with open(PIB_FILE, "w") as f:
-                json.dump(pib_data, f, indent=2)
-        save_all_json_to_postgres()
-    except Exception as e:
-        print(f"Erreur lors de la sauvegarde du PIB: {e}")
-
-def load_pays_log_channel():
-    """Charge les données du canal de log des pays."""
-    if not os.path.exists(PAYS_LOG_FILE):
-        with open(PAYS_LOG_FILE, "w") as f:
-            json.dump({}, f)
-    try:
-        with open(PAYS_LOG_FILE, "r") as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Erreur lors du chargement du canal de log des pays: {e}")
-        return {}
-
-def save_pays_log_channel(data):
-    """Sauvegarde les données du canal de log des pays."""
-    try:
-        with open(PAYS_LOG_FILE, "w") as f:
-            json.dump(data, f)
-    except Exception as e:
-        print(f"Erreur lors de la sauvegarde du canal de log des pays: {e}")
+            balance_ranking.discard(account_id)
+    balance_wal.append(balances)
 
-## Fonction de sauvegarde du canal de statut supprimée (obsolète)
-
-def log_transaction(from_id, to_id, amount, transaction_type, guild_id):
-    """
-    Journalise une transaction dans l'historique, sans modifier les balances.
-    Les balances sont déjà modifiées par les commandes correspondantes.
-    """
-    transaction = {
-        "from_id": from_id,
-        "to_id": to_id,
-        "amount": amount,
-        "timestamp": int(time.time()),
-        "type": transaction_type,
-        "guild_id": guild_id
-    }
-    
-    # Charger les transactions existantes
-    transactions = []
-    if os.path.exists(TRANSACTION_LOG_FILE):
-        try:
-            with open(TRANSACTION_LOG_FILE, "r") as f:
-                transactions = json.load(f)
-        except json.JSONDecodeError:
-            transactions = []
-    
-    # Ajouter la nouvelle transaction
-    transactions.append(transaction)
-    
-    # Limiter l'historique à 1000 transactions
-    if len(transactions) > 1000:
-        transactions = transactions[-1000:]
-    
-    # Sauvegarder les transactions
+def forget_remote_balance_wal():
+    """Supprime la copie du journal laissée dans json_backups par les versions qui le synchronisaient (une fois, au démarrage)."""
+    if not db.is_enabled():
+        return
+    # Elle serait rejouée à la restauration par-dessus un balances.json plus récent
     try:
-        with open(TRANSACTION_LOG_FILE, "w") as f:
-            json.dump(transactions, f)
+        db.delete_backups(os.path.basename(BALANCE_WAL_FILE))
     except Exception as e:
-        print(f"Erreur lors de la sauvegarde de la transaction: {e}")
-    
-    # Ne PAS modifier les balances ici, car elles sont déjà modifiées par les commandes
+        print(f"[WAL] Suppression du journal distant impossible : {e}")
+
+def checkpoint_balances():
+    """Point de contrôle (appel bloquant, hors de la boucle) : réécrit balances.json et sa sauvegarde, puis vide le journal."""
+    balance_wal.append(balances)
+    if not balance_wal.pending:
+        return 0
+
+    def write_full():
+        store.write("balances")
+        store.write("balances_backup")
+
+    absorbed = balance_wal.checkpoint(write_full)
+    print(f"Point de contrôle des balances : {absorbed} entrée(s) du journal absorbée(s)")
+    return absorbed
+
+# Un seul point de contrôle à la fois depuis la boucle
+balance_checkpoint_lock = asyncio.Lock()
+
+async def checkpoint_balances_async():
+    """Point de contrôle depuis la boucle : soldes sérialisés dans la boucle, fichiers écrits hors de la boucle."""
+    async with balance_checkpoint_lock:
+        balance_wal.append(balances)
+        if not balance_wal.pending:
+            return 0
+        # Copie des soldes puis bascule du journal, sans modification possible entre les deux
+        payloads = {name: store.encode(name) for name in ("balances", "balances_backup")}
+        absorbed = balance_wal.rotate()
+
+        def write_full():
+            for name, payload in payloads.items():
+                store.write(name, payload)
+
+        await bot.loop.run_in_executor(None, balance_wal.complete, absorbed, write_full)
+        print(f"Point de contrôle des balances : {absorbed} entrée(s) du journal absorbée(s)")
+        return absorbed
+
+def save_pib(transaction_type="etat", guild_id=None):
+    """Sauvegarde les données du PIB (le fichier est supprimé si aucun pays n'a de PIB) et les journalise."""
+    store.save("pib")
+    economy_history.record("pib", transaction_type, guild_id)
+
+# PIB par pays : la copie en mémoire fait foi, chaque modification est sauvegardée aussitôt
+pib_table = PIBTable(pib_data, on_change=save_pib)
+
+def save_loans(transaction_type="etat", guild_id=None):
+    """Sauvegarde les emprunts et enregistre leurs changements dans le journal."""
+    store.save("loans")
+    record = economy_history.record("loans", transaction_type, guild_id)
+    if record:
+        debt_index.apply(record["set"], record["del"])
+        violations = integrity.validate("loans", loans, list(record["set"]) + record["del"])
+        if violations:
+            print(f"[INTÉGRITÉ] Emprunts en infraction, à revérifier : {violations}")
 
 # ===== FONCTION DE LOG =====
 
@@ -641,32 +553,46 @@ async def send_mute_log(guild, embed):
 
 @loop(minutes=10)
 async def auto_save_economy():
-    """Sauvegarde automatique de l'économie."""
+    """Sauvegarde automatique de l'économie : point de contrôle du journal des balances et instantané si besoin."""
     try:
-        print("Sauvegarde automatique de l'économie...")
-        save_balances(balances)
+        await checkpoint_balances_async()
+        if economy_history.needs_snapshot():
+            # Copie prise dans la boucle du bot, écriture des blobs hors de la boucle
+            await bot.loop.run_in_executor(None, economy_history.save_snapshot, *economy_history.capture())
     except Exception as e:
         print(f"Erreur lors de la sauvegarde automatique: {e}")
 
+@loop(seconds=PG_SYNC_INTERVAL)
+async def postgres_sync_task():
+    """Envoie vers PostgreSQL les fichiers JSON modifiés depuis le dernier passage."""
+    try:
+        if PG_RELATIONAL and rel_sync.has_pending():
+            # Lignes relevées dans la boucle, envoi hors de la boucle
+            await bot.loop.run_in_executor(None, rel_sync.flush, rel_sync.capture())
+        if pg_sync.has_pending():
+            await bot.loop.run_in_executor(None, pg_sync.flush)
+    except Exception as e:
+        print(f"Erreur lors de la synchronisation PostgreSQL: {e}")
+
+@loop(seconds=XP_FLUSH_INTERVAL)
+async def xp_flush_task():
+    """Sauvegarde les gains d'XP accumulés depuis le dernier passage."""
+    try:
+        xp_accumulator.flush()
+    except Exception as e:
+        print(f"Erreur lors de la sauvegarde des niveaux: {e}")
+
 @loop(hours=12)
 async def verify_and_fix_balances():
     """Vérifie et corrige les balances périodiquement."""
     try:
         print("Vérification périodique des balances...")
         
-        # Recherche des montants anormalement élevés
-        abnormal_balances = {}
-        for role_id, amount in balances.items():
-            if len(role_id) >= 18 and amount > 3000000000:  # Plus de 3 milliards est suspect
-                corrected_amount = amount // 3
-                abnormal_balances[role_id] = (amount, corrected_amount)
-                balances[role_id] = corrected_amount
-        
-        if abnormal_balances:
-            print(f"CORRECTION PÉRIODIQUE: {len(abnormal_balances)} soldes anormalement élevés ont été corrigés")
-            for role_id, (old_amount, new_amount) in abnormal_balances.items():
+        corrections = await check_pending_integrity()
+        if corrections:
+            print(f"CORRECTION PÉRIODIQUE: {len(corrections)} soldes suspects ont été corrigés")
+            for role_id, (old_amount, new_amount) in corrections.items():
                 print(f"  - ID {role_id}: {old_amount} -> {new_amount}")
-            save_balances(balances)
             
     except Exception as e:
         print(f"Erreur lors de la vérification périodique des balances: {e}")
@@ -679,7 +605,15 @@ def signal_handler(sig, frame):
     
     # Sauvegarde des données importantes
     try:
-        save_balances(balances)
+        checkpoint_balances()
+        xp_accumulator.flush()
+        guild_levels.flush()
+        store.flush()
+        store.save_hotstart()
+        journal.close()
+        if PG_RELATIONAL:
+            rel_sync.flush()
+        pg_sync.close()
     except Exception as e:
         print(f"Erreur lors de la sauvegarde finale: {e}")
     
@@ -698,40 +632,77 @@ def exit_handler():
         
         # Sauvegarde des données importantes
         try:
-            save_balances(balances)
+            checkpoint_balances()
+            xp_accumulator.flush()
+            guild_levels.flush()
+            store.flush()
+            store.save_hotstart()
+            journal.close()
+            if PG_RELATIONAL:
+                rel_sync.flush()
+            pg_sync.close()
         except Exception as e:
             print(f"Erreur lors de la sauvegarde finale: {e}")
 
-def verify_economy_data(bot):
-    """Vérifie l'intégrité des données économiques au démarrage."""
+async def correct_balances_from_history(account_ids):
+    """
+    Ramène les soldes suspects à leur valeur reconstruite à partir des instantanés et du journal.
+
+    Un solde négatif que l'historique ne justifie pas est remis à 0. Un solde modifié pendant la
+    reconstruction n'est pas touché (il reste à revérifier). Retourne ({id: (ancien, corrigé)},
+    [ids vérifiés contre l'historique]).
+    """
+    # Valeurs au lancement de la reconstruction, qui se fait hors de la boucle
+    before = {account_id: balances.get(account_id, 0) for account_id in account_ids}
+    try:
+        state, _ = await bot.loop.run_in_executor(None, economy_history.rebuild)
+        expected = state["balances"]
+    except ReplayError as e:
+        print(f"[ÉCONOMIE] Reconstruction impossible, aucune correction : {e}")
+        return {}, []
+    corrections = {}
+    verified = []
+    for account_id, amount in before.items():
+        if balances.get(account_id, 0) != amount:
+            print(f"[ÉCONOMIE] Solde de {account_id} modifié pendant la reconstruction, correction reportée")
+            continue
+        corrected_amount = max(expected.get(account_id, 0), 0)
+        if corrected_amount != amount:
+            corrections[account_id] = (amount, corrected_amount)
+            if not isinstance(amount, (int, float)):
+                # Valeur illisible : le grand livre repart d'un solde nul
+                balances[account_id] = 0
+            ledger.set_balance(account_id, corrected_amount, "correction")
+        verified.append(account_id)
+    return corrections, verified
+
+async def check_pending_integrity():
+    """
+    Revérifie les seules entrées signalées par le contrôle à l'écriture.
+
+    Les soldes toujours en infraction sont corrigés à partir de l'historique ; un dépassement de
+    plafond que l'historique confirme est levé. Retourne {id: (ancien, corrigé)}.
+    """
+    suspects = integrity.recheck("balances", balances)
+    corrections, verified = await correct_balances_from_history(list(suspects)) if suspects else ({}, [])
+    if verified:
+        remaining = integrity.validate("balances", balances, verified)
+        integrity.resolve("balances", [k for k, issues in remaining.items() if set(issues) == {"plafond"}])
+    invalid_loans = integrity.recheck("loans", loans)
+    if invalid_loans:
+        print(f"[INTÉGRITÉ] {len(invalid_loans)} emprunt(s) invalide(s) : {invalid_loans}")
+    store.save("integrity")
+    return corrections
+
+async def verify_economy_data(bot):
+    """Vérifie l'intégrité des données économiques au démarrage (entrées à revérifier uniquement)."""
     print("Vérification des données économiques...")
     
-    # Vérifier les balances négatives
-    negative_balances = {}
-    for entity_id, amount in balances.items():
-        if amount < 0:
-            negative_balances[entity_id] = amount
-            # Correction automatique
-            balances[entity_id] = 0
-    
-    if negative_balances:
-        print(f"AVERTISSEMENT: {len(negative_balances)} soldes négatifs ont été corrigés")
-        save_balances(balances)
-    
-    # Correction des montants anormalement élevés
-    abnormal_balances = {}
-    for role_id, amount in balances.items():
-        # Vérifier si c'est un rôle et non un utilisateur (les IDs de rôle ont généralement 18-19 chiffres)
-        if len(role_id) >= 18 and amount > 3000000000:  # Plus de 3 milliards est suspect
-            # Calcul de la valeur normale (divisé par 3 car semble être triplé)
-            corrected_amount = amount // 3
-            abnormal_balances[role_id] = (amount, corrected_amount)
-            balances[role_id] = corrected_amount
-            print(f"Correction de balance pour ID {role_id}: {amount} -> {corrected_amount}")
-    
-    if abnormal_balances:
-        print(f"AVERTISSEMENT: {len(abnormal_balances)} soldes anormalement élevés ont été corrigés")
-        save_balances(balances)
+    corrections = await check_pending_integrity()
+    for entity_id, (amount, corrected_amount) in corrections.items():
+        print(f"Correction de balance pour ID {entity_id}: {amount} -> {corrected_amount}")
+    if corrections:
+        print(f"AVERTISSEMENT: {len(corrections)} soldes suspects ont été corrigés")
     
     print("Vérification des données économiques terminée")
 
@@ -834,16 +805,16 @@ xp_system_active = False  # Obsolète, remplacé par xp_system_status
 
 @bot.event
 async def on_message(message):
-    global levels, xp_system_status, bonus_xp_active
+    global xp_system_status, bonus_xp_active
     if message.author.bot or not message.guild:
         return
     guild_id = str(message.guild.id)
     if not xp_system_status["servers"].get(guild_id, False):
         await bot.process_commands(message)
         return
-    user_id = str(message.author.id)
-    if user_id not in levels:
-        levels[user_id] = {"xp": 0, "level": 1}
+    user_id = message.author.id
+    table = guild_levels.get(message.guild.id)
+    level, xp = table.ensure(user_id)
     
     # Vérifier si le bonus XP est actif et encore valide
     bonus_active = False
@@ -858,29 +829,9 @@ async def on_message(message):
     # Calcul XP : 1 XP de base + 1 XP tous les 10 caractères
     char_count = len(message.content)
     
-    # Bonus XP par grade acquis
-    palier_roles = {
-        10: 1417893183903502468,
-        20: 1417893555376230570,
-        30: 1417893729066291391,
-        40: 1417893878136176680,
-        50: 1417894464122261555,
-        60: 1417894846844244139,
-        70: 1417895041862733986,
-        80: 1417895157553958922,
-        90: 1417895282443812884,
-        100: 1417895415273099404
-    }
+    # Bonus XP par grade acquis et rôle spécial (lus dans le cache des membres)
     member = message.guild.get_member(message.author.id)
-    bonus_grade = 0
-    if member:
-        for i, role_id in enumerate(palier_roles.values(), start=1):
-            if discord.utils.get(member.roles, id=role_id):
-                bonus_grade += i
-    
-    # Rôle spécial
-    special_role_id = 1393303261519417385
-    has_special = member and discord.utils.get(member.roles, id=special_role_id)
+    bonus_grade, has_special = xp_bonus_cache.get(member) if member else (0, False)
     
     # XP de base
     xp_chair = char_count // 10  # XP chair (1 XP tous les 10 caractères)
@@ -894,81 +845,65 @@ async def on_message(message):
         xp_gain += 3  # +3 XP par message
         xp_gain += (char_count // 10) * 2  # +2 XP tous les 10 caractères (en plus du bonus existant)
     
-    levels[user_id]["xp"] += xp_gain
-    xp = levels[user_id]["xp"]
-    level = levels[user_id]["level"]
+    xp += xp_gain
     next_level_xp = xp_for_level(level)
-    save_levels(levels)
+    new_level = level
+    if next_level_xp is not None and xp >= next_level_xp:
+        new_level = level + 1
+        xp -= next_level_xp
+    # Met aussi à jour le classement du serveur s'il a déjà été consulté
+    table.set(user_id, new_level, xp)
+    # Sauvegarde groupée (minuterie ou seuil) : le message ne touche que la mémoire
+    xp_accumulator.add((message.guild.id, user_id), xp_gain)
+    if new_level > level:
+        # Annonce et rôles de palier en arrière-plan : le traitement de l'XP n'attend aucun appel REST
+        lvl_channel_id = lvl_log_channel_data.get(guild_id)
+        channel = message.guild.get_channel(int(lvl_channel_id)) if lvl_channel_id else None
+        if channel:
+            embed = discord.Embed(
+                description=(
+                    "⠀\n"
+                    f"> ## {message.author.mention} est passé au **niveau {new_level} !** 🎉\n"
+                    "⠀"
+                ),
+                color=0x162e50
+            )
+            embed.set_image(url=LEVEL_UP_GIF_URL)
+            level_announcements.put(channel, ("niveau", user_id), message.author.mention, embed)
+        if member and new_level % 10 == 0 and (new_level // 10) * 10 in PALIER_ROLES:
+            bot.loop.create_task(update_grade_roles(member, new_level, channel))
+
+async def update_grade_roles(member, level, channel):
+    """Attribue le rôle de palier atteint, retire le précédent et annonce le nouveau grade."""
+    palier_roles = PALIER_ROLES
+    palier = (level // 10) * 10
+    new_role = member.guild.get_role(palier_roles[palier])
+    if not new_role:
+        return
     try:
-        save_all_json_to_postgres()
+        await member.add_roles(new_role)
+        # Retrait de l'ancien rôle de palier
+        old_palier = palier - 10
+        if old_palier in palier_roles:
+            old_role = member.guild.get_role(palier_roles[old_palier])
+            if old_role:
+                await member.remove_roles(old_role)
     except Exception as e:
-        print(f"[ERROR] Sauvegarde PostgreSQL après message : {e}")
-    if xp >= next_level_xp:
-        levels[user_id]["level"] += 1
-        levels[user_id]["xp"] = xp - next_level_xp
-        save_levels(levels)
-        try:
-            save_all_json_to_postgres()
-        except Exception as e:
-            print(f"[ERROR] Sauvegarde PostgreSQL après message : {e}")
-        # Gestion des rôles de palier
-        palier_roles = {
-            10: 1417893183903502468,
-            20: 1417893555376230570,
-            30: 1417893729066291391,
-            40: 1417893878136176680,
-            50: 1417894464122261555,
-            60: 1417894846844244139,
-            70: 1417895041862733986,
-            80: 1417895157553958922,
-            90: 1417895282443812884,
-            100: 1417895415273099404
-        }
-        palier = (levels[user_id]["level"] // 10) * 10
-        member = message.guild.get_member(message.author.id)
-        # Ajout du nouveau rôle de palier si atteint
-        if palier in palier_roles and member and levels[user_id]["level"] % 10 == 0:
-                new_role = message.guild.get_role(palier_roles[palier])
-                if new_role:
-                    await member.add_roles(new_role)
-                    # Retrait de l'ancien rôle de palier
-                    old_palier = palier - 10
-                    if old_palier in palier_roles:
-                        old_role = message.guild.get_role(palier_roles[old_palier])
-                        if old_role:
-                            await member.remove_roles(old_role)
-                    # Log d'attribution du rôle (embed stylisé)
-                    lvl_channel_id = lvl_log_channel_data.get(guild_id)
-                    if lvl_channel_id:
-                        channel = message.guild.get_channel(int(lvl_channel_id))
-                        if channel:
-                            await channel.send(f"> − {member.mention}")
-                            embed = discord.Embed(
-                                description=(
-                                    "⠀\n"
-                                    f"> ## {message.author.mention} a obtenu le grade de {new_role.mention} au **niveau {levels[user_id]['level']} !** 🎉\n"
-                                    "⠀"
-                                ),
-                                color=0x162e50
-                            )
-                            embed.set_image(url="https://cdn.discordapp.com/attachments/1412872314525192233/1417983114390536363/PAX_RUINAE_5.gif?ex=68cc772f&is=68cb25af&hm=f095b505d44febce0e7a8cbf52fea9ac14c79aacaa17762ec66cb4d22ccc6b4d&")
-                            await channel.send(embed=embed)
-        # Log passage de niveau (embed stylisé)
-        lvl_channel_id = lvl_log_channel_data.get(guild_id)
-        if lvl_channel_id:
-            channel = message.guild.get_channel(int(lvl_channel_id))
-            if channel:
-                await channel.send(f"> − {message.author.mention}")
-                embed = discord.Embed(
-                    description=(
-                        "⠀\n"
-                        f"> ## {message.author.mention} est passé au **niveau {levels[user_id]['level']} !** 🎉\n"
-                        "⠀"
-                    ),
-                    color=0x162e50
-                )
-                embed.set_image(url="https://cdn.discordapp.com/attachments/1412872314525192233/1417983114390536363/PAX_RUINAE_5.gif?ex=68cc772f&is=68cb25af&hm=f095b505d44febce0e7a8cbf52fea9ac14c79aacaa17762ec66cb4d22ccc6b4d&")
-                await channel.send(embed=embed)
+        print(f"[XP] Mise à jour des rôles de palier impossible pour {member}: {e}")
+        return
+    # Log d'attribution du rôle (embed stylisé)
+    if channel:
+        embed = discord.Embed(
+            description=(
+                "⠀\n"
+                f"> ## {member.mention} a obtenu le grade de {new_role.mention} au **niveau {level} !** 🎉\n"
+                "⠀"
+            ),
+            color=0x162e50
+        )
+        embed.set_image(url=LEVEL_UP_GIF_URL)
+        level_announcements.put(channel, ("grade", str(member.id), new_role.id), member.mention, embed)
+
 # Commande pour ajouter de l'XP à un membre
 
 # ===== COMMANDES DE BASE =====
@@ -977,7 +912,7 @@ async def on_message(message):
 @app_commands.checks.has_permissions(administrator=True)
 async def setlogeconomy(interaction: discord.Interaction, channel: discord.TextChannel):
     log_channel_data[str(interaction.guild.id)] = channel.id
-    save_log_channel(log_channel_data)
+    store.save("log_channel")
     embed = discord.Embed(
         description=f"> Salon de logs défini sur {channel.mention}.{INVISIBLE_CHAR}",
         color=EMBED_COLOR
@@ -991,14 +926,6 @@ def is_valid_image_url(url):
     """Vérifie si l'URL pointe vers une image valide."""
     if not url:
         return False
-    # ...existing code...
-    # Traitement XP, économie, etc. (déjà présent)
-    # Synchronisation automatique PostgreSQL à chaque message
-    try:
-        save_all_json_to_postgres()
-    except Exception as e:
-        print(f"[ERROR] Sauvegarde PostgreSQL après message : {e}")
-    # ...existing code...
     # Vérification simple des extensions d'image communes
     image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp']
     url_lower = url.lower()
@@ -1235,12 +1162,10 @@ async def creer_pays(
                 print(f"[ERROR] Impossible de définir l'emoji comme icône de rôle : {e}")
         # Enregistrement du budget dans balances
         print(f"[DEBUG] Enregistrement du budget pour le pays {role.id} : {budget}")
-        balances[str(role.id)] = budget
-        save_balances(balances)
+        ledger.set_balance(str(role.id), budget, "budget_initial", str(interaction.guild.id))
         
         # Initialisation du PIB
-        pib_data = load_pib()
-        pib_data[str(role.id)] = {"pib": pib}
+        pib_table.set(role.id, pib, "creation_pays", str(interaction.guild.id))
 
         # Positionner le rôle pays juste en dessous du rôle de continent
         try:
@@ -1287,7 +1212,7 @@ async def creer_pays(
         )
         print(f"[DEBUG] Permissions du rôle de pays appliquées")
         pays_log_channel_data[str(role.id)] = channel.id
-        save_pays_log_channel(pays_log_channel_data)
+        store.save("pays_log_channel")
         print(f"[DEBUG] Salon principal créé : {channel.name}")
 
         # Ajout des rôles au dirigeant
@@ -1348,9 +1273,7 @@ async def creer_pays(
         try:
             print("[DEBUG] Sauvegarde des données...")
             save_balances(balances)
-            save_pib(pib_data)
-            save_pays_images(pays_images)
-            save_all_json_to_postgres()
+            store.save("pays_images")
         except Exception as e:
             print(f"[ERROR] Sauvegarde des données : {e}")
 
@@ -1574,7 +1497,7 @@ async def creer_pays(
         )
         print(f"[DEBUG] Permissions du rôle de pays appliquées")
         pays_log_channel_data[str(role.id)] = channel.id
-        save_pays_log_channel(pays_log_channel_data)
+        store.save("pays_log_channel")
         print(f"[DEBUG] Salon principal créé : {channel.name}")
 
         # Ajout des rôles au dirigeant
@@ -1627,9 +1550,7 @@ async def creer_pays(
         try:
             print("[DEBUG] Sauvegarde des données...")
             save_balances(balances)
-            save_pib(pib_data)
-            save_pays_images(pays_images)
-            save_all_json_to_postgres()
+            store.save("pays_images")
         except Exception as e:
             print(f"[ERROR] Sauvegarde des données : {e}")
 
@@ -1699,7 +1620,7 @@ async def creer_pays(
         role_id = str(role.id)
         
         # Attribuer le budget au pays
-        balances[role_id] = budget
+        ledger.set_balance(role_id, budget, "budget_initial", str(interaction.guild.id))
         
         # ID des rôles spéciaux de joueur et non-joueur
         role_joueur_id = 1410289640170328244
@@ -1730,15 +1651,11 @@ async def creer_pays(
             pays_images[role_id] = image
         
         # Initialiser le PIB
-        pib_data[role_id] = {
-            "pib": pib
-        }
+        pib_table.set(role_id, pib, "creation_pays", str(interaction.guild.id))
         
         # Sauvegarder toutes les données
         save_balances(balances)
-        save_pib(pib_data)
-        save_pays_images(pays_images)
-        save_all_json_to_postgres()
+        store.save("pays_images")
         
         # Embed de confirmation
         embed = discord.Embed(
@@ -1851,8 +1768,7 @@ async def modifier_image_pays(
     
     # Enregistrer la nouvelle image
     pays_images[role_id] = image
-    save_pays_images(pays_images)
-    save_all_json_to_postgres()
+    store.save("pays_images")
     
     # Confirmation
     embed = discord.Embed(
@@ -1878,7 +1794,7 @@ async def modifier_image_pays(
 @app_commands.checks.has_permissions(administrator=True)
 async def setlogpays(interaction: discord.Interaction, channel: discord.TextChannel):
     pays_log_channel_data[str(interaction.guild.id)] = channel.id
-    save_pays_log_channel(pays_log_channel_data)
+    store.save("pays_log_channel")
     embed = discord.Embed(
         description=f"> Salon de logs pour les pays défini sur {channel.mention}.{INVISIBLE_CHAR}",
         color=EMBED_COLOR
@@ -1890,62 +1806,113 @@ async def setlogpays(interaction: discord.Interaction, channel: discord.TextChan
 # Commande ranking simplifiée : affiche seulement l'argent total en circulation
 
 # Commande classement : affiche le classement des membres par argent
+# ===== CLASSEMENTS =====
+# Les pages sont rendues à la demande depuis les classements triés et gardées en cache
+# tant que le classement n'a pas changé. Les boutons portent la page visée dans leur
+# custom_id (classement:<classement>:<page>:<sens>) et sont traités par on_interaction :
+# aucune vue n'est gardée en mémoire et ils fonctionnent encore après un redémarrage.
+CLASSEMENT_PER_PAGE = 15
+classement_pages = PageCache(maxsize=128)
+
+def classement_medal(rank):
+    if rank == 1:
+        return "🥇"
+    elif rank == 2:
+        return "🥈"
+    elif rank == 3:
+        return "🥉"
+    return f"{rank}."
+
+def make_classement_eco_embed(guild, page_idx, page_count):
+    start = page_idx * CLASSEMENT_PER_PAGE
+    desc = "⠀\n"
+    for idx, role_id in enumerate(balance_ranking.page(start, CLASSEMENT_PER_PAGE)):
+        role = guild.get_role(int(role_id))
+        if role:
+            desc += f"{classement_medal(start + idx + 1)} {role.mention} — {format_number(balances.get(role_id, 0))} <:PX_MDollars:1417605571019804733>\n"
+    embed = discord.Embed(
+        title="Classement des budgets par pays",
+        description=desc,
+        color=EMBED_COLOR
+    )
+    embed.set_image(url=IMAGE_URL)
+    embed.set_footer(text=f"Page {page_idx+1}/{page_count}")
+    return embed
+
+def make_classement_lvl_embed(guild, page_idx, page_count):
+    start = page_idx * CLASSEMENT_PER_PAGE
+    table = guild_levels.get(guild.id)
+    desc = "⠀\n"
+    for idx, user_id in enumerate(table.ranking().page(start, CLASSEMENT_PER_PAGE)):
+        member = guild.get_member(user_id)
+        if member:
+            desc += f"> {classement_medal(start + idx + 1)} : {member.mention} - **Niveau {table.get(user_id)[0]}**\n"
+    desc += "⠀"
+    embed = discord.Embed(
+        title="🔝 | Classement en Niveaux",
+        description=desc,
+        color=0x162e50
+    )
+    embed.set_image(url="https://cdn.discordapp.com/attachments/1412872314525192233/1417982063839154318/PAX_RUINAE_4.gif?ex=68cc7634&is=68cb24b4&hm=5c7411791192069f1030b0aef0e51be790bb957c288658954070e2cc2f1d862c&")
+    embed.set_thumbnail(url="https://cdn.discordapp.com/attachments/1412872314525192233/1417981197899792565/Sans_titre_1024_x_1024_px_3.png?ex=68cc7566&is=68cb23e6&hm=8e0c7eb0093be4cb173de373bc050949d1efb52fa2e974de8b3dd2acd3b5deaa&")
+    return embed
+
+# Le classement des niveaux est propre à chaque serveur : il est choisi d'après le serveur
+CLASSEMENTS = {
+    "eco": (lambda guild: balance_ranking, make_classement_eco_embed),
+    "lvl": (lambda guild: guild_levels.get(guild.id).ranking(), make_classement_lvl_embed),
+}
+
+def classement_view(board, page_idx, page_count):
+    """Boutons de navigation ; la vue est arrêtée pour ne pas être conservée par discord.py."""
+    view = discord.ui.View(timeout=None)
+    view.add_item(discord.ui.Button(
+        emoji="⬅️", style=discord.ButtonStyle.secondary,
+        custom_id=f"classement:{board}:{page_idx - 1}:prev", disabled=page_idx <= 0
+    ))
+    view.add_item(discord.ui.Button(
+        emoji="➡️", style=discord.ButtonStyle.secondary,
+        custom_id=f"classement:{board}:{page_idx + 1}:next", disabled=page_idx >= page_count - 1
+    ))
+    view.stop()
+    return view
+
+def render_classement(board, guild, page_idx):
+    """(embed, vue) d'une page de classement, rendue ou lue dans le cache."""
+    get_ranking, make_embed = CLASSEMENTS[board]
+    ranking = get_ranking(guild)
+    page_count = max(1, ranking.page_count(CLASSEMENT_PER_PAGE))
+    page_idx = min(max(page_idx, 0), page_count - 1)
+    key = (board, guild.id, page_idx)
+    embed = classement_pages.get(key, ranking.version)
+    if embed is None:
+        embed = make_embed(guild, page_idx, page_count)
+        classement_pages.put(key, ranking.version, embed)
+    return embed, classement_view(board, page_idx, page_count)
+
+@bot.listen("on_interaction")
+async def classement_navigation(interaction: discord.Interaction):
+    """Navigation dans les classements à partir du custom_id des boutons."""
+    if interaction.type != discord.InteractionType.component or interaction.guild is None:
+        return
+    custom_id = (interaction.data or {}).get("custom_id", "")
+    parts = custom_id.split(":")
+    if len(parts) != 4 or parts[0] != "classement" or parts[1] not in CLASSEMENTS:
+        return
+    try:
+        page_idx = int(parts[2])
+    except ValueError:
+        return
+    embed, view = render_classement(parts[1], interaction.guild, page_idx)
+    await interaction.response.edit_message(embed=embed, view=view)
+
 @bot.tree.command(name="classement_eco", description="Affiche le classement des membres par argent")
 async def classement_eco(interaction: discord.Interaction):
-
-    classement = sorted(balances.items(), key=lambda x: x[1], reverse=True)
-    per_page = 15
-    pages = [classement[i:i+per_page] for i in range(0, len(classement), per_page)]
-    def make_embed(page_idx):
-        page = pages[page_idx]
-        desc = "⠀\n"
-        for idx, (role_id, amount) in enumerate(page):
-            rank = idx + 1 + page_idx * per_page
-            if rank == 1:
-                medal = "🥇"
-            elif rank == 2:
-                medal = "🥈"
-            elif rank == 3:
-                medal = "🥉"
-            else:
-                medal = f"{rank}."
-            role = interaction.guild.get_role(int(role_id))
-            if role:
-                desc += f"{medal} {role.mention} — {format_number(amount)} <:PX_MDollars:1417605571019804733>\n"
-        embed = discord.Embed(
-            title="Classement des budgets par pays",
-            description=desc,
-            color=EMBED_COLOR
-        )
-        embed.set_image(url=IMAGE_URL)
-        embed.set_footer(text=f"Page {page_idx+1}/{len(pages)}")
-        return embed
-
-    if not classement:
+    if not len(balance_ranking):
         await interaction.response.send_message("Aucun membre n'a d'argent enregistré.", ephemeral=True)
         return
-
-    class ClassementView(discord.ui.View):
-        def __init__(self, pages):
-            super().__init__(timeout=600)
-            self.pages = pages
-            self.page_idx = 0
-            self.message = None
-
-        @discord.ui.button(emoji="⬅️", style=discord.ButtonStyle.secondary)
-        async def prev(self, interaction_btn: discord.Interaction, button: discord.ui.Button):
-            if self.page_idx > 0:
-                self.page_idx -= 1
-                await interaction_btn.response.edit_message(embed=make_embed(self.page_idx), view=self)
-
-        @discord.ui.button(emoji="➡️", style=discord.ButtonStyle.secondary)
-        async def next(self, interaction_btn: discord.Interaction, button: discord.ui.Button):
-            if self.page_idx < len(self.pages) - 1:
-                self.page_idx += 1
-                await interaction_btn.response.edit_message(embed=make_embed(self.page_idx), view=self)
-
-    view = ClassementView(pages)
-    await interaction.response.send_message(embed=make_embed(0), view=view)
+    embed, view = render_classement("eco", interaction.guild, 0)
+    await interaction.response.send_message(embed=embed, view=view)
 
 
 # Commande /payer : la cible est un rôle (pays) obligatoire, si rien n'est précisé l'argent est détruit (bot), et on ne save pas dans ce cas
@@ -1975,30 +1942,114 @@ async def payer(interaction: discord.Interaction, montant: int, cible: typing.Op
         return
     if cible:
         cible_id = str(cible.id)
-        balances[pays_id] -= montant
-        balances[cible_id] = balances.get(cible_id, 0) + montant
-        print("[DEBUG] Sauvegarde balances.json après paiement...")
-        save_balances(balances)
-        print("[DEBUG] Sauvegarde PostgreSQL après paiement...")
-        save_all_json_to_postgres()
+        ledger.transfer(pays_id, cible_id, montant, "paiement", str(interaction.guild.id))
         embed = discord.Embed(
             description=f"> {format_number(montant)} {MONNAIE_EMOJI} payés de {pays_role.mention} à {cible.mention}.{INVISIBLE_CHAR}",
             color=discord.Color.green()
         )
         await interaction.response.send_message(embed=embed, ephemeral=True)
     else:
-        # Paiement au bot : l'argent est détruit, on ne save pas balances
-        balances[pays_id] -= montant
-        print("[DEBUG] Sauvegarde balances.json après destruction d'argent...")
-        save_balances(balances)
-        print("[DEBUG] Sauvegarde PostgreSQL après destruction d'argent...")
-        save_all_json_to_postgres()
+        # Paiement au bot : l'argent est détruit
+        ledger.destroy(pays_id, montant, "paiement_bot", str(interaction.guild.id))
         embed = discord.Embed(
             description=f"> {format_number(montant)} {MONNAIE_EMOJI} ont été retirés de la circulation depuis {pays_role.mention}.{INVISIBLE_CHAR}",
             color=discord.Color.red()
         )
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
+# Commande d'audit du grand livre
+@bot.tree.command(name="audit_economie", description="Rejoue le grand livre et vérifie les soldes (admin seulement)")
+@app_commands.checks.has_permissions(administrator=True)
+@app_commands.describe(complet="Contrôler aussi l'intégrité de tous les soldes et emprunts, pas seulement ceux signalés")
+async def audit_economie(interaction: discord.Interaction, complet: bool = False):
+    """Rejoue toutes les écritures depuis le dernier bilan d'ouverture et compare aux soldes actuels."""
+    await interaction.response.defer(ephemeral=True)
+    if complet:
+        integrity.full_scan("balances", balances)
+        integrity.full_scan("loans", loans)
+        store.save("integrity")
+    integrity_stats = integrity.stats()
+    # Soldes copiés dans la boucle, historique rejoué hors de la boucle
+    result = await bot.loop.run_in_executor(None, ledger.audit, ledger.capture())
+    discrepancies = result["discrepancies"]
+    ok = not discrepancies and not result["unbalanced"] and not integrity_stats["pending"]
+    description = (
+        f"> − **Écritures rejouées :** {format_number(result['postings'])}\n"
+        f"> − **Monnaie émise (Banque centrale) :** {format_number(-ledger.balance(CENTRAL_BANK))}\n"
+        f"> − **Écarts :** {len(discrepancies)}\n"
+        f"> − **Écritures déséquilibrées :** {len(result['unbalanced'])}\n"
+        f"> − **Contrôles d'intégrité :** {format_number(integrity_stats['counters'].get('controles', 0))}, "
+        f"{format_number(integrity_stats['counters'].get('infractions', 0))} infraction(s)\n"
+        f"> − **Entrées à revérifier :** {sum(integrity_stats['pending'].values())}"
+    )
+    if discrepancies:
+        lines = [
+            f"> `{account}` : attendu {format_number(expected)}, actuel {format_number(actual)}"
+            for account, (expected, actual) in list(discrepancies.items())[:15]
+        ]
+        description += "\n\n" + "\n".join(lines)
+    embed = discord.Embed(
+        title="✅ Grand livre cohérent" if ok else "⚠️ Incohérences dans le grand livre",
+        description=description,
+        color=EMBED_COLOR if ok else discord.Color.orange()
+    )
+    await interaction.followup.send(embed=embed, ephemeral=True)
+
+# Commande de reconstruction de l'économie
+@bot.tree.command(name="reconstruire_economie", description="Reconstruit soldes, emprunts et PIB à une date donnée (admin seulement)")
+@app_commands.checks.has_permissions(administrator=True)
+@app_commands.describe(
+    date="Date de l'état à reconstruire (AAAA-MM-JJ HH:MM), par défaut maintenant",
+    appliquer="Remplacer l'état actuel par l'état reconstruit (sinon simple aperçu)"
+)
+async def reconstruire_economie(interaction: discord.Interaction, date: str = None, appliquer: bool = False):
+    """Rejoue le journal depuis l'instantané le plus proche ; n'applique le résultat que si demandé."""
+    await interaction.response.defer(ephemeral=True)
+    until_time = None
+    if date:
+        try:
+            until_time = int(datetime.datetime.strptime(date, "%Y-%m-%d %H:%M").timestamp())
+        except ValueError:
+            await interaction.followup.send("> Format de date invalide. Utilisez AAAA-MM-JJ HH:MM.", ephemeral=True)
+            return
+    try:
+        state, info = await bot.loop.run_in_executor(None, lambda: economy_history.rebuild(until_time=until_time))
+    except ReplayError as e:
+        await interaction.followup.send(f"> Reconstruction impossible : {e}.", ephemeral=True)
+        return
+    differences = economy_history.compare(state)
+    description = (
+        f"> − **Instantané de départ :** {info['snapshot']}\n"
+        f"> − **Événements rejoués :** {format_number(info['events'])} (jusqu'au n°{info['seq']}, {info['seconds']:.2f} s)\n"
+        f"> − **Soldes différents :** {differences['balances']}\n"
+        f"> − **Emprunts différents :** {differences['loans']}\n"
+        f"> − **PIB différents :** {differences['pib']}"
+    )
+    if appliquer:
+        guild_id = str(interaction.guild.id)
+        balances.clear()
+        balances.update(state["balances"])
+        save_balances(balances)
+        ledger_state["system"] = state["ledger"].get("system", {})
+        ledger.open("reconstruction")
+        store.save("ledger")
+        store.swap({"loans": state["loans"], "pib": state["pib"]})
+        for name in ["loans", "pib"]:
+            economy_history.record(name, "reconstruction", guild_id)
+        if pib_table.normalize():
+            save_pib("reconstruction", guild_id)
+        loan_book.rebuild()
+        debt_index.rebuild(loans)
+        await checkpoint_balances_async()
+        await bot.loop.run_in_executor(None, economy_history.save_snapshot, *economy_history.capture())
+        description += "\n\n> ✅ L'état reconstruit a remplacé l'état actuel."
+    embed = discord.Embed(
+        title="🔁 Reconstruction de l'économie" + ("" if appliquer else " (aperçu)"),
+        description=description,
+        color=EMBED_COLOR
+    )
+    await interaction.followup.send(embed=embed, ephemeral=True)
+
 # Commande pour reset l'économie
 @bot.tree.command(name="reset_economie", description="Réinitialise toute l'économie et supprime l'argent en circulation (admin seulement)")
 @app_commands.checks.has_permissions(administrator=True)
@@ -2015,35 +2066,31 @@ async def reset_economie(interaction: discord.Interaction):
         if interaction2.user.id != interaction.user.id:
             await interaction2.response.send_message("Vous n'êtes pas autorisé à confirmer cette action.", ephemeral=True)
             return
-        # Vider les variables en mémoire
-        global balances, loans
+        # Vider les données en mémoire puis sauvegarder les collections vides
         balances.clear()
-        loans.clear()
+        loan_book.clear()
+        pib_data.clear()
+        removed_segments = journal.clear()
+        ledger.reset()
+        ledger.open()
         # personnel supprimé
-        # Sauvegarder les fichiers vides
-        for file_path, empty_value in [
-            (BALANCE_FILE, {}),
-            (BALANCE_BACKUP_FILE, {}),
-            (LOANS_FILE, []),
-            (PIB_FILE, {}),
-            (TRANSACTION_LOG_FILE, []),
-        ]:
-            try:
-                with open(file_path, "w") as f:
-                    json.dump(empty_value, f)
-            except Exception as e:
-                await interaction2.response.send_message(f"Erreur lors de la suppression de {os.path.basename(file_path)} : {e}", ephemeral=True)
-                return
+        for name in ["loans", "pib", "ledger"]:
+            store.save(name)
+        save_balances(balances)
+        for name in ["loans", "pib"]:
+            economy_history.record(name, "reset_economie", str(interaction.guild.id))
+        debt_index.rebuild(loans)
+        await checkpoint_balances_async()
+        # Nouvel instantané : l'historique effacé ne peut plus être rejoué
+        await bot.loop.run_in_executor(None, economy_history.save_snapshot, *economy_history.capture())
         # Supprimer les données économiques dans PostgreSQL
-        import psycopg2, os
-        DATABASE_URL = os.getenv("DATABASE_URL")
-        if DATABASE_URL:
+        if db.is_enabled():
             try:
-                with psycopg2.connect(DATABASE_URL) as conn:
-                    with conn.cursor() as cur:
-                        for filename in ["balances.json", "balances_backup.json", "loans.json", "transactions.json", "personnel.json"]:
-                            cur.execute("DELETE FROM json_backups WHERE filename = %s", (filename,))
-                    conn.commit()
+                economy_files = ["balances.json", "balances_backup.json", "loans.json", "transactions.json", "personnel.json"] + removed_segments
+                await db.run(db.delete_backups, *economy_files)
+                pg_sync.forget(*economy_files)
+                if PG_RELATIONAL:
+                    await db.run(rel_sync.reset_transactions)
                 print("[DEBUG] Données économiques supprimées de PostgreSQL.")
             except Exception as e:
                 print(f"[DEBUG] Erreur lors de la suppression des données économiques dans PostgreSQL : {e}")
@@ -2084,76 +2131,19 @@ async def balance(interaction: discord.Interaction, role: discord.Role = None):
         return
     role_id = str(role.id)
     montant = balances.get(role_id, 0)
-    print(f"[DEBUG] Balance pour role_id {role_id}: {montant}")
     
     # Récupérer le PIB depuis pib.json
-    pib_data = load_pib()
-    pib = pib_data.get(role_id, {}).get("pib", None)
-    print(f"[DEBUG] PIB pour role_id {role_id}: {pib}")
-    print(f"[DEBUG] PIB data complet: {pib_data}")
-    # Calcul de la dette totale (somme des emprunts avec taux)
-    dette_totale = 0
-    emprunts_trouves = []
-    
-    print(f"[DEBUG] Recherche d'emprunts pour role_id: {role_id}")
-    print(f"[DEBUG] Total emprunts dans la base: {len(loans)}")
-    print(f"[DEBUG] Tous les emprunts: {loans}")
-    
-    # Récupérer tous les membres ayant ce rôle pour identifier les citoyens
-    citoyens_ids = []
-    for member in interaction.guild.members:
-        if any(str(member_role.id) == role_id for member_role in member.roles):
-            citoyens_ids.append(str(member.id))
-    
-    print(f"[DEBUG] Citoyens du pays {role.name} (role_id: {role_id}): {citoyens_ids}")
-    
-    for i, emprunt in enumerate(loans):
-        # Vérifier si l'emprunt concerne ce rôle/pays
-        emprunt_role_id = emprunt.get("role_id")
-        emprunt_demandeur_id = emprunt.get("demandeur_id")
-        
-        print(f"[DEBUG] Emprunt {i}: role_id={emprunt_role_id}, demandeur_id={emprunt_demandeur_id}")
-        
-        # Cas 1: Emprunt fait par le pays lui-même
-        if emprunt_role_id == role_id:
-            principal = emprunt.get("somme", 0)
-            taux = emprunt.get("taux", 0)
-            dette_emprunt = int(principal * (1 + taux / 100))
-            dette_totale += dette_emprunt
-            emprunts_trouves.append({
-                "type": "pays",
-                "principal": principal,
-                "taux": taux,
-                "dette": dette_emprunt
-            })
-            print(f"[DEBUG] ✅ Emprunt du pays trouvé: principal={principal}, taux={taux}, dette={dette_emprunt}")
-        
-        # Cas 2: Emprunt fait par un citoyen auprès de la Banque centrale
-        elif emprunt_role_id is None and emprunt_demandeur_id in citoyens_ids:
-            principal = emprunt.get("somme", 0)
-            taux = emprunt.get("taux", 0)
-            dette_emprunt = int(principal * (1 + taux / 100))
-            dette_totale += dette_emprunt
-            emprunts_trouves.append({
-                "type": "citoyen_banque_centrale",
-                "demandeur": emprunt_demandeur_id,
-                "principal": principal,
-                "taux": taux,
-                "dette": dette_emprunt
-            })
-            print(f"[DEBUG] ✅ Emprunt citoyen Banque centrale trouvé: demandeur={emprunt_demandeur_id}, principal={principal}, taux={taux}, dette={dette_emprunt}")
-    
-    print(f"[DEBUG] Dette totale calculée pour {role_id}: {dette_totale}")
-    print(f"[DEBUG] PIB pour {role_id}: {pib}")
-    print(f"[DEBUG] Nombre d'emprunts trouvés: {len(emprunts_trouves)}")
+    pib = pib_table.get(role_id)
+    # Citoyens relevés une seule fois par pays, puis suivis par on_member_update
+    if not debt_index.is_tracked(role_id):
+        debt_index.track(role_id, [member.id for member in role.members])
+    # Dette totale : emprunts du pays et de ses citoyens auprès de la Banque centrale
+    dette_totale = debt_index.debt(role_id)
     
     # Pourcentage dette/PIB
     pourcentage_pib = 0
     if pib and pib > 0 and dette_totale > 0:
         pourcentage_pib = round((dette_totale / pib) * 100, 2)
-        print(f"[DEBUG] Calcul pourcentage: {dette_totale} / {pib} * 100 = {pourcentage_pib}%")
-    else:
-        print(f"[DEBUG] Pas de calcul de pourcentage: pib={pib}, dette_totale={dette_totale}")
     # Texte formaté
     texte = (
         "⠀\n"
@@ -2193,12 +2183,8 @@ async def add_money(interaction: discord.Interaction, role: discord.Role, montan
     role_id = str(role.id)
     
     if type_argent == "budget":
-        # Ajouter au budget
-        balances[role_id] = balances.get(role_id, 0) + montant
-        print("[DEBUG] Sauvegarde balances.json après ajout d'argent...")
-        save_balances(balances)
-        print("[DEBUG] Sauvegarde PostgreSQL après ajout d'argent...")
-        save_all_json_to_postgres()
+        # Ajouter au budget (création monétaire par la Banque centrale)
+        ledger.issue(role_id, montant, "ajout_argent", str(interaction.guild.id))
         
         embed = discord.Embed(
             description=f"> {format_number(montant)} {MONNAIE_EMOJI} ajoutés au **budget** de {role.mention}. Nouveau solde : {format_number(balances[role_id])} {MONNAIE_EMOJI}.{INVISIBLE_CHAR}",
@@ -2206,16 +2192,10 @@ async def add_money(interaction: discord.Interaction, role: discord.Role, montan
         )
     else:  # PIB
         # Ajouter au PIB
-        if role_id not in pib_data:
-            pib_data[role_id] = PIB_DEFAULT
-        pib_data[role_id] += montant
-        print("[DEBUG] Sauvegarde pib.json après ajout de PIB...")
-        save_pib(pib_data)
-        print("[DEBUG] Sauvegarde PostgreSQL après ajout de PIB...")
-        save_all_json_to_postgres()
+        nouveau_pib = pib_table.add(role_id, montant, PIB_DEFAULT, "ajout_pib", str(interaction.guild.id))
         
         embed = discord.Embed(
-            description=f"> {format_number(montant)} {MONNAIE_EMOJI} ajoutés au **PIB** de {role.mention}. Nouveau PIB : {format_number(pib_data[role_id])} {MONNAIE_EMOJI}.{INVISIBLE_CHAR}",
+            description=f"> {format_number(montant)} {MONNAIE_EMOJI} ajoutés au **PIB** de {role.mention}. Nouveau PIB : {format_number(nouveau_pib)} {MONNAIE_EMOJI}.{INVISIBLE_CHAR}",
             color=discord.Color.green()
         )
     
@@ -2247,12 +2227,8 @@ async def remove_money(interaction: discord.Interaction, role: discord.Role, mon
             await interaction.response.send_message("> Le rôle n'a pas assez d'argent dans son budget.", ephemeral=True)
             return
         
-        nouveau_solde = solde - montant
-        balances[role_id] = nouveau_solde
-        print("[DEBUG] Sauvegarde balances.json après retrait d'argent...")
-        save_balances(balances)
-        print("[DEBUG] Sauvegarde PostgreSQL après retrait d'argent...")
-        save_all_json_to_postgres()
+        ledger.destroy(role_id, montant, "retrait_argent", str(interaction.guild.id))
+        nouveau_solde = ledger.balance(role_id)
         
         embed = discord.Embed(
             description=f"> {format_number(montant)} {MONNAIE_EMOJI} retirés du **budget** de {role.mention}. Nouveau solde : {format_number(nouveau_solde)} {MONNAIE_EMOJI}.{INVISIBLE_CHAR}",
@@ -2260,17 +2236,12 @@ async def remove_money(interaction: discord.Interaction, role: discord.Role, mon
         )
     else:  # PIB
         # Retirer du PIB
-        pib_actuel = pib_data.get(role_id, PIB_DEFAULT)
+        pib_actuel = pib_table.get(role_id, PIB_DEFAULT)
         if montant > pib_actuel:
             await interaction.response.send_message("> Le rôle n'a pas assez d'argent dans son PIB.", ephemeral=True)
             return
         
-        nouveau_pib = pib_actuel - montant
-        pib_data[role_id] = nouveau_pib
-        print("[DEBUG] Sauvegarde pib.json après retrait de PIB...")
-        save_pib(pib_data)
-        print("[DEBUG] Sauvegarde PostgreSQL après retrait de PIB...")
-        save_all_json_to_postgres()
+        nouveau_pib = pib_table.add(role_id, -montant, PIB_DEFAULT, "retrait_pib", str(interaction.guild.id))
         
         embed = discord.Embed(
             description=f"> {format_number(montant)} {MONNAIE_EMOJI} retirés du **PIB** de {role.mention}. Nouveau PIB : {format_number(nouveau_pib)} {MONNAIE_EMOJI}.{INVISIBLE_CHAR}",
@@ -2283,39 +2254,9 @@ async def remove_money(interaction: discord.Interaction, role: discord.Role, mon
 @app_commands.checks.has_permissions(administrator=True)
 async def supprimer_pays(interaction: discord.Interaction, pays: discord.Role, raison: str = None):
     """Supprime un pays, son rôle et son salon."""
-    # Suppression des transactions liées au pays
-    try:
-        import os, json
-        DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
-        transactions_path = os.path.join(DATA_DIR, "transactions.json")
-        with open(transactions_path, "r") as f:
-            transactions = json.load(f)
-        # Filtrer toutes les transactions où le pays supprimé n'est ni source ni destination
-        transactions = [t for t in transactions if str(pays.id) not in (str(t.get("source")), str(t.get("destination")))]
-        with open(transactions_path, "w") as f:
-            json.dump(transactions, f)
-        # Mettre à jour le backup PostgreSQL
-        try:
-            import psycopg2, os
-            DATABASE_URL = os.getenv("DATABASE_URL")
-            if DATABASE_URL:
-                with psycopg2.connect(DATABASE_URL) as conn:
-                    with conn.cursor() as cur:
-                        cur.execute("DELETE FROM json_backups WHERE filename = %s", ("transactions.json",))
-                        with open(transactions_path, "r") as f:
-                            content = f.read()
-                        cur.execute("""
-                            INSERT INTO json_backups (filename, content, updated_at)
-                            VALUES (%s, %s, NOW())
-                            ON CONFLICT (filename) DO UPDATE SET content = EXCLUDED.content, updated_at = NOW()
-                        """, ("transactions.json", content))
-                    conn.commit()
-                print("[DEBUG] Données économiques supprimées de PostgreSQL.")
-        except Exception as e:
-            print(f"[DEBUG] Erreur lors de la suppression des données économiques dans PostgreSQL : {e}")
-    except Exception as e:
-        print(f"[ERROR] Suppression des transactions liées au pays : {e}")
     await interaction.response.defer(ephemeral=True)
+    # Les transactions passées du pays restent dans le journal (ajout seul) ;
+    # la fermeture de son compte est enregistrée plus bas comme une écriture de destruction
     try:
         # Liste des rôles à retirer aux membres du pays
         roles_a_retirer = [
@@ -2398,42 +2339,15 @@ async def supprimer_pays(interaction: discord.Interaction, pays: discord.Role, r
                 pass
         # Nettoyage de l'association
         pays_log_channel_data.pop(str(pays.id), None)
-        save_pays_log_channel(pays_log_channel_data)
+        store.save("pays_log_channel")
         # Suppression de l'argent associé au rôle du pays
         if str(pays.id) in balances:
-            balances.pop(str(pays.id))
+            ledger.close_account(str(pays.id), "suppression_pays", str(interaction.guild.id))
             save_balances(balances)
             
         # Suppression du PIB associé au rôle du pays
-        pib_data = load_pib()
-        if str(pays.id) in pib_data:
-            pib_data.pop(str(pays.id))
-            save_pib(pib_data)
+        pib_table.remove(pays.id, "suppression_pays", str(interaction.guild.id))
             
-            # Suppression dans PostgreSQL
-            try:
-                import psycopg2, os
-                DATABASE_URL = os.getenv("DATABASE_URL")
-                if DATABASE_URL:
-                    with psycopg2.connect(DATABASE_URL) as conn:
-                        with conn.cursor() as cur:
-                            cur.execute("DELETE FROM json_backups WHERE filename = %s", ("balances.json",))
-                            # Réenregistrer balances.json sans le pays supprimé
-                            import json
-                            DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
-                            balances_path = os.path.join(DATA_DIR, "balances.json")
-                            with open(balances_path, "w") as f:
-                                json.dump(balances, f)
-                            with open(balances_path, "r") as f:
-                                content = f.read()
-                            cur.execute("""
-                                INSERT INTO json_backups (filename, content, updated_at)
-                                VALUES (%s, %s, NOW())
-                                ON CONFLICT (filename) DO UPDATE SET content = EXCLUDED.content, updated_at = NOW()
-                            """, ("balances.json", content))
-                        conn.commit()
-            except Exception as err:
-                print(f"[ERROR] Suppression balance pays dans PostgreSQL : {err}")
         # Supprimer le rôle du pays
         await pays.delete(reason=raison or "Suppression du pays")
         # Réponse à l'utilisateur
@@ -2864,7 +2778,7 @@ async def mute(
         "user_id": str(membre.id),
         "unmute_time": unmute_time
     }
-    save_active_mutes(active_mutes)
+    store.save("active_mutes")
     
     print(f"[MUTES] ✅ Mute enregistré: {membre.name} dans {guild.name}, fin prévue: {datetime.datetime.fromtimestamp(unmute_time)}")
     bot.loop.create_task(schedule_unmute(guild.id, membre.id, unmute_time))
@@ -2903,7 +2817,7 @@ async def unmute(interaction: discord.Interaction, membre: discord.Member):
     await send_mute_log(interaction.guild, log_embed)
     # Supprime le mute actif si existant
     active_mutes.pop(f"{interaction.guild.id}:{membre.id}", None)
-    save_active_mutes(active_mutes)
+    store.save("active_mutes")
 
 @bot.tree.command(name="ban", description="Ban un membre du serveur")
 @app_commands.checks.has_permissions(administrator=True)
@@ -2957,30 +2871,6 @@ async def ban(interaction: discord.Interaction, membre: discord.Member, raison:
     )
     await interaction.response.send_message(embed=embed, view=ConfirmBanView(), ephemeral=True)
 
-# === LOG MUTE ===
-MUTE_LOG_FILE = os.path.join(DATA_DIR, "mute_log_channel.json")
-mute_log_channel_data = {}
-
-def load_mute_log_channel():
-    if not os.path.exists(MUTE_LOG_FILE):
-        with open(MUTE_LOG_FILE, "w") as f:
-            json.dump({}, f)
-    try:
-        with open(MUTE_LOG_FILE, "r") as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Erreur lors du chargement du log mute: {e}")
-        return {}
-
-def save_mute_log_channel(data):
-    try:
-        with open(MUTE_LOG_FILE, "w") as f:
-            json.dump(data, f)
-    except Exception as e:
-        print(f"Erreur lors de la sauvegarde du log mute: {e}")
-
-mute_log_channel_data.update(load_mute_log_channel())
-
 @bot.tree.command(name="setpermission_mute", description="Réapplique les permissions du rôle mute sur tous les salons et catégories")
 @app_commands.checks.has_permissions(administrator=True)
 async def setpermission_mute(interaction: discord.Interaction):
@@ -3028,7 +2918,7 @@ async def setpermission_mute(interaction: discord.Interaction):
 @app_commands.checks.has_permissions(administrator=True)
 async def setlogmute(interaction: discord.Interaction, channel: discord.TextChannel):
     mute_log_channel_data[str(interaction.guild.id)] = channel.id
-    save_mute_log_channel(mute_log_channel_data)
+    store.save("mute_log_channel")
     embed = discord.Embed(
         description=f"> Salon de logs mute défini sur {channel.mention}.{INVISIBLE_CHAR}",
         color=EMBED_COLOR
@@ -3036,30 +2926,6 @@ async def setlogmute(interaction: discord.Interaction, channel: discord.TextChan
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 # === GESTION DES MUTES PERSISTANTS ===
-ACTIVE_MUTES_FILE = os.path.join(DATA_DIR, "active_mutes.json")
-
-def load_active_mutes():
-    if not os.path.exists(ACTIVE_MUTES_FILE):
-        with open(ACTIVE_MUTES_FILE, "w") as f:
-            json.dump({}, f)
-    try:
-        with open(ACTIVE_MUTES_FILE, "r") as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Erreur lors du chargement des mutes actifs: {e}")
-        return {}
-
-def save_active_mutes(data):
-    try:
-        with open(ACTIVE_MUTES_FILE, "w") as f:
-            json.dump(data, f, indent=2)
-        # Sauvegarder aussi dans PostgreSQL
-        save_all_json_to_postgres()
-        print(f"[MUTES] Sauvegarde de {len(data)} mutes actifs")
-    except Exception as e:
-        print(f"Erreur lors de la sauvegarde des mutes actifs: {e}")
-
-active_mutes = load_active_mutes()
 
 async def schedule_unmute(guild_id, user_id, unmute_time):
     now = time.time()
@@ -3103,7 +2969,7 @@ async def schedule_unmute(guild_id, user_id, unmute_time):
     
     # Nettoyer le mute actif
     active_mutes.pop(f"{guild_id}:{user_id}", None)
-    save_active_mutes(active_mutes)
+    store.save("active_mutes")
 
 async def restore_mutes_on_start():
     print("[MUTES] Restauration des mutes actifs au démarrage...")
@@ -3139,17 +3005,9 @@ class TriView(discord.ui.View):
 async def id(interaction: discord.Interaction):
     await interaction.response.defer(ephemeral=True)
     guild = interaction.guild
-    invites_path = os.path.join(DATA_DIR, "invites.json")
-    restore_all_json_from_postgres()
     member_ids = [str(member.id) for member in guild.members if not member.bot]
     # Toujours écrire une liste d'IDs, jamais un objet vide
-    if member_ids:
-        with open(invites_path, "w") as f:
-            json.dump(member_ids, f)
-    else:
-        with open(invites_path, "w") as f:
-            json.dump([], f)
-    save_all_json_to_postgres()
+    store.save("invites", member_ids)
     await interaction.followup.send(f"IDs de {len(member_ids)} membres enregistrés dans invites.json.", ephemeral=True)
 
 @bot.tree.command(name="invites", description="Envoie une invitation Discord en MP à tous les membres (admin seulement)")
@@ -3158,12 +3016,7 @@ async def invites(interaction: discord.Interaction):
     await interaction.response.defer(ephemeral=True)
     guild = interaction.guild
     invite_link = "https://discord.gg/paxr"
-    invites_path = os.path.join(DATA_DIR, "invites.json")
-    if os.path.exists(invites_path):
-        with open(invites_path, "r") as f:
-            invited_ids = set(json.load(f))
-    else:
-        invited_ids = set()
+    invited_ids = set(invited_ids_data)
     sent_count = 0
     failed_count = 0
     for member in guild.members:
@@ -3176,9 +3029,7 @@ async def invites(interaction: discord.Interaction):
         except Exception:
             failed_count += 1
     # Sauvegarder les IDs invités
-    with open(invites_path, "w") as f:
-        json.dump(list(invited_ids), f)
-    save_all_json_to_postgres()
+    store.save("invites", list(invited_ids))
     await interaction.followup.send(f"> Invitations envoyées à {sent_count} membres. {failed_count} échecs. Les membres déjà invités ne recevront pas de doublon.", ephemeral=True)
     # The following block seems misplaced and should be removed or integrated properly.
     # If you want to send a message with TriView, you should loop over members again or merge logic.
@@ -3203,51 +3054,39 @@ async def set_lvl(interaction: discord.Interaction):
             "Le système de niveau est déjà actif.", ephemeral=True)
         return
     xp_system_status["servers"][guild_id] = True
-    save_xp_system_status(xp_system_status)
+    store.save("xp_system_status")
     await interaction.response.send_message(
         "Système de niveau activé !", ephemeral=True)
-    save_all_json_to_postgres()
 
 @bot.tree.command(name="set_channel_lvl", description="Définit le salon de log pour les passages de niveau")
 @app_commands.checks.has_permissions(administrator=True)
 async def set_channel_lvl(interaction: discord.Interaction, channel: discord.TextChannel):
     lvl_log_channel_data[str(interaction.guild.id)] = channel.id
-    save_lvl_log_channel(lvl_log_channel_data)
+    store.save("lvl_log_channel")
     await interaction.response.send_message(
         f"Salon de log niveau défini sur {channel.mention}.", ephemeral=True)
 
 @bot.tree.command(name="lvl", description="Affiche votre niveau et progression XP")
 async def lvl(interaction: discord.Interaction):
-    user_id = str(interaction.user.id)
-    if user_id not in levels:
-        levels[user_id] = {"xp": 0, "level": 1}
-        save_levels(levels)
-    xp = levels[user_id]["xp"]
-    level = levels[user_id]["level"]
+    table = guild_levels.get(interaction.guild.id)
+    if interaction.user.id not in table:
+        table.ensure(interaction.user.id)
+        guild_levels.save_dirty()
+    level, xp = table.get(interaction.user.id)
     bar = get_progress_bar(xp, level)
-    percent = int((xp / xp_for_level(level)) * 100) if xp_for_level(level) > 0 else 0
     # Détection du grade de palier
-    palier_roles = {
-        10: 1417893183903502468,
-        20: 1417893555376230570,
-        30: 1417893729066291391,
-        40: 1417893878136176680,
-        50: 1417894464122261555,
-        60: 1417894846844244139,
-        70: 1417895041862733986,
-        80: 1417895157553958922,
-        90: 1417895282443812884,
-        100: 1417895415273099404
-    }
+    palier_roles = PALIER_ROLES
     palier = (level // 10) * 10
     grade = None
     if palier in palier_roles:
         role_obj = interaction.guild.get_role(palier_roles[palier])
         if role_obj and role_obj in interaction.user.roles:
             grade = role_obj.name
+    ranking = table.ranking()
+    rank = ranking.rank(interaction.user.id)
     embed = discord.Embed(
         title=f"Niveau de {interaction.user.display_name}",
-        description=f"⠀\n> − **Niveau :** {level}\n> − **Progression :**\n> {bar}\n" + (f"> − **Grade : {grade}**\n⠀" if grade else "⠀"),
+        description=f"⠀\n> − **Niveau :** {level}\n> − **Classement :** {rank}/{len(ranking)}\n> − **Progression :**\n> {bar}\n" + (f"> − **Grade : {grade}**\n⠀" if grade else "⠀"),
         color=0xebe3bd
     )
     embed.set_image(url="https://zupimages.net/up/21/03/vl8j.png")
@@ -3255,87 +3094,56 @@ async def lvl(interaction: discord.Interaction):
 
 @bot.tree.command(name="classement_lvl", description="Affiche le classement des membres par niveau")
 async def classement_lvl(interaction: discord.Interaction):
-    # Récupérer les 15 meilleurs niveaux
-    classement = sorted(levels.items(), key=lambda x: x[1]["level"], reverse=True)
-    per_page = 15
-    pages = [classement[i:i+per_page] for i in range(0, len(classement), per_page)]
-    def make_embed(page_idx):
-        page = pages[page_idx]
-        desc = "⠀\n"
-        for idx, (user_id, data) in enumerate(page):
-            rank = idx + 1 + page_idx * per_page
-            if rank == 1:
-                medal = "🥇"
-            elif rank == 2:
-                medal = "🥈"
-            elif rank == 3:
-                medal = "🥉"
-            else:
-                medal = f"{rank}."
-            member = interaction.guild.get_member(int(user_id))
-            if member:
-                desc += f"> {medal} : {member.mention} - **Niveau {data['level']}**\n"
-        desc += "⠀"
-        embed = discord.Embed(
-            title="🔝 | Classement en Niveaux",
-            description=desc,
-            color=0x162e50
-        )
-        embed.set_image(url="https://cdn.discordapp.com/attachments/1412872314525192233/1417982063839154318/PAX_RUINAE_4.gif?ex=68cc7634&is=68cb24b4&hm=5c7411791192069f1030b0aef0e51be790bb957c288658954070e2cc2f1d862c&")
-        embed.set_thumbnail(url="https://cdn.discordapp.com/attachments/1412872314525192233/1417981197899792565/Sans_titre_1024_x_1024_px_3.png?ex=68cc7566&is=68cb23e6&hm=8e0c7eb0093be4cb173de373bc050949d1efb52fa2e974de8b3dd2acd3b5deaa&")
-        return embed
-
-    # Récupérer les 15 meilleurs niveaux
-    classement = sorted(levels.items(), key=lambda x: x[1]["level"], reverse=True)
-    per_page = 15
-    pages = [classement[i:i+per_page] for i in range(0, len(classement), per_page)]
-    def make_embed(page_idx):
-        page = pages[page_idx]
-        desc = "⠀\n"
-        for idx, (user_id, data) in enumerate(page):
-            rank = idx + 1 + page_idx * per_page
-            if rank == 1:
-                medal = "🥇"
-            elif rank == 2:
-                medal = "🥈"
-            elif rank == 3:
-                medal = "🥉"
-            else:
-                medal = f"{rank}."
-            member = interaction.guild.get_member(int(user_id))
-            if member:
-                desc += f"> {medal} : {member.mention} - **Niveau {data['level']}**\n"
-        desc += "⠀"
-        embed = discord.Embed(
-            title="🔝 | Classement en Niveaux",
-            description=desc,
-            color=0x162e50
-        )
-        embed.set_image(url="https://cdn.discordapp.com/attachments/1412872314525192233/1417982063839154318/PAX_RUINAE_4.gif?ex=68cc7634&is=68cb24b4&hm=5c7411791192069f1030b0aef0e51be790bb957c288658954070e2cc2f1d862c&")
-        embed.set_thumbnail(url="https://cdn.discordapp.com/attachments/1412872314525192233/1417981197899792565/Sans_titre_1024_x_1024_px_3.png?ex=68cc7566&is=68cb23e6&hm=8e0c7eb0093be4cb173de373bc050949d1efb52fa2e974de8b3dd2acd3b5deaa&")
-        return embed
-
-    class ClassementView(discord.ui.View):
-        def __init__(self, pages):
-            super().__init__(timeout=600)
-            self.pages = pages
-            self.page_idx = 0
-            self.message = None
-
-        @discord.ui.button(emoji="⬅️", style=discord.ButtonStyle.secondary)
-        async def prev(self, interaction_btn: discord.Interaction, button: discord.ui.Button):
-            if self.page_idx > 0:
-                self.page_idx -= 1
-                await interaction_btn.response.edit_message(embed=make_embed(self.page_idx), view=self)
-
-        @discord.ui.button(emoji="➡️", style=discord.ButtonStyle.secondary)
-        async def next(self, interaction_btn: discord.Interaction, button: discord.ui.Button):
-            if self.page_idx < len(self.pages) - 1:
-                self.page_idx += 1
-                await interaction_btn.response.edit_message(embed=make_embed(self.page_idx), view=self)
+    embed, view = render_classement("lvl", interaction.guild, 0)
+    await interaction.response.send_message(embed=embed, view=view)
+
+def format_level_distribution(counts):
+    """Répartition des niveaux par tranche, une ligne par tranche."""
+    if not counts:
+        return "> Aucun membre"
+    return "\n".join(
+        f"> − Niveaux {max(start, 1)}-{start + seasons.DISTRIBUTION_STEP - 1} : {format_number(count)}"
+        for start, count in counts.items()
+    )
 
-    view = ClassementView(pages)
-    await interaction.response.send_message(embed=make_embed(0), view=view)
+@bot.tree.command(name="saison_xp", description="Nouvelle saison : décroissance, mise à l'échelle ou remise à zéro de l'XP (admin seulement)")
+@app_commands.checks.has_permissions(administrator=True)
+@app_commands.describe(
+    operation="Transformation appliquée à l'XP de tous les membres du serveur",
+    valeur="Facteur (décroissance, échelle) ou niveau plancher",
+    appliquer="Appliquer la transformation (sinon simple aperçu)"
+)
+@app_commands.choices(operation=[
+    discord.app_commands.Choice(name="Décroissance (facteur entre 0 et 1)", value="decroissance"),
+    discord.app_commands.Choice(name="Mise à l'échelle (facteur)", value="echelle"),
+    discord.app_commands.Choice(name="Remise à zéro au niveau plancher", value="plancher"),
+])
+async def saison_xp(interaction: discord.Interaction, operation: str, valeur: float, appliquer: bool = False):
+    """Calcule la transformation sur toute la table du serveur ; ne l'applique que si demandé."""
+    table = guild_levels.get(interaction.guild.id)
+    try:
+        result = seasons.transform(table, level_curve, operation, valeur)
+    except seasons.SeasonError as e:
+        await interaction.response.send_message(f"> Opération impossible : {e}.", ephemeral=True)
+        return
+    description = (
+        f"> − **Opération :** {seasons.OPERATIONS[operation]} ({valeur:g})\n"
+        f"> − **Membres :** {format_number(len(table))}\n"
+        f"> − **Niveaux modifiés :** {format_number(result.changed)}\n"
+    )
+    if appliquer:
+        # Colonnes remplacées d'un coup puis fichier réécrit (écriture atomique)
+        seasons.apply(result)
+        guild_levels.save_dirty()
+        description += "\n> ✅ La nouvelle saison est appliquée. Les rôles de palier ne sont pas modifiés."
+    embed = discord.Embed(
+        title="🏁 Changement de saison" + ("" if appliquer else " (aperçu)"),
+        description=description,
+        color=0x162e50
+    )
+    embed.add_field(name="Avant", value=format_level_distribution(result.before), inline=True)
+    embed.add_field(name="Après", value=format_level_distribution(result.after), inline=True)
+    await interaction.response.send_message(embed=embed, ephemeral=True)
 
 
 @bot.tree.command(name="creer_emprunt", description="Crée un emprunt et attribue la somme au demandeur")
@@ -3358,7 +3166,6 @@ async def creer_emprunt(
     
     demandeur_id = str(interaction.user.id)
     role_id = str(role.id) if role else None
-    banque_centrale_id = "BOT"
     
     # Vérification des montants
     if somme <= 0 or taux < 0:
@@ -3367,27 +3174,16 @@ async def creer_emprunt(
     # Vérification du PIB si le demandeur est un pays
     pib = None
     if role:
-        # Récupérer le PIB depuis pib_data
-        pib_data = load_pib()
-        pib_info = pib_data.get(str(role.id), {})
-        pib = pib_info.get("pib", None)
+        # PIB lu dans la copie en mémoire
+        pib = pib_table.get(role.id)
         
         # Si le PIB est trouvé et la somme dépasse 50% du PIB, erreur
         if pib and somme > 0.5 * pib:
             await interaction.followup.send(f"> Erreur : L'emprunt ({format_number(somme)}) dépasse 50% du PIB du pays ({format_number(pib)}). Emprunt refusé pour raison de stabilité économique !", ephemeral=True)
             return
-    # Débit du rôle ou Banque centrale
-    if role:
-        balances[role_id] = balances.get(role_id, 0) - somme
-        debiteur = role.mention
-        print(f"[DEBUG] Débit du pays {role.name} (ID: {role_id}), montant: {somme}")
-    else:
-        debiteur = "Banque centrale"
-        print(f"[DEBUG] Débit de la Banque centrale, montant: {somme}")
-    
-    # Crédit du demandeur
-    balances[demandeur_id] = balances.get(demandeur_id, 0) + somme
-    print(f"[DEBUG] Crédit du demandeur {interaction.user.name} (ID: {demandeur_id}), montant: {somme}")
+    # Débit du rôle ou Banque centrale, crédit du demandeur
+    debiteur = role.mention if role else "Banque centrale"
+    ledger.transfer(role_id or CENTRAL_BANK, demandeur_id, somme, "emprunt", str(interaction.guild.id), check_funds=False)
     # Création de l'emprunt
     emprunt = {
         "id": f"{demandeur_id}-{int(time.time())}",
@@ -3401,22 +3197,14 @@ async def creer_emprunt(
         "date_debut": int(time.time()),
         "remboursements": []
     }
-    loans.append(emprunt)
-    save_loans(loans)
-    save_balances(balances)
+    base_id, n = emprunt["id"], 1
+    while emprunt["id"] in loan_book:
+        # Plusieurs emprunts du même membre dans la même seconde
+        emprunt["id"] = f"{base_id}-{n}"
+        n += 1
+    loan_book.add(emprunt)
+    save_loans("emprunt", str(interaction.guild.id))
     
-    print(f"[DEBUG] Emprunt créé: demandeur={demandeur_id}, role_id={role_id}, somme={somme}, taux={taux}")
-    print(f"[DEBUG] Total emprunts actifs: {len(loans)}")
-    
-    # Log de la transaction
-    log_transaction(
-        from_id=role_id if role else banque_centrale_id,
-        to_id=demandeur_id,
-        amount=somme,
-        transaction_type="emprunt",
-        guild_id=str(interaction.guild.id)
-    )
-    save_all_json_to_postgres()
     # Log embed
     embed = discord.Embed(
         title="💸 | Création d'emprunt",
@@ -3459,8 +3247,8 @@ async def creer_emprunt(
 @bot.tree.command(name="liste_emprunt", description="Affiche la liste de vos emprunts")
 async def liste_emprunt(interaction: discord.Interaction):
     user_id = str(interaction.user.id)
-    # Filtrer les emprunts du joueur
-    emprunts_user = [e for e in loans if e["demandeur_id"] == user_id]
+    # Emprunts du joueur, dans leur ordre de création
+    emprunts_user = loan_book.by_borrower(user_id)
     if not emprunts_user:
         await interaction.response.send_message("> Vous n'avez aucun emprunt en cours.", ephemeral=True)
         return
@@ -3526,7 +3314,7 @@ async def remboursement(
         """
         await interaction.response.defer(ephemeral=True)
         user_id = str(interaction.user.id)
-        emprunts_user = [e for e in loans if e["demandeur_id"] == user_id]
+        emprunts_user = loan_book.by_borrower(user_id)
         if not emprunts_user:
             await interaction.followup.send("> Aucun emprunt trouvé pour vous.", ephemeral=True)
             return
@@ -3534,12 +3322,10 @@ async def remboursement(
             await interaction.followup.send(f"> Numéro d'emprunt invalide. Utilisez /liste_emprunt pour voir vos emprunts.", ephemeral=True)
             return
         emprunt = emprunts_user[numero_emprunt - 1]
-        # Calcul du montant total à rembourser (somme + intérêts)
-        principal = emprunt.get("somme", 0)
-        taux = emprunt.get("taux", 0)
-        total_remboursement = int(principal * (1 + taux / 100))
-        deja_rembourse = sum([r["montant"] for r in emprunt.get("remboursements", [])])
-        restant = total_remboursement - deja_rembourse
+        loan_id = loan_key(emprunt)
+        # Montant total à rembourser (somme + intérêts) et reste tenu à jour par le carnet
+        total_remboursement = loan_debt(emprunt)
+        restant = loan_book.outstanding(loan_id)
         if montant <= 0 or montant > restant:
             await interaction.followup.send(f"> Montant invalide. Il reste à rembourser : {restant} {MONNAIE_EMOJI}.", ephemeral=True)
             return
@@ -3547,28 +3333,18 @@ async def remboursement(
         if balances.get(user_id, 0) < montant:
             await interaction.followup.send(f"> Fonds insuffisants pour le remboursement.", ephemeral=True)
             return
-        balances[user_id] = balances.get(user_id, 0) - montant
-        # Crédit du pays ou destruction
+        # Crédit du pays ou retour à la Banque centrale (argent retiré de la circulation)
+        ledger.transfer(user_id, emprunt["role_id"] or CENTRAL_BANK, montant, "remboursement", str(interaction.guild.id))
         if emprunt["role_id"]:
-            # Créditer le pays
-            balances[emprunt["role_id"]] = balances.get(emprunt["role_id"], 0) + montant
             destinataire = interaction.guild.get_role(int(emprunt["role_id"])).mention if interaction.guild.get_role(int(emprunt["role_id"])) else "Pays inconnu"
         else:
             destinataire = "Banque centrale (argent détruit)"
-        # Mise à jour du remboursement
-        if "remboursements" not in emprunt:
-            emprunt["remboursements"] = []
-        emprunt["remboursements"].append({"montant": montant, "date": int(time.time())})
-        restant_apres = restant - montant
-        
-        # Si l'emprunt est totalement remboursé, le supprimer de la liste
+        # Mise à jour du remboursement ; l'emprunt totalement remboursé est retiré du carnet
+        restant_apres = loan_book.repay(loan_id, montant, int(time.time()))
         if restant_apres <= 0:
-            loans.remove(emprunt)
             print(f"[DEBUG] Emprunt n°{numero_emprunt} totalement remboursé et supprimé")
         
-        save_balances(balances)
-        save_loans(loans)
-        save_all_json_to_postgres()
+        save_loans("remboursement", str(interaction.guild.id))
         
         # Message de confirmation
         if restant_apres <= 0:
@@ -3593,18 +3369,13 @@ async def reset_debt(interaction: discord.Interaction):
     nombre_emprunts = len(loans)
     
     # Calculer le montant total des emprunts
-    montant_total = 0
-    for emprunt in loans:
-        principal = emprunt.get("somme", 0)
-        taux = emprunt.get("taux", 0)
-        montant_total += int(principal * (1 + taux / 100))
+    montant_total = loan_book.total_debt()
     
     # Vider la liste des emprunts
-    loans.clear()
+    loan_book.clear()
     
     # Sauvegarder les changements
-    save_loans(loans)
-    save_all_json_to_postgres()
+    save_loans("reset_debt", str(interaction.guild.id))
     
     # Log de l'action
     embed_log = discord.Embed(
@@ -3698,6 +3469,11 @@ async def on_ready():
     await restore_mutes_on_start()
     await verify_economy_data(bot)
 
+    # Citoyens des pays (rôles ayant un solde) relevés en un seul passage par serveur
+    for connected_guild in bot.guilds:
+        country_roles = [r.id for r in connected_guild.roles if str(r.id) in balances]
+        debt_index.track_all(country_roles, ((m.id, [r.id for r in m.roles]) for m in connected_guild.members))
+
     guild = bot.get_guild(PRIMARY_GUILD_ID)
     if guild:
         await update_stats_voice_channels(guild)
@@ -3705,11 +3481,21 @@ async def on_ready():
     if not update_stats_voice_channels_periodically.is_running():
         update_stats_voice_channels_periodically.start()
 
-    calendrier_data = load_calendrier()
+    calendrier_data = store.get("calendrier")
     if calendrier_data and calendrier_data["mois_index"] < len(CALENDRIER_MONTHS):
         if not calendrier_update_task.is_running():
             calendrier_update_task.start()
 
+@bot.event
+async def on_member_remove(member):
+    """Oublie le bonus d'XP et la citoyenneté d'un membre qui quitte le serveur."""
+    xp_bonus_cache.evict(member.guild.id, member.id)
+    debt_index.remove_member(member.id, [role.id for role in member.roles])
+
+@bot.event
+async def on_guild_role_delete(role):
+    debt_index.forget(role.id)
+
 # === Mise à jour dynamique des salons vocaux de stats ===
 @bot.event
 async def on_member_update(before, after):
@@ -3720,6 +3506,8 @@ async def on_member_update(before, after):
         return
     before_roles = set(r.id for r in before.roles)
     after_roles = set(r.id for r in after.roles)
+    xp_bonus_cache.update(after, before_roles, after_roles)
+    debt_index.update_member(after.id, before_roles, after_roles)
     if WELCOME_ROLE_ID not in before_roles and WELCOME_ROLE_ID in after_roles:
         channel = guild.get_channel(WELCOME_CHANNEL_ID)
         if channel:
@@ -3824,7 +3612,6 @@ async def guide(interaction: discord.Interaction):
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 # === CALENDRIER RP ===
-CALENDRIER_FILE = os.path.join(DATA_DIR, "calendrier.json")
 CALENDRIER_CHANNEL_ID = 1419301872996712458
 CALENDRIER_IMAGE_URL = "https://zupimages.net/up/21/03/vl8j.png"
 CALENDRIER_COLOR = 0x162e50
@@ -3833,20 +3620,6 @@ CALENDRIER_MONTHS = [
     "Janvier", "Février", "Mars", "Avril", "Mai", "Juin", "Juillet", "Août", "Septembre", "Octobre", "Novembre", "Décembre"
 ]
 
-def load_calendrier():
-    if os.path.exists(CALENDRIER_FILE):
-        with open(CALENDRIER_FILE, "r") as f:
-            return json.load(f)
-    return None
-
-def save_calendrier(data):
-    with open(CALENDRIER_FILE, "w") as f:
-        json.dump(data, f)
-
-def reset_calendrier():
-    if os.path.exists(CALENDRIER_FILE):
-        os.remove(CALENDRIER_FILE)
-
 from discord.ext.tasks import loop
 import pytz
 import datetime
@@ -3856,7 +3629,7 @@ import datetime
 @app_commands.checks.has_permissions(administrator=True)
 async def calendrier(interaction: discord.Interaction, annee: int):
     # Initialisation ou reprise
-    calendrier_data = load_calendrier()
+    calendrier_data = store.get("calendrier")
     if calendrier_data:
         await interaction.response.send_message(f"> Un calendrier est déjà en cours pour l'année {calendrier_data['annee']} ! Utilisez /reset-calendrier pour recommencer.", ephemeral=True)
         return
@@ -3867,7 +3640,7 @@ async def calendrier(interaction: discord.Interaction, annee: int):
         "last_update": None,
         "messages": []
     }
-    save_calendrier(calendrier_data)
+    store.save("calendrier", calendrier_data)
     await interaction.response.send_message(f"> Calendrier RP lancé pour l'année {annee}. Mise à jour chaque jour à minuit (heure Paris).", ephemeral=True)
     calendrier_update_task.start()
 
@@ -3880,7 +3653,7 @@ async def reset_calendrier_cmd(interaction: discord.Interaction):
     if calendrier_update_task.is_running():
         calendrier_update_task.stop()
     # Supprime les messages précédemment envoyés
-    calendrier_data = load_calendrier()
+    calendrier_data = store.get("calendrier")
     deleted_count = 0
     channel = bot.get_channel(CALENDRIER_CHANNEL_ID)
     message_ids = []
@@ -3920,20 +3693,14 @@ async def reset_calendrier_cmd(interaction: discord.Interaction):
             await delete_message(int(mid))
 
     # Supprime le fichier calendrier.json
-    reset_calendrier()
+    store.save("calendrier", {})
 
     # Supprime également la sauvegarde PostgreSQL pour éviter une restauration au redémarrage
     remote_deleted = False
-    DATABASE_URL = os.getenv("DATABASE_URL")
-    if DATABASE_URL:
+    if db.is_enabled():
         try:
-            import psycopg2  # type: ignore
-
-            with psycopg2.connect(DATABASE_URL) as conn:
-                with conn.cursor() as cur:
-                    cur.execute("DELETE FROM json_backups WHERE filename = %s", ("calendrier.json",))
-                    remote_deleted = cur.rowcount > 0
-                conn.commit()
+            remote_deleted = await db.run(db.delete_backups, "calendrier.json") > 0
+            pg_sync.forget("calendrier.json")
         except Exception as e:
             print(f"[DEBUG] Échec suppression calendrier.json dans PostgreSQL : {e}")
 
@@ -4285,7 +4052,7 @@ async def help_command(interaction: discord.Interaction):
 
 @loop(minutes=1)
 async def calendrier_update_task():
-    calendrier_data = load_calendrier()
+    calendrier_data = store.get("calendrier")
     if not calendrier_data:
         calendrier_update_task.stop()
         return
@@ -4330,7 +4097,7 @@ async def calendrier_update_task():
         calendrier_data["jour_index"] = 0
         calendrier_data["mois_index"] += 1
     calendrier_data["last_update"] = now.isoformat()
-    save_calendrier(calendrier_data)
+    store.save("calendrier", calendrier_data)
     # Stop si Décembre 2/2 passé
     if calendrier_data["mois_index"] >= len(CALENDRIER_MONTHS):
         calendrier_update_task.stop()
@@ -4370,7 +4137,7 @@ async def warn(interaction: discord.Interaction, utilisateur: discord.Member, ra
     warnings[guild_id][user_id]["next_id"] += 1
     
     # Sauvegarder
-    save_warnings(warnings)
+    store.save("warnings")
     
     # Créer l'embed de confirmation
     embed = discord.Embed(
@@ -4499,7 +4266,7 @@ async def remove_warn(interaction: discord.Interaction, utilisateur: discord.Mem
     
     # Supprimer l'avertissement
     warnings[guild_id][user_id]["warns"].pop(warn_index)
-    save_warnings(warnings)
+    store.save("warnings")
     
     # Créer l'embed de confirmation
     embed = discord.Embed(
@@ -4953,18 +4720,11 @@ async def creer_webhook(interaction: discord.Interaction, nom: str, avatar: disc
         print(f"[ERROR] Erreur dans la commande creer_webhook: {e}")
 
 if __name__ == "__main__":
-    # Toujours restaurer les fichiers JSON depuis PostgreSQL avant tout chargement local
+    # Nouveau déploiement (dossier de données vide) : restauration depuis PostgreSQL avant tout chargement
     restore_all_json_from_postgres()
-    # Recharge l'état XP après restauration
-    xp_system_status = load_xp_system_status()
+    forget_remote_balance_wal()
+    # Charge toutes les collections (niveaux XP et état XP compris) après restauration
     load_all_data()
-    # Charger les niveaux XP au démarrage
-    levels = load_levels()
-    lvl_log_channel_data = load_lvl_log_channel()
-    # Créer le fichier levels.json si absent
-    if not os.path.exists(LVL_FILE):
-        with open(LVL_FILE, "w") as f:
-            json.dump({}, f)
     check_duplicate_json_files()
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
@@ -4974,5 +4734,8 @@ if __name__ == "__main__":
         bot.run(TOKEN)
     except Exception as e:
         print(f"Erreur lors du démarrage du bot: {e}")
-        save_balances(balances)
+        checkpoint_balances()
+        xp_accumulator.flush()
+        guild_levels.flush()
+        store.flush()
         sys.exit(1)
@@ -0,0 +1,42 @@
+import os
+
+from utils.datastore import DataStore
+from utils.sqlite_store import SqliteBackend
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+SQLITE_PATH = os.getenv("SQLITE_PATH") or os.path.join(DATA_DIR, "bot.sqlite3")
+
+# Collections déclarées dans client.py (store.register) : seules celles-ci vont dans la base.
+# Les tables de niveaux par serveur (levels_<guild>.json) et les manifestes restent des fichiers.
+COLLECTIONS = (
+    ("balances", "balances.json"),
+    ("balances_backup", "balances_backup.json"),
+    ("log_channel", "log_channel.json"),
+    ("message_log_channel", "message_log_channel.json"),
+    ("loans", "loans.json"),
+    ("pib", "pib.json"),
+    ("pays_log_channel", "pays_log_channel.json"),
+    ("pays_images", "pays_images.json"),
+    ("mute_log_channel", "mute_log_channel.json"),
+    ("active_mutes", "active_mutes.json"),
+    ("warnings", "warnings.json"),
+    ("lvl_log_channel", "lvl_log_channel.json"),
+    ("xp_system_status", "xp_system_status.json"),
+    ("calendrier", "calendrier.json"),
+    ("invites", "invites.json"),
+    ("ledger", "ledger.json"),
+    ("integrity", "integrity.json"),
+)
+
+def main():
+    """Importe (ou réimporte) les fichiers JSON des collections du bot dans la base SQLite."""
+    backend = SqliteBackend(SQLITE_PATH)
+    store = DataStore(DATA_DIR, backend=backend)
+    for name, filename in COLLECTIONS:
+        store.register(name, filename)
+    imported = backend.import_json_files(store)
+    backend.close()
+    print(f"{len(imported)} fichier(s) importé(s) dans {SQLITE_PATH} : {', '.join(imported)}")
+
+if __name__ == "__main__":
+    main()
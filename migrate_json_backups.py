@@ -0,0 +1,39 @@
+import sys
+import json
+
+from utils import db, relational
+
+def get_conn():
+    # Connexion empruntée au pool partagé, validée et rendue à la sortie du bloc
+    return db.connection()
+
+def migrate(drop_blobs=False):
+    """Migre en une transaction les blobs de json_backups vers les tables relationnelles."""
+    filenames = sorted(relational.RELATIONAL_FILES | {relational.LEGACY_TRANSACTIONS_FILE})
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            # Les tables de niveaux par serveur (levels_<guild_id>.json) sont migrées aussi
+            cur.execute("SELECT filename, content FROM json_backups WHERE filename = ANY(%s) OR filename LIKE 'levels%%'",
+                        (filenames,))
+            documents = {}
+            for filename, content in cur.fetchall():
+                if filename not in filenames and not relational.is_relational_file(filename):
+                    continue
+                try:
+                    documents[filename] = json.loads(content)
+                except Exception as e:
+                    print(f"Contenu illisible pour {filename}, ignoré : {e}")
+            counts = relational.import_documents(cur, documents)
+            if drop_blobs and documents:
+                cur.execute("DELETE FROM json_backups WHERE filename = ANY(%s)", (list(documents),))
+    for table, count in counts.items():
+        print(f"{table} : {count} ligne(s) importée(s).")
+    missing = [f for f in filenames if f not in documents]
+    if missing:
+        print(f"Aucune sauvegarde trouvée pour : {', '.join(missing)}")
+    if drop_blobs:
+        print("Blobs correspondants supprimés de json_backups.")
+    print("Migration terminée. Activez PG_RELATIONAL=1 pour synchroniser ligne par ligne.")
+
+if __name__ == "__main__":
+    migrate(drop_blobs="--drop-blobs" in sys.argv)
@@ -0,0 +1,40 @@
+import os
+import sys
+
+from utils.datastore import DataStore, open_backend
+from utils.guild_levels import GuildLevels
+from utils.levels import CURVES, LevelCurve, migrate_levels
+from utils.seasons import apply, transform
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+def migrate(old_name, new_name):
+    """Convertit les tables de niveaux d'une courbe à une autre en conservant l'XP totale de chaque membre."""
+    old_curve, new_curve = LevelCurve(old_name), LevelCurve(new_name)
+    members = changed = 0
+    # Ancien levels.json global : converti aussi, pour un import ultérieur cohérent
+    if os.path.exists(os.path.join(DATA_DIR, "levels.json")):
+        store = DataStore(DATA_DIR, backend=open_backend(DATA_DIR))
+        levels = store.register("levels", "levels.json")
+        store.load("levels")
+        changed += migrate_levels(levels, old_curve, new_curve)
+        members += len(levels)
+        store.write("levels")
+        store.close()
+    guild_levels = GuildLevels(DATA_DIR)
+    for guild_id in guild_levels.guild_ids():
+        table = guild_levels.get(guild_id)
+        changed += apply(transform(table, old_curve, "courbe", target_curve=new_curve))
+        members += len(table)
+    guild_levels.flush()
+    print(f"{members} membre(s) recalculé(s) de '{old_name}' vers '{new_name}', {changed} changement(s) de niveau.")
+    print(f"Pensez à définir LEVEL_CURVE={new_name} avant de redémarrer le bot.")
+
+def main():
+    if len(sys.argv) != 3 or sys.argv[1] not in CURVES or sys.argv[2] not in CURVES:
+        print(f"Usage : python migrate_level_curve.py <ancienne courbe> <nouvelle courbe> ({', '.join(CURVES)})")
+        sys.exit(1)
+    migrate(sys.argv[1], sys.argv[2])
+
+if __name__ == "__main__":
+    main()
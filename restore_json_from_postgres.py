@@ -1,35 +1,115 @@
 import os
-import psycopg2
 import json
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+from utils import db, relational
+from utils.manifest import BackupManifest, content_digest
+
 DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+# Nombre de lignes rapatriées à chaque aller-retour du curseur serveur
+FETCH_SIZE = 50
 
 def get_conn():
-    return psycopg2.connect(DATABASE_URL)
+    # Connexion empruntée au pool partagé, validée et rendue à la sortie du bloc
+    return db.connection()
 
-def restore_json_file_from_db(filename):
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute("SELECT content FROM json_backups WHERE filename = %s", (filename,))
-            row = cur.fetchone()
-            if not row:
-                print(f"Aucune sauvegarde trouvée pour {filename}.")
-                return
-            content = row[0]
-    filepath = os.path.join(DATA_DIR, filename)
-    with open(filepath, "w") as f:
+def _write_atomic(filepath, content):
+    tmp_path = filepath + ".tmp"
+    with open(tmp_path, "w") as f:
         f.write(content)
-    print(f"Restauration de {filename} effectuée.")
+    os.replace(tmp_path, filepath)
 
-def main():
-    # Restaure tous les fichiers sauvegardés
+def _local_digest(filepath, known):
+    """Empreinte du fichier local, sans le relire si le manifeste le connaît déjà."""
+    try:
+        st = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    if known and known.get("mtime") == st.st_mtime_ns and known.get("size") == st.st_size:
+        return known.get("digest")
+    with open(filepath, "r") as f:
+        return content_digest(f.read())
+
+# Fichiers de données locaux (collections, journal, base SQLite)
+LOCAL_DATA_SUFFIXES = (".json", ".jsonl", ".sqlite3")
+
+def has_local_data(data_dir=DATA_DIR):
+    """Indique si le dossier contient déjà des données : elles font foi, PostgreSQL peut être en retard."""
+    try:
+        return any(name.endswith(LOCAL_DATA_SUFFIXES) for name in os.listdir(data_dir))
+    except FileNotFoundError:
+        return False
+
+def restore_all(data_dir=DATA_DIR):
+    """
+    Restaure les fichiers sauvegardés en une seule requête.
+
+    Les lignes sont lues par un curseur côté serveur. PostgreSQL peut avoir
+    jusqu'à PG_SYNC_INTERVAL de retard : un fichier local n'est remplacé que
+    s'il est identique à ce qui a été envoyé en dernier (empreinte du
+    manifeste). Un fichier modifié depuis, ou jamais envoyé, a des
+    changements en attente et est conservé. Les fichiers restaurés sont
+    inscrits dans le manifeste pour ne pas être renvoyés à la synchronisation suivante.
+    """
+    stats = {"restored": 0, "skipped": 0, "kept": 0}
+    if not db.is_enabled():
+        print("DATABASE_URL non défini : aucune restauration PostgreSQL.")
+        return stats
+    manifest = BackupManifest(data_dir)
+    excluded = sorted(relational.RELATIONAL_FILES) if relational.is_enabled() else []
+    # Journal des soldes : local uniquement, une copie distante serait périmée
+    excluded.append("balances.wal")
+    with get_conn() as conn:
+        # Curseur nommé : le contenu est rapatrié par paquets au lieu d'être chargé d'un bloc
+        with conn.cursor(name="restore_json_backups") as cur:
+            cur.itersize = FETCH_SIZE
+            cur.execute("SELECT filename, content FROM json_backups WHERE NOT (filename = ANY(%s))", (excluded,))
+            for filename, content in cur:
+                if relational.is_enabled() and relational.is_relational_file(filename):
+                    # Tables de niveaux : reconstruites depuis guild_levels
+                    continue
+                filepath = os.path.join(data_dir, filename)
+                digest = content_digest(content)
+                known = manifest.entries.get(filename)
+                local = _local_digest(filepath, known)
+                if local == digest:
+                    stats["skipped"] += 1
+                elif local is not None and (known is None or local != known.get("digest")):
+                    # Changements locaux pas encore envoyés : la copie distante est plus ancienne
+                    stats["kept"] += 1
+                    print(f"{filename} conservé : modifications locales non synchronisées.")
+                    continue
+                else:
+                    _write_atomic(filepath, content)
+                    stats["restored"] += 1
+                    print(f"Restauration de {filename} effectuée.")
+                st = os.stat(filepath)
+                manifest.record([{"filename": filename, "digest": digest, "mtime": st.st_mtime_ns, "size": st.st_size}])
+    manifest.save()
+    if relational.is_enabled():
+        restore_relational_files(data_dir)
+    print(f"Restauration terminée : {stats['restored']} fichier(s) restauré(s), {stats['skipped']} déjà à jour, "
+          f"{stats['kept']} conservé(s).")
+    return stats
+
+def restore_relational_files(data_dir=DATA_DIR):
+    """
+    Reconstruit les fichiers JSON manquants des collections relationnelles à partir de leurs tables.
+
+    Ces fichiers ne passent pas par le manifeste : un fichier local présent peut
+    avoir des lignes pas encore envoyées, il n'est jamais remplacé.
+    """
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute("SELECT filename FROM json_backups")
-            files = [row[0] for row in cur.fetchall()]
-    for filename in files:
-        restore_json_file_from_db(filename)
+            documents = relational.export_documents(cur)
+    for filename, data in documents.items():
+        filepath = os.path.join(data_dir, filename)
+        if os.path.exists(filepath):
+            continue
+        _write_atomic(filepath, json.dumps(data))
+        print(f"Restauration de {filename} effectuée (tables relationnelles).")
+
+def main():
+    restore_all()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,20 @@
+from utils.journal import TransactionJournal
+
+
+def test_open_trims_torn_tail(tmp_path):
+    journal = TransactionJournal(str(tmp_path)).open()
+    journal.append({"amount": 1})
+    journal.append({"amount": 2})
+    journal.close()
+    path = journal.segments()[-1]
+    with open(path, "rb+") as f:
+        # Arrêt brutal au milieu de la deuxième transaction
+        f.truncate(f.seek(0, 2) - 5)
+
+    journal = TransactionJournal(str(tmp_path)).open()
+    assert journal.next_seq == 2
+    assert journal.append({"amount": 99})["seq"] == 2
+    journal.close()
+
+    records = list(TransactionJournal(str(tmp_path)).open())
+    assert [(r["seq"], r["amount"]) for r in records] == [(1, 1), (2, 99)]
@@ -0,0 +1,67 @@
+import asyncio
+import os
+
+from utils.wal import BalanceWAL, TrackedDict
+
+
+def _append(wal, **values):
+    data = TrackedDict()
+    data.update(values)
+    return wal.append(data)
+
+
+def test_replay_trims_torn_tail_before_appending(tmp_path):
+    path = str(tmp_path / "balances.wal")
+    wal = BalanceWAL(path)
+    _append(wal, a=1)
+    _append(wal, b=2)
+    wal.close()
+    # Arrêt brutal au milieu de la troisième entrée
+    with open(path, "ab") as f:
+        f.write(b'{"seq":3,"set":{"c"')
+
+    wal = BalanceWAL(path)
+    data = {}
+    assert wal.replay(data) == 2
+    assert wal.next_seq == 3
+    assert _append(wal, c=3) == 3
+    wal.close()
+
+    data = {}
+    assert BalanceWAL(path).replay(data) == 3
+    assert data == {"a": 1, "b": 2, "c": 3}
+
+
+def test_append_without_replay_does_not_join_torn_entry(tmp_path):
+    path = str(tmp_path / "balances.wal")
+    with open(path, "wb") as f:
+        f.write(b'{"seq":1,"set":{"a":1},"del":[]}\n{"seq":2,"se')
+    wal = BalanceWAL(path)
+    _append(wal, b=2)
+    wal.close()
+
+    data = {}
+    assert BalanceWAL(path).replay(data) == 2
+    assert data == {"a": 1, "b": 2}
+    with open(path, "rb") as f:
+        assert f.read().endswith(b"\n")
+    assert os.path.getsize(path) > 0
+
+
+def test_appends_on_the_loop_share_one_fsync(tmp_path, monkeypatch):
+    path = str(tmp_path / "balances.wal")
+    wal = BalanceWAL(path, sync_delay=0.01)
+    synced = []
+    monkeypatch.setattr(os, "fsync", lambda fd: synced.append(fd))
+
+    async def main():
+        for i in range(5):
+            _append(wal, **{f"k{i}": i})
+        assert not synced
+        await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+    assert len(synced) == 1
+    wal.close()
+    data = {}
+    assert BalanceWAL(path).replay(data) == 5
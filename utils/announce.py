@@ -0,0 +1,86 @@
+"""
+File d'annonces (passages de niveau, grades) envoyées en arrière-plan.
+
+Les annonces sont déposées sans attendre ; une tâche les regroupe par salon
+en un seul message (une mention par membre, jusqu'à 10 embeds) et respecte
+un intervalle minimal entre deux envois dans le même salon. Une annonce
+remplace l'annonce encore en attente qui a la même clé (par exemple le
+niveau précédent du même membre).
+"""
+import asyncio
+import os
+from collections import OrderedDict
+
+ANNOUNCE_MIN_INTERVAL = float(os.getenv("ANNOUNCE_MIN_INTERVAL", "1.5"))
+# Attente avant le premier envoi, pour regrouper les annonces d'une même rafale
+ANNOUNCE_GATHER_DELAY = float(os.getenv("ANNOUNCE_GATHER_DELAY", "0.5"))
+MAX_EMBEDS_PER_MESSAGE = 10
+
+
+class AnnouncementQueue:
+    """Annonces en attente par salon, envoyées par une seule tâche de fond."""
+
+    def __init__(self, min_interval=ANNOUNCE_MIN_INTERVAL, gather_delay=ANNOUNCE_GATHER_DELAY):
+        self.min_interval = min_interval
+        self.gather_delay = gather_delay
+        self._pending = {}
+        self._channels = {}
+        self._last_sent = {}
+        self._task = None
+        self._wakeup = None
+        self.sent = 0
+        self.merged = 0
+        self.failed = 0
+
+    def put(self, channel, key, mention, embed):
+        """Dépose une annonce (appel non bloquant, depuis la boucle du bot)."""
+        pending = self._pending.setdefault(channel.id, OrderedDict())
+        if key in pending:
+            self.merged += 1
+        pending[key] = (mention, embed)
+        self._channels[channel.id] = channel
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        self._wakeup.set()
+
+    def pending_count(self):
+        return sum(len(p) for p in self._pending.values())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            await asyncio.sleep(self.gather_delay)
+            while self._pending:
+                now = loop.time()
+                waits = {
+                    channel_id: self._last_sent.get(channel_id, float("-inf")) + self.min_interval - now
+                    for channel_id in self._pending
+                }
+                ready = [channel_id for channel_id, wait in waits.items() if wait <= 0]
+                if not ready:
+                    await asyncio.sleep(min(waits.values()))
+                    continue
+                for channel_id in ready:
+                    await self._send(channel_id)
+                    self._last_sent[channel_id] = loop.time()
+
+    async def _send(self, channel_id):
+        pending = self._pending[channel_id]
+        batch = []
+        while pending and len(batch) < MAX_EMBEDS_PER_MESSAGE:
+            batch.append(pending.popitem(last=False)[1])
+        channel = self._channels[channel_id]
+        if not pending:
+            del self._pending[channel_id]
+            del self._channels[channel_id]
+        mentions = list(dict.fromkeys(mention for mention, _ in batch))
+        try:
+            await channel.send(content="\n".join(f"> − {mention}" for mention in mentions),
+                               embeds=[embed for _, embed in batch])
+            self.sent += 1
+        except Exception as e:
+            self.failed += 1
+            print(f"[ANNONCES] Envoi impossible dans le salon {channel_id} : {e}")
@@ -0,0 +1,80 @@
+"""
+Sérialisation des données du bot.
+
+JSON reste le format d'échange (fichiers, sauvegardes PostgreSQL). Si orjson
+est installé, il remplace le module json standard pour l'encodage et le
+décodage. Les entiers au-delà de 64 bits, qu'il refuse, sont encodés par le
+module standard ; au décodage, orjson les lit en flottants (les montants du
+bot restent bien en deçà) et seul un texte qu'il rejette (NaN, Infinity)
+repasse par le module standard. Un instantané binaire (marshal) de toutes les collections est
+écrit à l'arrêt et lu en priorité au démarrage, tant que les fichiers JSON
+correspondants n'ont pas changé depuis.
+"""
+import json
+import marshal
+import os
+import sys
+
+try:
+    import orjson
+except ImportError:  # orjson est optionnel : repli sur le module json standard
+    orjson = None
+
+ENGINE = "orjson" if orjson is not None else "json"
+HOTSTART_FILENAME = ".hotstart.bin"
+# Le format marshal dépend de la version de Python
+_HOTSTART_TAG = ("hotstart", 1, sys.version_info[:2])
+
+
+def dumps(data, indent=None):
+    """Encode en texte JSON (compact sauf si `indent` est précisé)."""
+    if orjson is not None and not indent:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        except TypeError:
+            # orjson.JSONEncodeError (sous-classe de TypeError) : entier hors des 64 bits
+            pass
+    return json.dumps(data, indent=indent)
+
+
+def loads(text):
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            # Texte accepté par le module standard seulement (NaN, Infinity)
+            pass
+    return json.loads(text)
+
+
+def file_stamp(path):
+    """(mtime en ns, taille) d'un fichier, ou None s'il n'existe pas."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def write_hotstart(path, entries):
+    """Écrit l'instantané binaire : {nom: (empreinte du fichier JSON, données)}."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(marshal.dumps((_HOTSTART_TAG, entries)))
+    os.replace(tmp_path, path)
+
+
+def read_hotstart(path):
+    """Lit l'instantané binaire ; retourne {} s'il est absent, illisible ou d'une autre version."""
+    try:
+        # marshal.loads sur le contenu complet : marshal.load lit le fichier par petits morceaux
+        with open(path, "rb") as f:
+            tag, entries = marshal.loads(f.read())
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"[CODEC] Instantané binaire illisible, ignoré : {e}")
+        return {}
+    if tag != _HOTSTART_TAG:
+        return {}
+    return entries
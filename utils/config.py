@@ -5,4 +5,7 @@ MESSAGE_LOG_FILE = "message_log_channel.json"
 LOANS_FILE = "loans.json"
 PERSONNEL_FILE = "personnel.json"
 STATUS_BOT_FILE = "status_bot.json"
-TRANSACTION_LOG_FILE = "transaction_log.json"
\ No newline at end of file
+TRANSACTION_LOG_FILE = "transaction_log.json"
+INTEGRITY_FILE = "integrity.json"
+# Préfixe des segments du journal des transactions (<préfixe>-<numéro>.jsonl)
+TRANSACTION_JOURNAL_PREFIX = "transactions"
@@ -0,0 +1,290 @@
+"""
+Couche de stockage unifiée pour les fichiers JSON du bot.
+
+Chaque fichier est déclaré une seule fois comme « collection ». La copie en
+mémoire fait foi ; les sauvegardes sont regroupées. La copie est sérialisée
+dans la boucle d'événements (seul endroit où elle ne change pas pendant la
+lecture) et seule l'écriture sur le disque est faite dans un thread.
+Le support d'écriture (fichiers JSON ou SQLite) est choisi par DATA_BACKEND.
+"""
+import asyncio
+import contextlib
+import os
+import threading
+
+from utils import codec
+
+
+class Collection:
+    """Un fichier JSON et sa copie maîtresse en mémoire."""
+
+    def __init__(self, name, path, default, indent=None, create=True, delete_when_empty=False):
+        self.name = name
+        self.path = path
+        self.default = default
+        self.indent = indent
+        self.create = create
+        self.delete_when_empty = delete_when_empty
+        self.data = default()
+        self.dirty = False
+        self.writing = False
+        # Incrémenté à chaque sauvegarde : permet de savoir qu'une collection n'a pas changé
+        self.version = 0
+        self.lock = threading.Lock()
+
+    @property
+    def filename(self):
+        return os.path.basename(self.path)
+
+
+_ENCODE = object()
+
+
+class JsonFileBackend:
+    """Un fichier JSON par collection, réécrit en entier de façon atomique."""
+
+    def __init__(self, data_dir=None):
+        self.hotstart_path = os.path.join(data_dir, codec.HOTSTART_FILENAME) if data_dir else None
+        self._hot = None
+
+    def read(self, coll):
+        """Retourne (trouvé, données) ; données vaut None si le fichier est illisible."""
+        if self._hot is None:
+            self._hot = codec.read_hotstart(self.hotstart_path) if self.hotstart_path else {}
+        hot = self._hot.pop(coll.name, None)
+        stamp = codec.file_stamp(coll.path)
+        if stamp is None:
+            return False, None
+        if hot is not None and tuple(hot[0]) == stamp:
+            # Fichier inchangé depuis l'arrêt : on reprend l'instantané binaire
+            return True, hot[1]
+        try:
+            with open(coll.path, "rb") as f:
+                return True, codec.loads(f.read())
+        except Exception as e:
+            print(f"Erreur lors du chargement de {coll.filename}: {e}")
+            return True, None
+
+    def save_hotstart(self, collections):
+        """Écrit l'instantané binaire des collections déjà à jour sur disque."""
+        if not self.hotstart_path:
+            return
+        entries = {}
+        for coll in collections:
+            stamp = codec.file_stamp(coll.path)
+            if stamp is not None and not coll.dirty:
+                data = coll.data
+                if type(data) not in (dict, list):
+                    # marshal ne connaît que les types de base (ex. TrackedDict des soldes)
+                    data = dict(data) if isinstance(data, dict) else list(data)
+                entries[coll.name] = (stamp, data)
+        try:
+            codec.write_hotstart(self.hotstart_path, entries)
+        except Exception as e:
+            print(f"[CODEC] Écriture de l'instantané binaire impossible : {e}")
+
+    def encode(self, coll):
+        """Sérialise la collection (à appeler depuis la boucle, ou quand elle ne tourne pas)."""
+        return codec.dumps(coll.data, indent=coll.indent)
+
+    def write(self, coll, payload):
+        tmp_path = coll.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(payload)
+        os.replace(tmp_path, coll.path)
+
+    def delete(self, coll):
+        if os.path.exists(coll.path):
+            os.remove(coll.path)
+            return True
+        return False
+
+    def export(self, coll):
+        # Le fichier JSON est déjà à jour
+        return False
+
+    @contextlib.contextmanager
+    def batch(self):
+        yield
+
+    def close(self):
+        pass
+
+
+def open_backend(data_dir):
+    """Crée le support d'écriture choisi par DATA_BACKEND (json par défaut, ou sqlite)."""
+    kind = os.getenv("DATA_BACKEND", "json").lower()
+    if kind == "sqlite":
+        from utils.sqlite_store import SqliteBackend
+        return SqliteBackend(os.getenv("SQLITE_PATH") or os.path.join(data_dir, "bot.sqlite3"))
+    return JsonFileBackend(data_dir)
+
+
+class DataStore:
+    """Ensemble de collections JSON nommées, sauvegardées hors de la boucle d'événements."""
+
+    def __init__(self, data_dir, on_write=None, backend=None):
+        self.data_dir = data_dir
+        self.on_write = on_write
+        self.backend = backend or JsonFileBackend(data_dir)
+        self._collections = {}
+
+    def register(self, name, filename, default=dict, indent=None, create=True, delete_when_empty=False):
+        """Déclare une collection et retourne sa copie maîtresse (vide tant qu'elle n'est pas chargée)."""
+        path = os.path.join(self.data_dir, filename)
+        coll = Collection(name, path, default, indent=indent, create=create, delete_when_empty=delete_when_empty)
+        self._collections[name] = coll
+        return coll.data
+
+    def collection(self, name):
+        return self._collections[name]
+
+    def names(self):
+        return list(self._collections)
+
+    def get(self, name):
+        """Retourne la copie maîtresse d'une collection."""
+        return self._collections[name].data
+
+    def load(self, name):
+        """Charge (ou recharge) une collection depuis le disque, sur place."""
+        coll = self._collections[name]
+        found, data = self.backend.read(coll)
+        if data is None:
+            data = coll.default()
+            if coll.create and not found:
+                self._replace(coll, data)
+                self._write(coll, self._encode(coll))
+                return coll.data
+        self._replace(coll, data)
+        return coll.data
+
+    def load_all(self):
+        for name in self._collections:
+            self.load(name)
+
+    def save(self, name, data=None):
+        """
+        Demande la sauvegarde d'une collection.
+
+        Si `data` est fourni, il remplace le contenu de la copie maîtresse.
+        Plusieurs appels rapprochés ne donnent lieu qu'à une seule écriture.
+        """
+        coll = self._collections[name]
+        if data is not None:
+            self._replace(coll, data)
+        coll.version += 1
+        coll.dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Hors de la boucle (démarrage, scripts) : écriture immédiate
+            self._flush_collection(coll)
+            return
+        if not coll.writing:
+            coll.writing = True
+            loop.create_task(self._writer(coll))
+
+    async def _writer(self, coll):
+        loop = asyncio.get_running_loop()
+        try:
+            while coll.dirty:
+                coll.dirty = False
+                # Sérialisation dans la boucle, écriture du fichier hors de la boucle
+                payload = self._encode(coll)
+                await loop.run_in_executor(None, self._write, coll, payload)
+        except Exception as e:
+            print(f"Erreur lors de la sauvegarde de {coll.filename}: {e}")
+        finally:
+            coll.writing = False
+
+    def _flush_collection(self, coll):
+        if coll.dirty:
+            coll.dirty = False
+            try:
+                self._write(coll, self._encode(coll))
+            except Exception as e:
+                print(f"Erreur lors de la sauvegarde de {coll.filename}: {e}")
+
+    def encode(self, name):
+        """Sérialise une collection pour un `write` ultérieur (depuis la boucle, avant de passer dans un thread)."""
+        return self._encode(self._collections[name])
+
+    def write(self, name, payload=_ENCODE):
+        """
+        Écrit immédiatement une collection (appel bloquant) ; les erreurs sont propagées.
+
+        Depuis un thread, passer le `payload` obtenu par `encode` dans la boucle.
+        """
+        coll = self._collections[name]
+        if payload is _ENCODE:
+            payload = self._encode(coll)
+        coll.version += 1
+        coll.dirty = False
+        self._write(coll, payload)
+
+    def flush(self):
+        """Écrit immédiatement toutes les collections en attente (appel bloquant, pour l'arrêt)."""
+        with self.backend.batch():
+            for coll in self._collections.values():
+                self._flush_collection(coll)
+
+    def swap(self, datas):
+        """Remplace d'un coup plusieurs collections ({nom: données}) et les écrit dans une seule transaction."""
+        for name, data in datas.items():
+            coll = self._collections[name]
+            self._replace(coll, data)
+            coll.version += 1
+            coll.dirty = True
+        with self.backend.batch():
+            for name in datas:
+                self._flush_collection(self._collections[name])
+
+    def export_json(self, *filenames):
+        """
+        Met à jour les fichiers JSON des collections données (appel bloquant, avant la synchronisation).
+
+        Sans effet avec les fichiers JSON ; avec SQLite, les fichiers sont exportés de la base.
+        """
+        filenames = {os.path.basename(f) for f in filenames}
+        exported = 0
+        for coll in self._collections.values():
+            if coll.filename in filenames:
+                with coll.lock:
+                    exported += bool(self.backend.export(coll))
+        return exported
+
+    def save_hotstart(self):
+        """Écrit l'instantané binaire lu en priorité au prochain démarrage (à l'arrêt, après flush)."""
+        self.backend.save_hotstart(self._collections.values())
+
+    def close(self):
+        self.flush()
+        self.backend.close()
+
+    def _replace(self, coll, data):
+        if data is coll.data:
+            return
+        if isinstance(coll.data, dict) and isinstance(data, dict):
+            coll.data.clear()
+            coll.data.update(data)
+        elif isinstance(coll.data, list) and isinstance(data, list):
+            coll.data[:] = data
+        else:
+            coll.data = data
+
+    def _encode(self, coll):
+        # None : collection vide à supprimer
+        if coll.delete_when_empty and not coll.data:
+            return None
+        return self.backend.encode(coll)
+
+    def _write(self, coll, payload):
+        with coll.lock:
+            if payload is None:
+                if self.backend.delete(coll):
+                    print(f"Fichier {coll.filename} supprimé car vide.")
+                return
+            self.backend.write(coll, payload)
+        if self.on_write:
+            self.on_write(coll.path)
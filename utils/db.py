@@ -0,0 +1,152 @@
+"""
+Pool de connexions PostgreSQL partagé par tout le processus.
+
+Toutes les écritures vers PostgreSQL (synchronisation, commandes admin, scripts)
+passent par ce pool borné au lieu d'ouvrir une connexion par requête.
+Les appels étant bloquants, le code asynchrone doit passer par `run()`.
+"""
+import asyncio
+import contextlib
+import os
+import threading
+import time
+
+try:
+    import psycopg2
+    from psycopg2 import pool as pg_pool
+except ImportError:  # psycopg2 n'est nécessaire que si DATABASE_URL est défini
+    psycopg2 = None
+    pg_pool = None
+
+# Taille du pool et délai d'inactivité après lequel une connexion est vérifiée
+POOL_MIN = int(os.getenv("PG_POOL_MIN", "1"))
+POOL_MAX = int(os.getenv("PG_POOL_MAX", "4"))
+POOL_TIMEOUT = float(os.getenv("PG_POOL_TIMEOUT", "30"))
+HEALTH_CHECK_AFTER = float(os.getenv("PG_POOL_HEALTH_CHECK_AFTER", "30"))
+
+_pool = None
+_slots = None
+_last_used = {}
+_lock = threading.Lock()
+
+
+class PoolUnavailable(Exception):
+    """Levée quand PostgreSQL n'est pas configuré ou que le pool est saturé."""
+
+
+def database_url():
+    # Lu à la demande : le .env est chargé après l'import des modules utils
+    return os.getenv("DATABASE_URL")
+
+
+def is_enabled():
+    """Indique si PostgreSQL est configuré pour ce processus."""
+    return bool(database_url()) and psycopg2 is not None
+
+
+def get_pool():
+    """Retourne le pool partagé, en le créant au premier appel."""
+    global _pool, _slots
+    if _pool is not None:
+        return _pool
+    with _lock:
+        if _pool is None:
+            if not is_enabled():
+                raise PoolUnavailable("DATABASE_URL n'est pas défini ou psycopg2 est absent")
+            _pool = pg_pool.ThreadedConnectionPool(POOL_MIN, POOL_MAX, database_url())
+            _slots = threading.BoundedSemaphore(POOL_MAX)
+            print(f"[DB] Pool PostgreSQL initialisé ({POOL_MIN}-{POOL_MAX} connexions)")
+    return _pool
+
+
+def _is_healthy(conn):
+    if conn.closed:
+        return False
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except Exception:
+        return False
+
+
+def acquire():
+    """Emprunte une connexion au pool (bloque tant que le pool est saturé)."""
+    pool = get_pool()
+    if not _slots.acquire(timeout=POOL_TIMEOUT):
+        raise PoolUnavailable(f"Aucune connexion PostgreSQL libre après {POOL_TIMEOUT}s")
+    try:
+        conn = pool.getconn()
+        # Une connexion restée inactive longtemps peut avoir été coupée par le serveur
+        idle = time.monotonic() - _last_used.get(id(conn), 0)
+        if idle > HEALTH_CHECK_AFTER and not _is_healthy(conn):
+            pool.putconn(conn, close=True)
+            conn = pool.getconn()
+        return conn
+    except Exception:
+        _slots.release()
+        raise
+
+
+def release(conn, broken=False):
+    """Rend une connexion au pool ; une connexion cassée est fermée."""
+    try:
+        if broken or conn.closed:
+            _last_used.pop(id(conn), None)
+            get_pool().putconn(conn, close=True)
+        else:
+            _last_used[id(conn)] = time.monotonic()
+            get_pool().putconn(conn)
+    finally:
+        _slots.release()
+
+
+@contextlib.contextmanager
+def connection():
+    """Contexte qui emprunte une connexion, valide la transaction et la rend au pool."""
+    conn = acquire()
+    broken = False
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            broken = True
+        raise
+    finally:
+        release(conn, broken=broken)
+
+
+def execute(sql, params=None):
+    """Exécute une requête dans sa propre transaction et retourne le nombre de lignes touchées."""
+    with connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            return cur.rowcount
+
+
+def delete_backups(*filenames):
+    """Supprime des fichiers de la table json_backups. Retourne le nombre de lignes supprimées."""
+    with connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM json_backups WHERE filename = ANY(%s)", (list(filenames),))
+            return cur.rowcount
+
+
+async def run(func, *args):
+    """Exécute un appel PostgreSQL bloquant dans un thread pour ne pas geler la boucle."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, func, *args)
+
+
+def close_pool():
+    """Ferme toutes les connexions du pool."""
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+            _last_used.clear()
@@ -0,0 +1,163 @@
+"""
+Dette des pays tenue à jour au fil des emprunts et des changements de rôles.
+
+La dette d'un pays comprend ses propres emprunts et ceux que ses citoyens
+(membres ayant le rôle du pays) ont contractés auprès de la Banque centrale.
+Chaque emprunt ajoute sa dette (somme et intérêts) au total de son pays ou
+de son demandeur ; les citoyens des pays sont relevés une fois (à la
+connexion, ou à la première consultation pour un nouveau pays), puis suivis
+par les changements de rôles. Lire la
+dette d'un pays ne demande alors que quelques recherches dans des dictionnaires.
+"""
+
+
+def loan_debt(loan):
+    """Dette totale d'un emprunt : somme empruntée et intérêts."""
+    principal = loan.get("somme", 0)
+    taux = loan.get("taux", 0)
+    return int(principal * (1 + taux / 100))
+
+
+class DebtIndex:
+    """Totaux de dette par pays et par demandeur, et citoyens des pays relevés."""
+
+    def __init__(self, key):
+        self.key = key
+        self._loans = {}
+        # Emprunts des pays eux-mêmes : {id du rôle: dette}
+        self.country_debt = {}
+        # Emprunts des membres auprès de la Banque centrale : {id du membre: dette}
+        self.borrower_debt = {}
+        # Somme des dettes de Banque centrale des citoyens : {id du rôle: dette}
+        self.citizen_debt = {}
+        self.citizens = {}
+        self._member_countries = {}
+
+    # --- Emprunts ---
+
+    def _contribution(self, loan):
+        if not isinstance(loan, dict):
+            return None
+        role_id = loan.get("role_id")
+        if role_id:
+            return ("pays", str(role_id), loan_debt(loan))
+        demandeur_id = loan.get("demandeur_id")
+        if demandeur_id is None:
+            return None
+        return ("citoyen", str(demandeur_id), loan_debt(loan))
+
+    def _add(self, contribution, sign):
+        kind, owner, debt = contribution
+        if kind == "pays":
+            self.country_debt[owner] = self.country_debt.get(owner, 0) + sign * debt
+            if not self.country_debt[owner]:
+                del self.country_debt[owner]
+            return
+        self.borrower_debt[owner] = self.borrower_debt.get(owner, 0) + sign * debt
+        if not self.borrower_debt[owner]:
+            del self.borrower_debt[owner]
+        for role_id in self._member_countries.get(owner, ()):
+            self.citizen_debt[role_id] = self.citizen_debt.get(role_id, 0) + sign * debt
+
+    def rebuild(self, loans):
+        """Recalcule tous les totaux à partir de la liste des emprunts."""
+        self._loans = {}
+        self.country_debt = {}
+        self.borrower_debt = {}
+        self.citizen_debt = {role_id: 0 for role_id in self.citizens}
+        self.apply({self.key(loan): loan for loan in loans}, [])
+
+    def apply(self, changed, removed):
+        """Prend en compte des emprunts modifiés ({clé: emprunt}) et supprimés (clés)."""
+        for key in list(changed) + list(removed):
+            old = self._loans.pop(key, None)
+            if old is not None:
+                self._add(old, -1)
+        for key, loan in changed.items():
+            contribution = self._contribution(loan)
+            if contribution is not None:
+                self._loans[key] = contribution
+                self._add(contribution, 1)
+
+    # --- Citoyens ---
+
+    def is_tracked(self, role_id):
+        return str(role_id) in self.citizens
+
+    def track(self, role_id, member_ids):
+        """Relève une fois les citoyens d'un pays ; ils sont ensuite suivis par `update_member`."""
+        role_id = str(role_id)
+        self.forget(role_id)
+        members = {str(member_id) for member_id in member_ids}
+        self.citizens[role_id] = members
+        for member_id in members:
+            self._member_countries.setdefault(member_id, set()).add(role_id)
+        self.citizen_debt[role_id] = sum(self.borrower_debt.get(member_id, 0) for member_id in members)
+
+    def track_all(self, role_ids, members):
+        """Relève en un seul passage les citoyens de plusieurs pays (`members` : (id, ids des rôles))."""
+        role_ids = {int(role_id) for role_id in role_ids}
+        found = {role_id: [] for role_id in role_ids}
+        for member_id, member_roles in members:
+            for role_id in role_ids.intersection(member_roles):
+                found[role_id].append(member_id)
+        for role_id, member_ids in found.items():
+            self.track(role_id, member_ids)
+
+    def _join(self, member_id, role_id):
+        members = self.citizens[role_id]
+        if member_id in members:
+            return
+        members.add(member_id)
+        self._member_countries.setdefault(member_id, set()).add(role_id)
+        self.citizen_debt[role_id] += self.borrower_debt.get(member_id, 0)
+
+    def _leave(self, member_id, role_id):
+        members = self.citizens[role_id]
+        if member_id not in members:
+            return
+        members.discard(member_id)
+        countries = self._member_countries.get(member_id)
+        if countries is not None:
+            countries.discard(role_id)
+            if not countries:
+                del self._member_countries[member_id]
+        self.citizen_debt[role_id] -= self.borrower_debt.get(member_id, 0)
+
+    def update_member(self, member_id, before_roles, after_roles):
+        """Suit les changements de rôles d'un membre pour les pays déjà relevés."""
+        member_id = str(member_id)
+        for role_id in before_roles ^ after_roles:
+            role_id = str(role_id)
+            if role_id not in self.citizens:
+                continue
+            if int(role_id) in after_roles:
+                self._join(member_id, role_id)
+            else:
+                self._leave(member_id, role_id)
+
+    def remove_member(self, member_id, role_ids):
+        """Retire un membre qui quitte le serveur des pays (`role_ids` : ses rôles sur ce serveur)."""
+        member_id = str(member_id)
+        for role_id in role_ids:
+            role_id = str(role_id)
+            if role_id in self.citizens:
+                self._leave(member_id, role_id)
+
+    def forget(self, role_id):
+        """Oublie les citoyens d'un rôle (supprimé, ou avant un nouveau relevé)."""
+        role_id = str(role_id)
+        for member_id in self.citizens.pop(role_id, ()):
+            countries = self._member_countries.get(member_id)
+            if countries is not None:
+                countries.discard(role_id)
+                if not countries:
+                    del self._member_countries[member_id]
+        self.citizen_debt.pop(role_id, None)
+
+    # --- Lecture ---
+
+    def debt(self, role_id):
+        """Dette totale d'un pays (ses emprunts et ceux de ses citoyens auprès de la Banque centrale)."""
+        role_id = str(role_id)
+        return self.country_debt.get(role_id, 0) + self.citizen_debt.get(role_id, 0)
@@ -0,0 +1,287 @@
+"""
+Niveaux par serveur, rangés en colonnes compactes.
+
+Chaque serveur a sa propre table (`levels_<guild_id>.json`), chargée au
+premier message ou à la première commande qui la demande. En mémoire, une
+table est faite de trois tableaux `array` alignés (ids triés, niveaux, XP) :
+environ 18 octets par membre au lieu d'un dictionnaire par membre. Un membre
+est retrouvé par dichotomie sur les ids ; seule l'arrivée d'un nouveau membre
+décale les colonnes. Avec le schéma relationnel, chaque table retient aussi
+les membres modifiés depuis la dernière synchronisation.
+"""
+import asyncio
+import bisect
+import os
+import threading
+from array import array
+
+from utils import codec
+from utils.ranking import RankedIndex, level_key
+
+INT64_MAX = 2 ** 63 - 1
+LEVEL_MAX = 2 ** 16 - 1
+
+
+class LevelTable:
+    """Niveaux et XP des membres d'un serveur : {id membre (int): (niveau, xp)}."""
+
+    __slots__ = ("guild_id", "ids", "levels", "xps", "dirty", "writing", "changed", "resync", "_ranking")
+
+    def __init__(self, guild_id, rows=()):
+        self.guild_id = guild_id
+        rows = sorted(rows)
+        self.ids = array("q", [row[0] for row in rows])
+        self.levels = array("H", [min(max(row[1], 1), LEVEL_MAX) for row in rows])
+        self.xps = array("q", [min(max(row[2], 0), INT64_MAX) for row in rows])
+        self.dirty = False
+        self.writing = False
+        # Membres modifiés depuis la dernière synchronisation (None : pas de suivi)
+        self.changed = None
+        # Toute la table est à renvoyer (premier envoi, colonnes remplacées)
+        self.resync = False
+        self._ranking = None
+
+    def track_changes(self):
+        """Active le suivi des membres modifiés ; le premier envoi porte sur toute la table."""
+        self.changed = set()
+        self.resync = True
+
+    def take_changes(self):
+        """Retourne (membres modifiés, toute la table à renvoyer) et les oublie."""
+        changed, resync = self.changed, self.resync
+        self.changed, self.resync = set(), False
+        return changed, resync
+
+    def _touch(self, user_id):
+        self.dirty = True
+        if self.changed is not None:
+            self.changed.add(user_id)
+
+    def _touch_all(self):
+        self.dirty = True
+        if self.changed is not None:
+            self.resync = True
+
+    def _find(self, user_id):
+        i = bisect.bisect_left(self.ids, user_id)
+        if i < len(self.ids) and self.ids[i] == user_id:
+            return i
+        return -1
+
+    def get(self, user_id):
+        """(niveau, xp) d'un membre, ou None s'il n'a jamais gagné d'XP sur ce serveur."""
+        i = self._find(user_id)
+        if i < 0:
+            return None
+        return self.levels[i], self.xps[i]
+
+    def set(self, user_id, level, xp):
+        """Enregistre le niveau et l'XP d'un membre (créé s'il est nouveau)."""
+        level = min(max(level, 1), LEVEL_MAX)
+        xp = min(max(xp, 0), INT64_MAX)
+        i = bisect.bisect_left(self.ids, user_id)
+        if i < len(self.ids) and self.ids[i] == user_id:
+            self.levels[i] = level
+            self.xps[i] = xp
+        else:
+            self.ids.insert(i, user_id)
+            self.levels.insert(i, level)
+            self.xps.insert(i, xp)
+        self._touch(user_id)
+        if self._ranking is not None:
+            self._ranking.update(user_id, (level, xp))
+
+    def ensure(self, user_id):
+        """Crée un membre au niveau 1 s'il n'existe pas encore. Retourne (niveau, xp)."""
+        entry = self.get(user_id)
+        if entry is None:
+            self.set(user_id, 1, 0)
+            entry = (1, 0)
+        return entry
+
+    def remove(self, user_id):
+        i = self._find(user_id)
+        if i < 0:
+            return False
+        del self.ids[i]
+        del self.levels[i]
+        del self.xps[i]
+        self._touch(user_id)
+        if self._ranking is not None:
+            self._ranking.discard(user_id)
+        return True
+
+    def replace(self, rows):
+        """Remplace tout le contenu de la table par des lignes (id, niveau, xp)."""
+        fresh = LevelTable(self.guild_id, rows)
+        self.ids, self.levels, self.xps = fresh.ids, fresh.levels, fresh.xps
+        self._touch_all()
+        if self._ranking is not None:
+            self._ranking.rebuild(self.as_dict())
+
+    def assign(self, levels, xps):
+        """Remplace les colonnes niveaux et XP (mêmes membres, même ordre) en une seule étape."""
+        if len(levels) != len(self.ids) or len(xps) != len(self.ids):
+            raise ValueError("colonnes de longueurs différentes")
+        self.levels, self.xps = array("H", levels), array("q", xps)
+        self._touch_all()
+        if self._ranking is not None:
+            self._ranking.rebuild(self.as_dict())
+
+    def rows(self):
+        """Lignes (id, niveau, xp), dans l'ordre des ids."""
+        return zip(self.ids, self.levels, self.xps)
+
+    def as_dict(self):
+        return {user_id: (level, xp) for user_id, level, xp in self.rows()}
+
+    def ranking(self):
+        """Classement du serveur, construit à la première consultation puis tenu à jour."""
+        if self._ranking is None:
+            self._ranking = RankedIndex(level_key)
+            self._ranking.rebuild(self.as_dict())
+        return self._ranking
+
+    def __contains__(self, user_id):
+        return self._find(user_id) >= 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def to_json(self):
+        return {"ids": self.ids.tolist(), "level": self.levels.tolist(), "xp": self.xps.tolist()}
+
+    @classmethod
+    def from_json(cls, guild_id, data):
+        return cls(guild_id, zip(data.get("ids", []), data.get("level", []), data.get("xp", [])))
+
+    @classmethod
+    def from_legacy(cls, guild_id, levels):
+        """Table construite depuis l'ancien format global {str(id): {"xp", "level"}}."""
+        rows = []
+        for user_id, entry in levels.items():
+            if str(user_id).isdigit() and isinstance(entry, dict):
+                rows.append((int(user_id), int(entry.get("level", 1)), int(entry.get("xp", 0))))
+        return cls(guild_id, rows)
+
+
+class GuildLevels:
+    """
+    Tables de niveaux de tous les serveurs, chargées à la demande.
+
+    Les modifications marquent seulement la table ; `save_dirty` programme
+    l'écriture des tables modifiées hors de la boucle d'événements et `flush`
+    les écrit immédiatement (arrêt, scripts). L'ancien `levels.json` global
+    (`legacy_file`) est importé une fois dans la table de `legacy_guild_id`.
+    Avec `track_changes`, les tables retiennent leurs membres modifiés pour
+    la synchronisation ligne par ligne (schéma relationnel).
+    """
+
+    def __init__(self, data_dir, prefix="levels_", on_write=None, legacy_file=None, legacy_guild_id=None,
+                 track_changes=False):
+        self.data_dir = data_dir
+        self.track_changes = track_changes
+        self.prefix = prefix
+        self.on_write = on_write
+        self.legacy_file = legacy_file
+        self.legacy_guild_id = int(legacy_guild_id) if legacy_guild_id else None
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def path(self, guild_id):
+        return os.path.join(self.data_dir, f"{self.prefix}{int(guild_id)}.json")
+
+    def guild_ids(self):
+        """Serveurs ayant une table, chargée ou seulement présente sur le disque."""
+        found = set(self._tables)
+        for filename in os.listdir(self.data_dir):
+            number = filename[len(self.prefix):-len(".json")]
+            if filename.startswith(self.prefix) and filename.endswith(".json") and number.isdigit():
+                found.add(int(number))
+        return sorted(found)
+
+    def get(self, guild_id):
+        """Table d'un serveur, lue sur le disque au premier accès."""
+        guild_id = int(guild_id)
+        table = self._tables.get(guild_id)
+        if table is None:
+            table = self._load(guild_id)
+            if self.track_changes:
+                table.track_changes()
+            self._tables[guild_id] = table
+        return table
+
+    def _load(self, guild_id):
+        path = self.path(guild_id)
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    return LevelTable.from_json(guild_id, codec.loads(f.read()))
+            except Exception as e:
+                print(f"[NIVEAUX] Lecture de {os.path.basename(path)} impossible : {e}")
+                return LevelTable(guild_id)
+        if guild_id == self.legacy_guild_id and self.legacy_file and os.path.exists(self.legacy_file):
+            try:
+                with open(self.legacy_file, "r") as f:
+                    table = LevelTable.from_legacy(guild_id, codec.loads(f.read()))
+            except Exception as e:
+                print(f"[NIVEAUX] Import de {os.path.basename(self.legacy_file)} impossible : {e}")
+                return LevelTable(guild_id)
+            table.dirty = True
+            print(f"[NIVEAUX] {len(table)} membre(s) importé(s) depuis {os.path.basename(self.legacy_file)} "
+                  f"pour le serveur {guild_id}")
+            return table
+        return LevelTable(guild_id)
+
+    def loaded(self):
+        return list(self._tables.values())
+
+    # --- Sauvegarde ---
+
+    def _write(self, guild_id, payload):
+        path = self.path(guild_id)
+        with self._lock:
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w") as f:
+                f.write(codec.dumps(payload))
+            os.replace(tmp_path, path)
+        if self.on_write:
+            self.on_write(path)
+
+    def save_dirty(self):
+        """Programme l'écriture des tables modifiées (immédiate hors de la boucle d'événements)."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        for table in self._tables.values():
+            if table.dirty and not table.writing:
+                table.writing = True
+                loop.create_task(self._writer(table))
+
+    async def _writer(self, table):
+        loop = asyncio.get_running_loop()
+        try:
+            while table.dirty:
+                table.dirty = False
+                # Copie des colonnes dans la boucle, écriture du fichier hors de la boucle
+                payload = table.to_json()
+                await loop.run_in_executor(None, self._write, table.guild_id, payload)
+        except Exception as e:
+            print(f"[NIVEAUX] Erreur lors de la sauvegarde du serveur {table.guild_id} : {e}")
+        finally:
+            table.writing = False
+
+    def flush(self):
+        """Écrit immédiatement toutes les tables modifiées (appel bloquant). Retourne le nombre écrit."""
+        written = 0
+        for table in list(self._tables.values()):
+            if table.dirty:
+                table.dirty = False
+                try:
+                    self._write(table.guild_id, table.to_json())
+                    written += 1
+                except Exception as e:
+                    print(f"[NIVEAUX] Erreur lors de la sauvegarde du serveur {table.guild_id} : {e}")
+        return written
@@ -0,0 +1,162 @@
+"""
+Contrôle d'intégrité incrémental des données économiques.
+
+Les valeurs sont vérifiées au moment de l'écriture (type, signe, bornes) au
+lieu d'un parcours complet au démarrage. Une entrée en infraction rejoint
+l'ensemble « à revérifier » (persistant) ; la tâche périodique ne contrôle
+que ces entrées. Des compteurs gardent le nombre de contrôles et
+d'infractions par règle.
+"""
+import threading
+
+# Au-delà, le solde d'un rôle (ID de 18 chiffres ou plus) est considéré comme suspect
+BALANCE_SUSPECT_THRESHOLD = 3000000000
+LOAN_REQUIRED_FIELDS = ("demandeur_id", "somme", "taux")
+LOAN_NUMERIC_FIELDS = ("somme", "taux", "restant")
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def check_balance(account, amount):
+    """Infractions d'un solde : type, signe et plafond."""
+    if not _is_number(amount):
+        return ["type"]
+    issues = []
+    if amount < 0:
+        issues.append("negatif")
+    if len(account) >= 18 and amount > BALANCE_SUSPECT_THRESHOLD:
+        issues.append("plafond")
+    return issues
+
+
+def check_loan(key, loan):
+    """Infractions d'un emprunt : structure, champs numériques et signe."""
+    if not isinstance(loan, dict):
+        return ["type"]
+    issues = []
+    if not all(field in loan for field in LOAN_REQUIRED_FIELDS):
+        issues.append("incomplet")
+    values = [loan[field] for field in LOAN_NUMERIC_FIELDS if field in loan]
+    if not all(_is_number(v) for v in values):
+        issues.append("type")
+    elif any(v < 0 for v in values):
+        issues.append("negatif")
+    return issues
+
+
+class IntegrityMonitor:
+    """
+    Règles de validation par collection, ensemble à revérifier et compteurs.
+
+    `state` est un dictionnaire persistant : {"dirty": {collection: {clé: [infractions]}},
+    "counters": {...}, "scanned": bool}. `on_change` est appelé quand il faut le sauvegarder.
+    """
+
+    def __init__(self, state, on_change=None):
+        self.state = state
+        self.on_change = on_change
+        self._rules = {}
+        self._lock = threading.Lock()
+
+    def register(self, collection, check, key=None):
+        """Déclare la règle d'une collection ; `key` donne la clé d'un élément pour les collections en liste."""
+        self._rules[collection] = (check, key)
+
+    @property
+    def dirty(self):
+        return self.state.setdefault("dirty", {})
+
+    @property
+    def counters(self):
+        return self.state.setdefault("counters", {})
+
+    @property
+    def scanned(self):
+        """Vrai une fois qu'un parcours complet a servi de point de départ."""
+        return self.state.get("scanned", False)
+
+    def _items(self, collection, data):
+        _, key = self._rules[collection]
+        if key is not None:
+            return {key(item): item for item in data}
+        return data
+
+    def validate(self, collection, data, keys):
+        """
+        Vérifie les entrées `keys` de `data` (une clé absente est considérée comme supprimée).
+
+        Retourne {clé: infractions} pour les entrées en infraction.
+        """
+        check, _ = self._rules[collection]
+        items = self._items(collection, data)
+        found = {}
+        changed = False
+        with self._lock:
+            pending = self.dirty.setdefault(collection, {})
+            counters = self.counters
+            for k in keys:
+                counters["controles"] = counters.get("controles", 0) + 1
+                issues = check(k, items[k]) if k in items else []
+                if issues:
+                    found[k] = issues
+                    counters["infractions"] = counters.get("infractions", 0) + 1
+                    for issue in issues:
+                        rule = f"{collection}.{issue}"
+                        counters[rule] = counters.get(rule, 0) + 1
+                    if pending.get(k) != issues:
+                        pending[k] = issues
+                        changed = True
+                elif k in pending:
+                    del pending[k]
+                    changed = True
+            if not pending:
+                self.dirty.pop(collection, None)
+        if changed and self.on_change:
+            self.on_change()
+        return found
+
+    def mark(self, collection, keys):
+        """Ajoute des entrées à revérifier sans les contrôler tout de suite."""
+        with self._lock:
+            pending = self.dirty.setdefault(collection, {})
+            for k in keys:
+                pending.setdefault(k, [])
+        if self.on_change:
+            self.on_change()
+
+    def resolve(self, collection, keys):
+        """Retire des entrées de l'ensemble à revérifier (infraction expliquée, par exemple par l'historique)."""
+        changed = False
+        with self._lock:
+            pending = self.dirty.get(collection, {})
+            for k in keys:
+                if k in pending:
+                    del pending[k]
+                    changed = True
+            if not pending:
+                self.dirty.pop(collection, None)
+        if changed and self.on_change:
+            self.on_change()
+
+    def pending(self, collection):
+        return list(self.dirty.get(collection, {}))
+
+    def recheck(self, collection, data):
+        """Revérifie uniquement les entrées de l'ensemble à revérifier."""
+        return self.validate(collection, data, self.pending(collection))
+
+    def full_scan(self, collection, data):
+        """Parcours complet d'une collection (premier démarrage ou demande explicite)."""
+        found = self.validate(collection, data, list(self._items(collection, data)))
+        self.state["scanned"] = True
+        return found
+
+    def stats(self):
+        """Compteurs et nombre d'entrées à revérifier par collection."""
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "pending": {collection: len(keys) for collection, keys in self.dirty.items()},
+            }
@@ -0,0 +1,194 @@
+"""
+Journal des transactions en ajout seul (une transaction JSON par ligne).
+
+Chaque ajout écrit une seule ligne en fin de segment, sans relire l'historique.
+Quand un segment dépasse sa taille maximale, un nouveau est ouvert : les
+anciens ne changent plus et l'historique complet est conservé. Les dernières
+transactions restent en mémoire pour les consultations récentes.
+"""
+import os
+import threading
+from collections import deque
+
+from utils import codec
+from utils.wal import trim_torn_tail
+
+SEGMENT_MAX_BYTES = int(os.getenv("JOURNAL_SEGMENT_MAX_BYTES", str(256 * 1024)))
+TAIL_SIZE = 1000
+
+
+class TransactionJournal:
+    """Journal segmenté `<prefix>-<premier numéro>.jsonl` dans le dossier de données."""
+
+    def __init__(self, data_dir, prefix="transactions", segment_max_bytes=SEGMENT_MAX_BYTES,
+                 tail_size=TAIL_SIZE, on_write=None):
+        self.data_dir = data_dir
+        self.prefix = prefix
+        self.segment_max_bytes = segment_max_bytes
+        self.on_write = on_write
+        self.tail = deque(maxlen=tail_size)
+        self.next_seq = 1
+        self._path = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    # --- Segments ---
+
+    def _segment_path(self, first_seq):
+        return os.path.join(self.data_dir, f"{self.prefix}-{first_seq:010d}.jsonl")
+
+    def segments(self):
+        """Chemins des segments, du plus ancien au plus récent."""
+        head = f"{self.prefix}-"
+        found = []
+        for filename in os.listdir(self.data_dir):
+            if filename.startswith(head) and filename.endswith(".jsonl"):
+                number = filename[len(head):-len(".jsonl")]
+                if number.isdigit():
+                    found.append((int(number), os.path.join(self.data_dir, filename)))
+        return [path for _, path in sorted(found)]
+
+    @staticmethod
+    def _read_segment(path):
+        records = []
+        with open(path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(codec.loads(line))
+                except ValueError:
+                    # Dernière ligne tronquée par un arrêt brutal : ignorée
+                    print(f"[JOURNAL] Ligne illisible ignorée dans {os.path.basename(path)}")
+        return records
+
+    def open(self, legacy_file=None):
+        """
+        Charge la fin du journal en mémoire et repère le prochain numéro.
+
+        Si aucun segment n'existe encore, `legacy_file` (ancien transactions.json)
+        est importé une fois dans le journal.
+        """
+        with self._lock:
+            segments = self.segments()
+            if not segments and legacy_file and os.path.exists(legacy_file):
+                self._import_legacy(legacy_file)
+                segments = self.segments()
+            self.tail.clear()
+            self.next_seq = 1
+            if segments:
+                last = segments[-1]
+                # Transaction à moitié écrite par un arrêt brutal : la suivante ne doit pas s'y coller
+                trim_torn_tail(last)
+                first_seq = int(os.path.basename(last)[len(self.prefix) + 1:-len(".jsonl")])
+                records = self._read_segment(last)
+                self.next_seq = records[-1]["seq"] + 1 if records else first_seq
+                # Remonte les segments jusqu'à remplir la fin en mémoire
+                chunks = [records]
+                count = len(records)
+                for path in reversed(segments[:-1]):
+                    if count >= self.tail.maxlen:
+                        break
+                    chunk = self._read_segment(path)
+                    chunks.append(chunk)
+                    count += len(chunk)
+                for chunk in reversed(chunks):
+                    self.tail.extend(chunk)
+                self._path = last
+        return self
+
+    def _import_legacy(self, legacy_file):
+        try:
+            with open(legacy_file, "r") as f:
+                records = codec.loads(f.read())
+        except Exception as e:
+            print(f"[JOURNAL] Import de {os.path.basename(legacy_file)} impossible : {e}")
+            return
+        if not isinstance(records, list):
+            return
+        for record in records:
+            self._write_record(record)
+        self._close_file()
+        print(f"[JOURNAL] {len(records)} transaction(s) importée(s) depuis {os.path.basename(legacy_file)}")
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write_record(self, record):
+        record = dict(record, seq=self.next_seq)
+        if self._path is None or (os.path.exists(self._path) and os.path.getsize(self._path) >= self.segment_max_bytes):
+            # Rotation : nouveau segment nommé d'après son premier numéro
+            self._close_file()
+            self._path = self._segment_path(self.next_seq)
+        if self._file is None:
+            trim_torn_tail(self._path)
+            self._file = open(self._path, "a")
+        self._file.write(codec.dumps(record) + "\n")
+        self._file.flush()
+        self.next_seq += 1
+        return record
+
+    # --- API ---
+
+    def append(self, record):
+        """Ajoute une transaction en fin de journal et la retourne avec son numéro `seq`."""
+        with self._lock:
+            record = self._write_record(record)
+            self.tail.append(record)
+            path = self._path
+        if self.on_write:
+            self.on_write(path)
+        return record
+
+    def recent(self, limit=None):
+        """Dernières transactions (les plus récentes en fin de liste)."""
+        records = list(self.tail)
+        return records if limit is None else records[-limit:]
+
+    def __iter__(self):
+        """Parcourt l'historique complet, segment par segment."""
+        for path in self.segments():
+            yield from self._read_segment(path)
+
+    def batches_after(self, seq):
+        """
+        Parcourt par paquets (un segment à la fois) les transactions de numéro supérieur à `seq`.
+
+        Les segments entièrement antérieurs sont sautés sans être lus.
+        """
+        head = len(self.prefix) + 1
+        segments = self.segments()
+        for i, path in enumerate(segments):
+            if i + 1 < len(segments):
+                next_first = int(os.path.basename(segments[i + 1])[head:-len(".jsonl")])
+                if next_first <= seq + 1:
+                    continue
+            records = self._read_segment(path)
+            if records and records[0].get("seq", 0) <= seq:
+                records = [r for r in records if r.get("seq", 0) > seq]
+            if records:
+                yield records
+
+    def clear(self):
+        """Supprime tout l'historique. Retourne les noms des segments supprimés."""
+        with self._lock:
+            self._close_file()
+            removed = []
+            for path in self.segments():
+                os.remove(path)
+                removed.append(os.path.basename(path))
+            self.tail.clear()
+            # Segment vide : la numérotation continue et l'ancien fichier n'est pas réimporté
+            self._path = self._segment_path(self.next_seq)
+            open(self._path, "w").close()
+            path = self._path
+        if self.on_write:
+            self.on_write(path)
+        return [name for name in removed if name != os.path.basename(path)]
+
+    def close(self):
+        with self._lock:
+            self._close_file()
@@ -0,0 +1,212 @@
+"""
+Grand livre en partie double de l'économie.
+
+Tout mouvement d'argent est une écriture composée de plusieurs lignes
+(compte, montant) dont la somme est nulle. Les comptes des pays et des
+joueurs vivent dans le dictionnaire des soldes ; la Banque centrale (« BOT »,
+qui émet la monnaie) et le compte de destruction sont des comptes système.
+Les soldes sont tenus à jour à chaque écriture : leur lecture reste en O(1).
+Chaque écriture est ajoutée au journal des transactions, ce qui permet de
+rejouer tout l'historique pour l'audit. Les montants sont des entiers : la
+somme des lignes d'une écriture est exacte, sans arrondi.
+"""
+import time
+
+CENTRAL_BANK = "BOT"
+DESTROYED = "DETRUIT"
+SYSTEM_ACCOUNTS = (CENTRAL_BANK, DESTROYED)
+
+
+class LedgerError(Exception):
+    """Erreur du grand livre."""
+
+
+class InsufficientFunds(LedgerError):
+    """Levée quand une écriture rendrait négatif le solde d'un compte non système."""
+
+    def __init__(self, account, balance, amount):
+        super().__init__(f"Solde insuffisant pour {account} : {balance} < {amount}")
+        self.account = account
+        self.balance = balance
+        self.amount = amount
+
+
+class UnbalancedPosting(LedgerError):
+    """Levée quand la somme des lignes d'une écriture n'est pas nulle."""
+
+
+class Ledger:
+    """
+    Écritures atomiques multi-lignes.
+
+    Les écritures sont passées depuis la boucle d'événements, sans point
+    d'attente : aucune autre écriture ne peut s'intercaler, sans verrou.
+    """
+
+    def __init__(self, balances, state, journal, on_post=None):
+        # balances : soldes des pays et joueurs ; state : {"system": {...}} persistant
+        self.balances = balances
+        self.state = state
+        self.journal = journal
+        self.on_post = on_post
+
+    @property
+    def system(self):
+        return self.state.setdefault("system", {})
+
+    def balance(self, account):
+        """Solde d'un compte (O(1))."""
+        if account in SYSTEM_ACCOUNTS:
+            return self.system.get(account, 0)
+        return self.balances.get(account, 0)
+
+    def _apply(self, account, delta):
+        if account in SYSTEM_ACCOUNTS:
+            self.system[account] = self.system.get(account, 0) + delta
+        else:
+            self.balances[account] = self.balances.get(account, 0) + delta
+
+    def post(self, legs, transaction_type, guild_id=None, check_funds=True):
+        """
+        Passe une écriture : `legs` est une liste de (compte, montant signé) de somme nulle.
+
+        Si `check_funds`, aucun compte non système ne peut devenir négatif.
+        Retourne l'enregistrement ajouté au journal.
+        """
+        merged = {}
+        for account, delta in legs:
+            if not isinstance(delta, int) or isinstance(delta, bool):
+                raise LedgerError(f"Montant invalide pour {account} (entier attendu) : {delta!r}")
+            merged[str(account)] = merged.get(str(account), 0) + delta
+        merged = {a: d for a, d in merged.items() if d}
+        if sum(merged.values()) != 0:
+            raise UnbalancedPosting(f"Écriture déséquilibrée : {merged}")
+        if not merged:
+            return None
+
+        if check_funds:
+            for account, delta in merged.items():
+                if delta < 0 and account not in SYSTEM_ACCOUNTS and self.balance(account) + delta < 0:
+                    raise InsufficientFunds(account, self.balance(account), -delta)
+        for account, delta in merged.items():
+            self._apply(account, delta)
+        debits = [a for a, d in merged.items() if d < 0]
+        credits = [a for a, d in merged.items() if d > 0]
+        record = self.journal.append({
+            "from_id": debits[0] if len(debits) == 1 else None,
+            "to_id": credits[0] if len(credits) == 1 else None,
+            "amount": sum(d for d in merged.values() if d > 0),
+            "timestamp": int(time.time()),
+            "type": transaction_type,
+            "guild_id": guild_id,
+            "legs": [[a, d] for a, d in merged.items()],
+        })
+        if self.on_post:
+            self.on_post(record)
+        return record
+
+    def transfer(self, source, destination, amount, transaction_type, guild_id=None, check_funds=True):
+        """Virement simple de `source` vers `destination`."""
+        return self.post([(source, -amount), (destination, amount)], transaction_type, guild_id, check_funds)
+
+    def issue(self, account, amount, transaction_type, guild_id=None):
+        """Création monétaire : la Banque centrale crédite un compte."""
+        return self.transfer(CENTRAL_BANK, account, amount, transaction_type, guild_id)
+
+    def destroy(self, account, amount, transaction_type, guild_id=None):
+        """Retire de l'argent de la circulation."""
+        return self.transfer(account, DESTROYED, amount, transaction_type, guild_id)
+
+    def set_balance(self, account, amount, transaction_type, guild_id=None):
+        """Amène un compte à un solde donné ; la différence est émise ou détruite."""
+        delta = amount - self.balance(account)
+        if isinstance(delta, float) and delta.is_integer():
+            # Ancien solde enregistré en flottant (ex. 100.0)
+            delta = int(delta)
+        if delta > 0:
+            return self.issue(account, delta, transaction_type, guild_id)
+        if delta < 0:
+            return self.transfer(account, DESTROYED, -delta, transaction_type, guild_id, check_funds=False)
+        return None
+
+    def close_account(self, account, transaction_type, guild_id=None):
+        """Détruit le solde restant d'un compte puis le supprime."""
+        record = self.set_balance(account, 0, transaction_type, guild_id)
+        self.balances.pop(str(account), None)
+        return record
+
+    def open(self, transaction_type="ouverture"):
+        """
+        Écrit un bilan d'ouverture (soldes absolus de tous les comptes) dans le journal.
+
+        L'audit repart du dernier bilan : à faire au premier démarrage du grand
+        livre et après l'effacement de l'historique (réinitialisation de l'économie).
+        """
+        opening = {a: b for a, b in self.balances.items() if b}
+        opening.update({a: b for a, b in self.system.items() if b})
+        record = self.journal.append({
+            "from_id": None,
+            "to_id": None,
+            "amount": 0,
+            "timestamp": int(time.time()),
+            "type": transaction_type,
+            "guild_id": None,
+            "opening": opening,
+        })
+        self.state["opened_seq"] = record["seq"]
+        return record
+
+    def reset(self):
+        """Remet les comptes système à zéro (réinitialisation de l'économie)."""
+        self.system.clear()
+        self.state.pop("opened_seq", None)
+
+    def capture(self):
+        """
+        Copie des soldes et numéro de la dernière écriture, à passer à `audit`.
+
+        À prendre dans la boucle d'événements : l'audit peut ensuite tourner
+        dans un thread pendant que de nouvelles écritures sont passées.
+        """
+        balances = {a: b for a, b in self.balances.items() if b}
+        balances.update(self.system)
+        return {"balances": balances, "seq": self.journal.next_seq - 1}
+
+    def audit(self, captured=None, records=None):
+        """
+        Rejoue l'historique en bloc depuis le dernier bilan d'ouverture et le compare aux soldes capturés.
+
+        Retourne {"postings", "discrepancies": {compte: (attendu, actuel)}, "unbalanced": [seq]}.
+        """
+        if captured is None:
+            captured = self.capture()
+        if records is None:
+            records = self.journal
+        actual = captured["balances"]
+        expected = {}
+        postings = 0
+        unbalanced = []
+        for record in records:
+            if record.get("seq", 0) > captured["seq"]:
+                # Écritures passées après la copie des soldes
+                break
+            if "opening" in record:
+                expected = dict(record["opening"])
+                postings = 0
+                unbalanced = []
+                continue
+            legs = record.get("legs")
+            if not legs:
+                continue
+            postings += 1
+            total = 0
+            for account, delta in legs:
+                expected[account] = expected.get(account, 0) + delta
+                total += delta
+            if total:
+                unbalanced.append(record.get("seq"))
+        discrepancies = {}
+        for account in set(expected) | set(actual):
+            if expected.get(account, 0) != actual.get(account, 0):
+                discrepancies[account] = (expected.get(account, 0), actual.get(account, 0))
+        return {"postings": postings, "discrepancies": discrepancies, "unbalanced": unbalanced}
@@ -0,0 +1,105 @@
+"""
+Courbes de niveaux : table des seuils d'XP calculée une seule fois.
+
+Une courbe donne l'XP à gagner pour passer du niveau n au niveau n+1. Les
+seuils et leurs cumuls sont précalculés jusqu'au niveau maximal : le seuil
+d'un niveau se lit en O(1) et le niveau correspondant à un total d'XP se
+trouve par dichotomie. Quand la courbe change, `migrate_levels` recalcule
+tous les membres d'un coup (avec NumPy s'il est installé).
+"""
+import bisect
+import os
+
+try:
+    import numpy as np
+except ImportError:  # NumPy est optionnel : repli sur une boucle Python
+    np = None
+
+MAX_LEVEL = 100
+
+
+def _doubling(level):
+    # Courbe historique : 10, 20, puis doublement à chaque niveau
+    return 10 if level <= 1 else 20 * 2 ** (level - 2)
+
+
+def _linear(level):
+    return 100 * level
+
+
+def _quadratic(level):
+    return 5 * level * level + 50 * level + 100
+
+
+CURVES = {
+    "doublement": _doubling,
+    "lineaire": _linear,
+    "quadratique": _quadratic,
+}
+DEFAULT_CURVE = os.getenv("LEVEL_CURVE", "doublement")
+
+
+class LevelCurve:
+    """Seuils (`thresholds[n]` : XP du niveau n au niveau n+1) et cumuls (`totals[n]` : XP totale pour atteindre n)."""
+
+    def __init__(self, name, max_level=MAX_LEVEL):
+        if name not in CURVES:
+            raise ValueError(f"Courbe de niveaux inconnue : {name} (disponibles : {', '.join(CURVES)})")
+        per_level = CURVES[name]
+        self.name = name
+        self.max_level = max_level
+        self.thresholds = [0] + [per_level(level) for level in range(1, max_level + 1)]
+        self.totals = [0, 0]
+        for level in range(1, max_level):
+            self.totals.append(self.totals[-1] + self.thresholds[level])
+
+    def xp_for_level(self, level):
+        """XP à gagner au niveau `level` pour passer au suivant ; None au-delà du niveau maximal."""
+        if level > self.max_level:
+            return None
+        return self.thresholds[max(level, 1)]
+
+    def total_xp(self, level, xp):
+        """XP totale d'un membre à partir de son niveau et de sa progression."""
+        return self.totals[min(max(level, 1), self.max_level)] + xp
+
+    def level_from_total(self, total):
+        """(niveau, progression dans ce niveau) pour une XP totale, en O(log n)."""
+        level = max(bisect.bisect_right(self.totals, total) - 1, 1)
+        return level, total - self.totals[level]
+
+    def fits_int64(self):
+        return self.totals[-1] + self.thresholds[-1] < 2 ** 63
+
+
+def get_curve(name=None):
+    return LevelCurve(name or DEFAULT_CURVE)
+
+
+def migrate_levels(levels, old_curve, new_curve):
+    """
+    Recalcule niveau et progression de tous les membres (`levels` : {id: {"xp", "level"}}) pour une nouvelle courbe.
+
+    L'XP totale de chaque membre est conservée. Retourne le nombre de membres dont le niveau a changé.
+    """
+    ids = list(levels)
+    if not ids:
+        return 0
+    old_levels = [min(max(levels[i].get("level", 1), 1), old_curve.max_level) for i in ids]
+    xps = [levels[i].get("xp", 0) for i in ids]
+    if np is not None and old_curve.fits_int64() and new_curve.fits_int64():
+        totals = np.asarray(old_curve.totals, dtype=np.int64)[old_levels] + np.asarray(xps, dtype=np.int64)
+        new_totals = np.asarray(new_curve.totals, dtype=np.int64)
+        new_levels = np.maximum(np.searchsorted(new_totals, totals, side="right") - 1, 1)
+        new_xps = totals - new_totals[new_levels]
+        results = zip(new_levels.tolist(), new_xps.tolist())
+    else:
+        # Courbe trop raide pour des entiers 64 bits (ou NumPy absent) : entiers Python
+        results = (new_curve.level_from_total(old_curve.total_xp(level, xp)) for level, xp in zip(old_levels, xps))
+    changed = 0
+    for user_id, old_level, (level, xp) in zip(ids, old_levels, results):
+        if level != old_level:
+            changed += 1
+        levels[user_id]["level"] = level
+        levels[user_id]["xp"] = xp
+    return changed
@@ -0,0 +1,127 @@
+"""
+Carnet des emprunts : la liste `loans` indexée par id, demandeur et prêteur.
+
+La liste reste la copie maîtresse sauvegardée (loans.json) ; le carnet tient
+à côté la position de chaque emprunt dans la liste, les emprunts de chaque
+demandeur et de chaque prêteur (rôle du pays, ou None pour la Banque
+centrale) et le reste à rembourser de chaque emprunt. Une suppression
+remplace l'emprunt par le dernier de la liste : elle se fait en O(1). Les
+emprunts d'un demandeur restent dans leur ordre de création, ce qui garde
+la numérotation de /liste_emprunt.
+"""
+from utils.debts import loan_debt
+
+
+def _repaid(loan):
+    return sum(r.get("montant", 0) for r in loan.get("remboursements", []))
+
+
+class LoanBook:
+    """Index des emprunts de `loans` ; toutes les modifications de la liste passent par lui."""
+
+    def __init__(self, loans, key):
+        self.loans = loans
+        self.key = key
+        self._position = {}
+        self._by_id = {}
+        self._by_borrower = {}
+        self._by_lender = {}
+        self._outstanding = {}
+
+    def rebuild(self):
+        """Reconstruit les index à partir de la liste (au chargement, après un remplacement complet)."""
+        self._position = {}
+        self._by_id = {}
+        self._by_borrower = {}
+        self._by_lender = {}
+        self._outstanding = {}
+        # Ordre de création : la liste a pu être réordonnée par les suppressions
+        order = sorted(range(len(self.loans)), key=lambda i: (self.loans[i].get("date_debut") or 0, i))
+        for i in order:
+            loan_id = self.key(self.loans[i])
+            if loan_id in self._by_id:
+                print(f"[EMPRUNTS] Emprunt en double ignoré par l'index : {loan_id}")
+                continue
+            self._index(loan_id, self.loans[i], i)
+
+    def _index(self, loan_id, loan, position):
+        self._position[loan_id] = position
+        self._by_id[loan_id] = loan
+        self._by_borrower.setdefault(loan.get("demandeur_id"), {})[loan_id] = loan
+        self._by_lender.setdefault(loan.get("role_id"), {})[loan_id] = loan
+        self._outstanding[loan_id] = loan_debt(loan) - _repaid(loan)
+
+    def _unindex(self, loan_id, loan):
+        del self._position[loan_id]
+        del self._by_id[loan_id]
+        del self._outstanding[loan_id]
+        for index, owner in ((self._by_borrower, loan.get("demandeur_id")), (self._by_lender, loan.get("role_id"))):
+            loans = index.get(owner)
+            if loans is not None:
+                loans.pop(loan_id, None)
+                if not loans:
+                    del index[owner]
+
+    # --- Modifications ---
+
+    def add(self, loan):
+        """Ajoute un emprunt en fin de liste et retourne son id."""
+        loan_id = self.key(loan)
+        if loan_id in self._by_id:
+            raise ValueError(f"emprunt déjà enregistré : {loan_id}")
+        self.loans.append(loan)
+        self._index(loan_id, loan, len(self.loans) - 1)
+        return loan_id
+
+    def remove(self, loan_id):
+        """Retire un emprunt en O(1) : le dernier de la liste prend sa place."""
+        loan = self._by_id[loan_id]
+        position = self._position[loan_id]
+        last = self.loans.pop()
+        if last is not loan:
+            self.loans[position] = last
+            last_id = self.key(last)
+            if self._by_id.get(last_id) is last:
+                self._position[last_id] = position
+        self._unindex(loan_id, loan)
+        return loan
+
+    def repay(self, loan_id, amount, date):
+        """Enregistre un remboursement. Retourne le reste à rembourser ; l'emprunt soldé est retiré."""
+        loan = self._by_id[loan_id]
+        loan.setdefault("remboursements", []).append({"montant": amount, "date": date})
+        self._outstanding[loan_id] -= amount
+        outstanding = self._outstanding[loan_id]
+        if outstanding <= 0:
+            self.remove(loan_id)
+        return outstanding
+
+    def clear(self):
+        self.loans.clear()
+        self.rebuild()
+
+    # --- Lecture ---
+
+    def get(self, loan_id):
+        return self._by_id.get(loan_id)
+
+    def outstanding(self, loan_id):
+        """Reste à rembourser (intérêts compris), tenu à jour à chaque remboursement."""
+        return self._outstanding[loan_id]
+
+    def by_borrower(self, user_id):
+        """Emprunts d'un demandeur, dans l'ordre de création (numérotation de /liste_emprunt)."""
+        return list(self._by_borrower.get(str(user_id), {}).values())
+
+    def by_lender(self, role_id):
+        """Emprunts accordés par un pays (None : Banque centrale)."""
+        return list(self._by_lender.get(None if role_id is None else str(role_id), {}).values())
+
+    def total_debt(self):
+        return sum(loan_debt(loan) for loan in self._by_id.values())
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, loan_id):
+        return loan_id in self._by_id
@@ -0,0 +1,102 @@
+"""
+Manifeste des fichiers déjà sauvegardés dans PostgreSQL.
+
+Pour chaque fichier, on retient l'empreinte SHA-256 du contenu envoyé ainsi que
+sa taille et sa date de modification. Un fichier dont la taille et la date n'ont
+pas bougé n'est même pas relu ; sinon son empreinte est recalculée et comparée.
+"""
+import hashlib
+import json
+import os
+
+MANIFEST_FILENAME = ".backup_manifest"
+
+
+def content_digest(content):
+    """Retourne l'empreinte SHA-256 d'un contenu texte."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class BackupManifest:
+    """Empreintes et dates de modification des fichiers déjà envoyés."""
+
+    def __init__(self, data_dir):
+        self.path = os.path.join(data_dir, MANIFEST_FILENAME)
+        self.entries = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+        except Exception as e:
+            print(f"[MANIFEST] Manifeste illisible, il sera reconstruit : {e}")
+            self.entries = {}
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"[MANIFEST] Erreur lors de l'écriture du manifeste : {e}")
+
+    def scan(self, data_dir, filenames):
+        """
+        Sépare les fichiers modifiés de ceux déjà à jour dans PostgreSQL.
+
+        Retourne (changed, stats) où changed est une liste de dict
+        {filename, content, digest, mtime, size} et stats contient
+        rows_skipped et bytes_skipped.
+        """
+        changed = []
+        stats = {"rows_skipped": 0, "bytes_skipped": 0}
+        for filename in filenames:
+            filepath = os.path.join(data_dir, filename)
+            try:
+                st = os.stat(filepath)
+            except FileNotFoundError:
+                continue
+            known = self.entries.get(filename)
+            if known and known.get("mtime") == st.st_mtime_ns and known.get("size") == st.st_size:
+                stats["rows_skipped"] += 1
+                stats["bytes_skipped"] += st.st_size
+                continue
+            try:
+                with open(filepath, "r") as f:
+                    content = f.read()
+            except Exception as e:
+                print(f"[MANIFEST] Lecture impossible de {filename} : {e}")
+                continue
+            digest = content_digest(content)
+            entry = {"filename": filename, "content": content, "digest": digest,
+                     "mtime": st.st_mtime_ns, "size": st.st_size}
+            if known and known.get("digest") == digest:
+                # Fichier réécrit à l'identique : on met juste la date à jour
+                self.record([entry])
+                stats["rows_skipped"] += 1
+                stats["bytes_skipped"] += st.st_size
+                continue
+            changed.append(entry)
+        return changed, stats
+
+    def record(self, entries):
+        """Enregistre les fichiers effectivement envoyés."""
+        for entry in entries:
+            self.entries[entry["filename"]] = {
+                "digest": entry["digest"],
+                "mtime": entry["mtime"],
+                "size": entry["size"],
+            }
+
+    def forget(self, *filenames):
+        """Oublie des fichiers (par exemple après suppression de leur ligne dans PostgreSQL)."""
+        removed = False
+        for filename in filenames:
+            if self.entries.pop(os.path.basename(filename), None) is not None:
+                removed = True
+        if removed:
+            self.save()
@@ -0,0 +1,101 @@
+"""
+Synchronisation différée (write-behind) des fichiers JSON vers PostgreSQL.
+
+Les fichiers modifiés sont seulement marqués comme « sales » ; une tâche
+périodique les envoie ensuite par lot, via le pool de connexions partagé,
+au lieu de relancer un interpréteur Python à chaque événement.
+"""
+import os
+import threading
+
+from utils import db
+from utils.manifest import BackupManifest
+
+UPSERT_SQL = """
+    INSERT INTO json_backups (filename, content)
+    VALUES (%s, %s)
+    ON CONFLICT (filename) DO UPDATE SET content = EXCLUDED.content
+"""
+
+
+class PostgresSync:
+    """Regroupe les fichiers JSON modifiés et les envoie par lot dans json_backups."""
+
+    def __init__(self, data_dir, exclude=(), prepare=None):
+        # exclude : noms de fichiers, ou fonction qui indique si un nom est exclu
+        self.data_dir = data_dir
+        # Appelé avec les fichiers à envoyer avant leur lecture (export du support SQLite)
+        self.prepare = prepare
+        # Fichiers synchronisés autrement (schéma relationnel) : jamais envoyés en blob
+        self.exclude = exclude if callable(exclude) else frozenset(exclude).__contains__
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.manifest = BackupManifest(data_dir)
+
+    def mark_dirty(self, *filenames):
+        """Marque des fichiers comme modifiés (tous les *.json si aucun n'est précisé)."""
+        if not filenames:
+            filenames = [f for f in os.listdir(self.data_dir) if f.endswith(".json")]
+        with self._lock:
+            for filename in filenames:
+                filename = os.path.basename(filename)
+                if not self.exclude(filename):
+                    self._dirty.add(filename)
+
+    def has_pending(self):
+        """Indique si des fichiers attendent d'être synchronisés."""
+        with self._lock:
+            return bool(self._dirty)
+
+    def flush(self):
+        """Envoie immédiatement les fichiers en attente (appel bloquant). Retourne le nombre envoyé."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._dirty = self._dirty, set()
+            if not pending:
+                return 0
+            if not db.is_enabled():
+                return 0
+            if self.prepare:
+                try:
+                    self.prepare(*pending)
+                except Exception as e:
+                    print(f"[PG SYNC] Export des fichiers impossible : {e}")
+
+            # Seuls les fichiers dont l'empreinte a changé sont envoyés
+            changed, stats = self.manifest.scan(self.data_dir, sorted(pending))
+            if not changed:
+                self.manifest.save()
+                return 0
+            rows = [(entry["filename"], entry["content"]) for entry in changed]
+
+            try:
+                with db.connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.executemany(UPSERT_SQL, rows)
+            except Exception as e:
+                print(f"[PG SYNC] Échec de la synchronisation ({len(rows)} fichier(s)) : {e}")
+                # Les fichiers seront renvoyés au prochain passage
+                with self._lock:
+                    self._dirty.update(pending)
+                return 0
+
+            self.manifest.record(changed)
+            self.manifest.save()
+            print(
+                f"[PG SYNC] {len(rows)} fichier(s) synchronisé(s) : {', '.join(name for name, _ in rows)} "
+                f"({stats['rows_skipped']} inchangé(s) ignoré(s), {stats['bytes_skipped']} octets)"
+            )
+            return len(rows)
+
+    def forget(self, *filenames):
+        """Retire des fichiers du manifeste, pour forcer leur renvoi au prochain changement."""
+        with self._flush_lock:
+            self.manifest.forget(*filenames)
+
+    def close(self):
+        """Envoie les fichiers restants puis ferme les connexions du pool."""
+        self.flush()
+        if db.is_enabled():
+            db.close_pool()
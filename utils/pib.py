@@ -0,0 +1,67 @@
+"""
+PIB des pays : la copie en mémoire de pib.json fait foi.
+
+Chaque pays a une entrée {"pib": montant} ; les anciennes entrées réduites
+à un nombre (écrites par /add_money et /remove_money) sont converties au
+chargement. Lectures et modifications se font en O(1) sur la copie en
+mémoire ; chaque modification est aussitôt transmise à `on_change`
+(sauvegarde différée et journal), sans jamais relire le fichier.
+"""
+
+
+def pib_value(entry):
+    """Montant du PIB d'une entrée, quel que soit son format ({"pib": x} ou x) ; None si illisible."""
+    if isinstance(entry, dict):
+        entry = entry.get("pib")
+    if isinstance(entry, (int, float)) and not isinstance(entry, bool):
+        return entry
+    return None
+
+
+class PIBTable:
+    """PIB par id de rôle, au-dessus de la collection `pib` du DataStore."""
+
+    def __init__(self, data, on_change):
+        self.data = data
+        self.on_change = on_change
+
+    def normalize(self):
+        """Convertit les entrées au format {"pib": x}. Retourne le nombre d'entrées converties."""
+        converted = 0
+        for role_id, entry in list(self.data.items()):
+            if isinstance(entry, dict) and "pib" in entry:
+                continue
+            value = pib_value(entry)
+            if value is None:
+                print(f"[PIB] Entrée illisible ignorée pour {role_id} : {entry!r}")
+                continue
+            self.data[role_id] = {"pib": value}
+            converted += 1
+        return converted
+
+    def get(self, role_id, default=None):
+        value = pib_value(self.data.get(str(role_id)))
+        return default if value is None else value
+
+    def set(self, role_id, value, transaction_type="etat", guild_id=None):
+        role_id = str(role_id)
+        entry = self.data.get(role_id)
+        if isinstance(entry, dict):
+            entry["pib"] = value
+        else:
+            self.data[role_id] = {"pib": value}
+        self.on_change(transaction_type, guild_id)
+        return value
+
+    def add(self, role_id, amount, default=0, transaction_type="etat", guild_id=None):
+        """Ajoute `amount` (négatif pour un retrait) au PIB. Retourne le nouveau PIB."""
+        return self.set(role_id, self.get(role_id, default) + amount, transaction_type, guild_id)
+
+    def remove(self, role_id, transaction_type="etat", guild_id=None):
+        if self.data.pop(str(role_id), None) is None:
+            return False
+        self.on_change(transaction_type, guild_id)
+        return True
+
+    def __contains__(self, role_id):
+        return str(role_id) in self.data
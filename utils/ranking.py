@@ -0,0 +1,98 @@
+"""
+Classements tenus à jour entrée par entrée.
+
+Chaque entrée est rangée dans une liste triée de (clé de tri, id) ; une
+modification retire l'ancienne clé et insère la nouvelle par dichotomie.
+Le rang d'une entrée et une page du classement se lisent sans retrier
+l'ensemble des données. Les clés sont négatives pour obtenir l'ordre
+décroissant, l'id départage les égalités.
+"""
+import bisect
+from collections import OrderedDict
+
+
+def level_key(entry):
+    """Niveau puis XP dans le niveau (`entry` : (niveau, xp)), du plus haut au plus bas."""
+    level, xp = entry
+    return (-level, -xp)
+
+
+def amount_key(amount):
+    # Un solde illisible (signalé par le contrôle d'intégrité) est classé comme nul
+    return (-amount,) if isinstance(amount, (int, float)) else (0,)
+
+
+class RankedIndex:
+    """Liste triée des entrées d'une collection {id: valeur}."""
+
+    def __init__(self, key):
+        self.key = key
+        self._order = []
+        self._entries = {}
+        # Incrémenté à chaque changement : invalide les pages déjà rendues
+        self.version = 0
+
+    def rebuild(self, data):
+        """Reconstruit tout le classement (au chargement des données)."""
+        self._entries = {item_id: (self.key(value), item_id) for item_id, value in data.items()}
+        self._order = sorted(self._entries.values())
+        self.version += 1
+
+    def update(self, item_id, value):
+        """Replace une entrée après modification de sa valeur."""
+        entry = (self.key(value), item_id)
+        old = self._entries.get(item_id)
+        if old == entry:
+            return
+        if old is not None:
+            del self._order[bisect.bisect_left(self._order, old)]
+        bisect.insort(self._order, entry)
+        self._entries[item_id] = entry
+        self.version += 1
+
+    def discard(self, item_id):
+        old = self._entries.pop(item_id, None)
+        if old is not None:
+            del self._order[bisect.bisect_left(self._order, old)]
+            self.version += 1
+
+    def rank(self, item_id):
+        """Rang (à partir de 1) d'une entrée, ou None si elle n'est pas classée."""
+        entry = self._entries.get(item_id)
+        if entry is None:
+            return None
+        return bisect.bisect_left(self._order, entry) + 1
+
+    def page(self, start, count):
+        """Ids classés de la position `start` (à partir de 0) à `start + count`."""
+        return [item_id for _, item_id in self._order[start:start + count]]
+
+    def page_count(self, per_page):
+        return -(-len(self._order) // per_page)
+
+    def top(self, count):
+        return self.page(0, count)
+
+    def __len__(self):
+        return len(self._order)
+
+
+class PageCache:
+    """Pages de classement déjà rendues, valables tant que la version du classement n'a pas changé."""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._pages = OrderedDict()
+
+    def get(self, key, version):
+        cached = self._pages.get(key)
+        if cached is None or cached[0] != version:
+            return None
+        self._pages.move_to_end(key)
+        return cached[1]
+
+    def put(self, key, version, page):
+        self._pages[key] = (version, page)
+        self._pages.move_to_end(key)
+        while len(self._pages) > self.maxsize:
+            self._pages.popitem(last=False)
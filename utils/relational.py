@@ -0,0 +1,448 @@
+"""
+Schéma relationnel PostgreSQL pour les données les plus modifiées.
+
+Au lieu d'un blob texte par fichier dans json_backups, les soldes, niveaux
+(par serveur), emprunts, avertissements et transactions ont une ligne chacun. À chaque
+synchronisation, la copie en mémoire est comparée à l'état déjà envoyé et
+seules les lignes modifiées sont écrites (UPSERT) ou supprimées. Les
+transactions, issues du journal en ajout seul, sont simplement insérées.
+Les tables de niveaux retiennent elles-mêmes leurs membres modifiés : un
+gain d'XP n'envoie qu'une ligne.
+"""
+import decimal
+import json
+import os
+import re
+import threading
+
+from utils import db
+from utils.replay import loan_key
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS eco_balances (
+    account_id TEXT PRIMARY KEY,
+    amount NUMERIC NOT NULL
+);
+CREATE TABLE IF NOT EXISTS guild_levels (
+    guild_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    xp BIGINT NOT NULL,
+    PRIMARY KEY (guild_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS guild_levels_rank_idx ON guild_levels (guild_id, level DESC, xp DESC);
+CREATE TABLE IF NOT EXISTS eco_loans (
+    loan_id TEXT PRIMARY KEY,
+    demandeur_id TEXT,
+    role_id TEXT,
+    data JSONB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS mod_warnings (
+    guild_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    warn_id INTEGER NOT NULL,
+    raison TEXT,
+    moderateur TEXT,
+    date TEXT,
+    PRIMARY KEY (guild_id, user_id, warn_id)
+);
+CREATE TABLE IF NOT EXISTS mod_warning_counters (
+    guild_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    next_id INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, user_id)
+);
+CREATE TABLE IF NOT EXISTS eco_transactions (
+    seq BIGINT PRIMARY KEY,
+    ts BIGINT,
+    from_id TEXT,
+    to_id TEXT,
+    amount NUMERIC,
+    type TEXT,
+    guild_id TEXT
+);
+CREATE INDEX IF NOT EXISTS eco_transactions_ts_idx ON eco_transactions (ts);
+"""
+
+
+class Table:
+    """Une table : ses colonnes, dont les `key` premières forment la clé primaire."""
+
+    def __init__(self, name, columns, key=1, order_by=None):
+        self.name = name
+        self.columns = columns
+        self.key = key
+        self.order_by = order_by or ", ".join(columns[:key])
+
+    @property
+    def upsert_sql(self):
+        cols = ", ".join(self.columns)
+        values = ", ".join(["%s"] * len(self.columns))
+        conflict = ", ".join(self.columns[:self.key])
+        updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in self.columns[self.key:])
+        return f"INSERT INTO {self.name} ({cols}) VALUES ({values}) ON CONFLICT ({conflict}) DO UPDATE SET {updates}"
+
+    @property
+    def delete_sql(self):
+        where = " AND ".join(f"{c} = %s" for c in self.columns[:self.key])
+        return f"DELETE FROM {self.name} WHERE {where}"
+
+    @property
+    def select_sql(self):
+        return f"SELECT {', '.join(self.columns)} FROM {self.name} ORDER BY {self.order_by}"
+
+
+def _number(value):
+    """Convertit un NUMERIC PostgreSQL en int (si entier) ou float, comme dans le JSON."""
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+def _normalize(row):
+    # Met une ligne lue en base sous la même forme que celles produites depuis le JSON
+    out = []
+    for value in row:
+        if isinstance(value, decimal.Decimal):
+            value = _number(value)
+        elif isinstance(value, (dict, list)):
+            value = json.dumps(value, sort_keys=True)
+        out.append(value)
+    return tuple(out)
+
+
+# --- Correspondance entre les collections JSON et les tables ---
+
+BALANCES = Table("eco_balances", ["account_id", "amount"])
+LEVELS = Table("guild_levels", ["guild_id", "user_id", "level", "xp"], key=2)
+LOANS = Table("eco_loans", ["loan_id", "demandeur_id", "role_id", "data"],
+              order_by="(data->>'date_debut')::bigint, loan_id")
+WARNINGS = Table("mod_warnings", ["guild_id", "user_id", "warn_id", "raison", "moderateur", "date"], key=3)
+WARNING_COUNTERS = Table("mod_warning_counters", ["guild_id", "user_id", "next_id"], key=2)
+TRANSACTIONS = Table("eco_transactions", ["seq", "ts", "from_id", "to_id", "amount", "type", "guild_id"])
+
+
+def _balances_rows(data):
+    return {BALANCES.name: [(str(k), v) for k, v in data.items()]}
+
+
+def _balances_build(rows):
+    return {account_id: amount for account_id, amount in rows[BALANCES.name]}
+
+
+def _loans_rows(data):
+    return {LOANS.name: [
+        (str(loan_key(loan)), loan.get("demandeur_id"), loan.get("role_id"), json.dumps(loan, sort_keys=True))
+        for loan in data
+    ]}
+
+
+def _loans_build(rows):
+    return [json.loads(data) for _, _, _, data in rows[LOANS.name]]
+
+
+def _warnings_rows(data):
+    warns, counters = [], []
+    for guild_id, users in data.items():
+        for user_id, entry in users.items():
+            counters.append((guild_id, user_id, entry.get("next_id", 1)))
+            for warn in entry.get("warns", []):
+                moderateur = warn.get("moderateur")
+                warns.append((guild_id, user_id, warn["id"], warn.get("raison"),
+                              None if moderateur is None else str(moderateur), warn.get("date")))
+    return {WARNINGS.name: warns, WARNING_COUNTERS.name: counters}
+
+
+def _warnings_build(rows):
+    data = {}
+    for guild_id, user_id, next_id in rows[WARNING_COUNTERS.name]:
+        data.setdefault(guild_id, {})[user_id] = {"warns": [], "next_id": next_id}
+    for guild_id, user_id, warn_id, raison, moderateur, date in rows[WARNINGS.name]:
+        entry = data.setdefault(guild_id, {}).setdefault(user_id, {"warns": [], "next_id": warn_id + 1})
+        if moderateur is not None and moderateur.isdigit():
+            moderateur = int(moderateur)
+        entry["warns"].append({"id": warn_id, "raison": raison, "moderateur": moderateur, "date": date})
+    return data
+
+
+def _transaction_row(tx):
+    return (tx["seq"], tx.get("timestamp"), tx.get("from_id"), tx.get("to_id"),
+            tx.get("amount"), tx.get("type"), tx.get("guild_id"))
+
+
+class Mapping:
+    """Relie une collection du DataStore (et son fichier) à une ou plusieurs tables."""
+
+    def __init__(self, collection, filename, tables, rows, build):
+        self.collection = collection
+        self.filename = filename
+        self.tables = tables
+        self.rows = rows
+        self.build = build
+
+
+MAPPINGS = [
+    Mapping("balances", "balances.json", [BALANCES], _balances_rows, _balances_build),
+    Mapping("loans", "loans.json", [LOANS], _loans_rows, _loans_build),
+    Mapping("warnings", "warnings.json", [WARNINGS, WARNING_COUNTERS], _warnings_rows, _warnings_build),
+]
+
+# Ancien fichier des transactions, uniquement lu par le migrateur
+LEGACY_TRANSACTIONS_FILE = "transactions.json"
+
+# Fichiers qui ne passent plus par json_backups quand le schéma relationnel est actif
+RELATIONAL_FILES = frozenset(m.filename for m in MAPPINGS)
+# Tables de niveaux par serveur (utils.guild_levels), synchronisées dans guild_levels
+LEVELS_FILE_PATTERN = re.compile(r"^levels_(\d+)\.json$")
+
+
+def is_relational_file(filename):
+    """Indique si un fichier est synchronisé ligne par ligne (collection relationnelle ou table de niveaux)."""
+    filename = os.path.basename(filename)
+    return filename in RELATIONAL_FILES or LEVELS_FILE_PATTERN.match(filename) is not None
+
+
+def _level_rows(guild_id, table):
+    guild_id = str(guild_id)
+    return [(guild_id, str(user_id), level, xp) for user_id, level, xp in table.rows()]
+
+
+def _levels_documents(rows):
+    """Documents `levels_<guild_id>.json` (format colonnes de LevelTable) à partir des lignes."""
+    tables = {}
+    for guild_id, user_id, level, xp in sorted(rows, key=lambda row: (row[0], int(row[1]))):
+        table = tables.setdefault(f"levels_{guild_id}.json", {"ids": [], "level": [], "xp": []})
+        table["ids"].append(int(user_id))
+        table["level"].append(level)
+        table["xp"].append(xp)
+    return tables
+
+
+def is_enabled():
+    """Indique si le schéma relationnel remplace les blobs json_backups."""
+    return os.getenv("PG_RELATIONAL", "0") == "1" and db.is_enabled()
+
+
+def ensure_schema(cur):
+    cur.execute(SCHEMA_SQL)
+
+
+def _snapshot(mapping, data):
+    """Lignes indexées par clé primaire, pour chaque table de la collection."""
+    rows = mapping.rows(data)
+    return {table.name: {row[:table.key]: row for row in rows[table.name]} for table in mapping.tables}
+
+
+def _fetch(cur, table):
+    cur.execute(table.select_sql)
+    return [_normalize(row) for row in cur.fetchall()]
+
+
+class RelationalSync:
+    """Envoie ligne par ligne les modifications des collections relationnelles."""
+
+    def __init__(self, store, guild_levels=None):
+        self.store = store
+        # Tables de niveaux par serveur (GuildLevels créé avec track_changes=True)
+        self.guild_levels = guild_levels
+        # Serveurs dont la table est à renvoyer en entier (échec d'un envoi précédent)
+        self._levels_resync = set()
+        self._dirty = set()
+        self._transactions = []
+        self._synced = {}
+        self._schema_ready = False
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._by_filename = {m.filename: m for m in MAPPINGS}
+
+    def handles(self, filename):
+        return os.path.basename(filename) in self._by_filename
+
+    def mark_dirty(self, *filenames):
+        """Marque des collections comme modifiées à partir de leurs noms de fichier."""
+        with self._lock:
+            for filename in filenames:
+                mapping = self._by_filename.get(os.path.basename(filename))
+                if mapping is not None:
+                    self._dirty.add(mapping.collection)
+
+    def queue_transaction(self, record):
+        """Met en attente l'insertion d'une transaction du journal (avec son numéro `seq`)."""
+        with self._lock:
+            self._transactions.append(_transaction_row(record))
+
+    def reset_transactions(self):
+        """Vide la table des transactions (appel bloquant, après effacement du journal)."""
+        with self._lock:
+            self._transactions = []
+        if is_enabled():
+            db.execute(f"DELETE FROM {TRANSACTIONS.name}")
+
+    def has_pending(self):
+        with self._lock:
+            if self._dirty or self._transactions or self._levels_resync:
+                return True
+        if self.guild_levels is not None:
+            return any(t.changed or t.resync for t in self.guild_levels.loaded())
+        return False
+
+    def _capture_levels(self):
+        """Lignes des membres modifiés de chaque table de niveaux chargée (dans la boucle)."""
+        with self._lock:
+            resync, self._levels_resync = self._levels_resync, set()
+        replace, upsert, delete = {}, [], []
+        for table in self.guild_levels.loaded():
+            changed, full = table.take_changes()
+            if full or table.guild_id in resync:
+                replace[table.guild_id] = _level_rows(table.guild_id, table)
+                continue
+            for user_id in changed or ():
+                entry = table.get(user_id)
+                if entry is None:
+                    delete.append((str(table.guild_id), str(user_id)))
+                else:
+                    upsert.append((str(table.guild_id), str(user_id), entry[0], entry[1]))
+        if not (replace or upsert or delete):
+            return None
+        return {"replace": replace, "upsert": upsert, "delete": delete}
+
+    def capture(self):
+        """
+        Relève les lignes des collections modifiées, à passer ensuite à `flush`.
+
+        À appeler depuis la boucle d'événements : c'est là seulement que les
+        données ne changent pas pendant la lecture.
+        """
+        with self._lock:
+            pending, self._dirty = self._dirty, set()
+        captured = {m.collection: _snapshot(m, self.store.get(m.collection)) for m in MAPPINGS if m.collection in pending}
+        if self.guild_levels is not None:
+            levels = self._capture_levels()
+            if levels is not None:
+                captured[LEVELS.name] = levels
+        return captured
+
+    def flush(self, captured=None):
+        """
+        Écrit les lignes modifiées depuis le dernier passage (appel bloquant). Retourne le nombre de lignes touchées.
+
+        Sans `captured`, les lignes sont relevées ici (arrêt, scripts : la boucle ne tourne plus).
+        """
+        with self._flush_lock:
+            if captured is None:
+                captured = self.capture()
+            pending = set(captured)
+            with self._lock:
+                new_transactions, self._transactions = self._transactions, []
+            if not (pending or new_transactions) or not is_enabled():
+                return 0
+
+            synced = {}
+            upserted = deleted = 0
+            try:
+                with db.connection() as conn:
+                    with conn.cursor() as cur:
+                        if not self._schema_ready:
+                            ensure_schema(cur)
+                        for mapping in MAPPINGS:
+                            if mapping.collection not in pending:
+                                continue
+                            current = captured[mapping.collection]
+                            for table in mapping.tables:
+                                known = self._synced.get(table.name)
+                                if known is None:
+                                    # Premier passage : on part de l'état réellement en base
+                                    known = {row[:table.key]: row for row in _fetch(cur, table)}
+                                rows = current[table.name]
+                                changes = [row for key, row in rows.items() if known.get(key) != row]
+                                removed = [key for key in known if key not in rows]
+                                if changes:
+                                    cur.executemany(table.upsert_sql, changes)
+                                if removed:
+                                    cur.executemany(table.delete_sql, removed)
+                                upserted += len(changes)
+                                deleted += len(removed)
+                                synced[table.name] = rows
+                        levels = captured.get(LEVELS.name)
+                        if levels is not None:
+                            for guild_id, rows in levels["replace"].items():
+                                cur.execute(f"DELETE FROM {LEVELS.name} WHERE guild_id = %s", (str(guild_id),))
+                                if rows:
+                                    cur.executemany(LEVELS.upsert_sql, rows)
+                                upserted += len(rows)
+                            if levels["upsert"]:
+                                cur.executemany(LEVELS.upsert_sql, levels["upsert"])
+                            if levels["delete"]:
+                                cur.executemany(LEVELS.delete_sql, levels["delete"])
+                            upserted += len(levels["upsert"])
+                            deleted += len(levels["delete"])
+                        if new_transactions:
+                            cur.executemany(TRANSACTIONS.upsert_sql, new_transactions)
+                            upserted += len(new_transactions)
+            except Exception as e:
+                print(f"[PG SYNC] Échec de la synchronisation relationnelle ({', '.join(sorted(pending))}) : {e}")
+                with self._lock:
+                    self._dirty.update(pending - {LEVELS.name})
+                    self._transactions[:0] = new_transactions
+                    levels = captured.get(LEVELS.name)
+                    if levels is not None:
+                        # Lignes perdues : les tables concernées seront renvoyées en entier
+                        self._levels_resync.update(levels["replace"])
+                        self._levels_resync.update(int(g) for g, *_ in levels["upsert"] + levels["delete"])
+                return 0
+
+            self._schema_ready = True
+            self._synced.update(synced)
+            if upserted or deleted:
+                print(f"[PG SYNC] {upserted} ligne(s) mise(s) à jour, {deleted} supprimée(s) ({', '.join(sorted(pending))})")
+            return upserted + deleted
+
+
+def import_documents(cur, documents):
+    """Remplace le contenu des tables par les documents JSON fournis ({filename: data})."""
+    ensure_schema(cur)
+    counts = {}
+    for mapping in MAPPINGS:
+        if mapping.filename not in documents:
+            continue
+        rows = mapping.rows(documents[mapping.filename])
+        for table in mapping.tables:
+            cur.execute(f"DELETE FROM {table.name}")
+            # Dédoublonnage sur la clé primaire : la dernière occurrence l'emporte
+            unique = list({row[:table.key]: row for row in rows[table.name]}.values())
+            if unique:
+                cur.executemany(table.upsert_sql, unique)
+            counts[table.name] = len(unique)
+    for filename, data in documents.items():
+        match = LEVELS_FILE_PATTERN.match(filename)
+        if match is None:
+            continue
+        guild_id = match.group(1)
+        rows = [(guild_id, str(user_id), level, xp)
+                for user_id, level, xp in zip(data.get("ids", []), data.get("level", []), data.get("xp", []))]
+        cur.execute(f"DELETE FROM {LEVELS.name} WHERE guild_id = %s", (guild_id,))
+        if rows:
+            cur.executemany(LEVELS.upsert_sql, rows)
+        counts[LEVELS.name] = counts.get(LEVELS.name, 0) + len(rows)
+    if LEGACY_TRANSACTIONS_FILE in documents:
+        # Même numérotation que l'import de transactions.json dans le journal
+        rows = [_transaction_row(dict(tx, seq=i)) for i, tx in enumerate(documents[LEGACY_TRANSACTIONS_FILE], start=1)]
+        cur.execute(f"DELETE FROM {TRANSACTIONS.name}")
+        if rows:
+            cur.executemany(TRANSACTIONS.upsert_sql, rows)
+        counts[TRANSACTIONS.name] = len(rows)
+    return counts
+
+
+def export_documents(cur):
+    """Reconstruit les documents JSON ({filename: data}) à partir des tables."""
+    ensure_schema(cur)
+    documents = {}
+    for mapping in MAPPINGS:
+        rows = {table.name: _fetch(cur, table) for table in mapping.tables}
+        if not any(rows.values()):
+            # Tables jamais alimentées : on ne remplace pas le fichier local
+            continue
+        documents[mapping.filename] = mapping.build(rows)
+    documents.update(_levels_documents(_fetch(cur, LEVELS)))
+    return documents
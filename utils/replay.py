@@ -0,0 +1,221 @@
+"""
+Historique de l'état économique : instantanés périodiques et rejeu du journal.
+
+Chaque action économique est un événement du journal des transactions : les
+écritures du grand livre pour les soldes, et des événements d'état
+(`{"collection", "set", "del"}`, valeurs absolues) pour les emprunts et le
+PIB. Un instantané de `balances`, `loans`, `pib` et `ledger` est pris
+régulièrement avec le numéro du dernier événement qu'il contient. Pour
+reconstruire l'état à un instant donné, on repart de l'instantané le plus
+proche et on replie les événements suivants, segment par segment.
+"""
+import copy
+import os
+import time
+
+from utils import codec
+from utils.ledger import SYSTEM_ACCOUNTS
+from utils.snapshots import SnapshotStore
+
+ECONOMY_COLLECTIONS = ("balances", "loans", "pib", "ledger")
+STATE_EVENT = "etat"
+# Un instantané est pris tous les N événements, ou au plus tard après SNAPSHOT_MAX_AGE secondes
+SNAPSHOT_EVERY = int(os.getenv("ECONOMY_SNAPSHOT_EVERY", "1000"))
+SNAPSHOT_MAX_AGE = int(os.getenv("ECONOMY_SNAPSHOT_MAX_AGE", str(24 * 3600)))
+
+
+class ReplayError(Exception):
+    """Levée quand l'état demandé ne peut pas être reconstruit."""
+
+
+def loan_key(loan):
+    """Identifiant d'un emprunt (les anciens emprunts n'ont pas de champ id)."""
+    if not isinstance(loan, dict):
+        return repr(loan)
+    return loan.get("id") or f"{loan.get('demandeur_id')}-{loan.get('date_debut')}"
+
+
+def _keyed(name, data):
+    if name == "loans":
+        return {loan_key(loan): loan for loan in data}
+    return dict(data)
+
+
+class _Recorder:
+    """Retient la dernière version enregistrée d'une collection pour n'émettre que les changements."""
+
+    def __init__(self, name):
+        self.name = name
+        self.last = {}
+
+    def prime(self, data):
+        self.last = copy.deepcopy(_keyed(self.name, data))
+
+    def changes(self, data):
+        current = _keyed(self.name, data)
+        changed = {k: copy.deepcopy(v) for k, v in current.items() if self.last.get(k) != v}
+        removed = [k for k in self.last if k not in current]
+        return changed, removed
+
+
+def fold(state, records, until_seq=None, until_time=None):
+    """
+    Replie un paquet d'événements sur `state` (modifié en place).
+
+    Retourne (nombre d'événements appliqués, numéro du dernier événement lu, arrêt atteint).
+    """
+    balances = state["balances"]
+    system = state["ledger"].setdefault("system", {})
+    targets = {"loans": state["loans"], "pib": state["pib"]}
+    applied = 0
+    last_seq = None
+    for record in records:
+        if until_seq is not None and record.get("seq", 0) > until_seq:
+            return applied, last_seq, True
+        if until_time is not None and record.get("timestamp", 0) > until_time:
+            return applied, last_seq, True
+        last_seq = record.get("seq")
+        legs = record.get("legs")
+        if legs:
+            for account, delta in legs:
+                accounts = system if account in SYSTEM_ACCOUNTS else balances
+                accounts[account] = accounts.get(account, 0) + delta
+        elif "opening" in record:
+            balances.clear()
+            system.clear()
+            for account, amount in record["opening"].items():
+                (system if account in SYSTEM_ACCOUNTS else balances)[account] = amount
+        elif record.get("collection") in targets:
+            target = targets[record["collection"]]
+            target.update(record.get("set", {}))
+            for key in record.get("del", []):
+                target.pop(key, None)
+        else:
+            # Anciennes transactions sans lignes : déjà comprises dans un bilan d'ouverture
+            continue
+        applied += 1
+    return applied, last_seq, False
+
+
+class EconomyHistory:
+    """Événements d'état, instantanés et reconstruction de l'économie."""
+
+    def __init__(self, store, journal, snapshot_dir):
+        self.store = store
+        self.journal = journal
+        self.snapshots = SnapshotStore(snapshot_dir)
+        self._recorders = {name: _Recorder(name) for name in ("loans", "pib")}
+
+    # --- Événements d'état ---
+
+    def track(self):
+        """Prend l'état chargé comme référence des prochains événements (après le chargement des données)."""
+        for name, recorder in self._recorders.items():
+            recorder.prime(self.store.collection(name).data)
+
+    def record(self, name, transaction_type=STATE_EVENT, guild_id=None):
+        """Ajoute au journal les changements de `name` (loans ou pib) depuis le dernier enregistrement."""
+        recorder = self._recorders[name]
+        data = self.store.collection(name).data
+        changed, removed = recorder.changes(data)
+        if not changed and not removed:
+            return None
+        record = self.journal.append({
+            "from_id": None,
+            "to_id": None,
+            "amount": 0,
+            "timestamp": int(time.time()),
+            "type": transaction_type,
+            "guild_id": guild_id,
+            "collection": name,
+            "set": changed,
+            "del": removed,
+        })
+        recorder.prime(data)
+        return record
+
+    # --- Instantanés ---
+
+    def capture(self):
+        """Copie de l'état économique et numéro du dernier événement (à appeler depuis la boucle du bot)."""
+        seq = self.journal.next_seq - 1
+        datas = {name: codec.loads(codec.dumps(self.store.collection(name).data)) for name in ECONOMY_COLLECTIONS}
+        return seq, datas
+
+    def save_snapshot(self, seq, datas):
+        """Écrit un instantané capturé par `capture()` (appel bloquant)."""
+        entry = self.snapshots.save(datas, meta={"id": str(seq), "seq": seq})
+        print(f"[ÉCONOMIE] Instantané {entry['id']} enregistré")
+        return entry
+
+    def snapshot(self):
+        return self.save_snapshot(*self.capture())
+
+    def latest(self, until_seq=None, until_time=None):
+        """Entrée d'index de l'instantané le plus récent antérieur à la cible, ou None."""
+        candidates = [
+            e for e in self.snapshots.list()
+            if (until_seq is None or e["seq"] <= until_seq) and (until_time is None or e["timestamp"] <= until_time)
+        ]
+        return max(candidates, key=lambda e: e["seq"], default=None)
+
+    def needs_snapshot(self):
+        last = self.latest()
+        if last is None:
+            return True
+        return (self.journal.next_seq - 1 - last["seq"] >= SNAPSHOT_EVERY
+                or time.time() - last["timestamp"] >= SNAPSHOT_MAX_AGE)
+
+    # --- Reconstruction ---
+
+    def rebuild(self, until_seq=None, until_time=None):
+        """
+        Reconstruit l'état économique au numéro `until_seq` ou à la date `until_time` (par défaut : maintenant).
+
+        Retourne (état {collection: données}, informations sur le rejeu). Appel bloquant.
+        """
+        started = time.perf_counter()
+        base = self.latest(until_seq, until_time)
+        if base is None:
+            raise ReplayError("Aucun instantané antérieur à la date demandée")
+        datas = self.snapshots.load(base["id"])
+        state = {
+            "balances": dict(datas.get("balances", {})),
+            "loans": _keyed("loans", datas.get("loans", [])),
+            "pib": dict(datas.get("pib", {})),
+            "ledger": dict(datas.get("ledger", {})),
+        }
+        state["ledger"]["system"] = dict(state["ledger"].get("system", {}))
+        events = 0
+        last_seq = base["seq"]
+        for batch in self.journal.batches_after(base["seq"]):
+            applied, seen, stopped = fold(state, batch, until_seq, until_time)
+            events += applied
+            if seen is not None:
+                last_seq = seen
+            if stopped:
+                break
+        # Un compte fermé ou vidé n'a pas d'entrée dans balances
+        state["balances"] = {k: v for k, v in state["balances"].items() if v}
+        state["loans"] = list(state["loans"].values())
+        info = {
+            "snapshot": base["id"],
+            "events": events,
+            "seq": last_seq,
+            "seconds": time.perf_counter() - started,
+        }
+        return state, info
+
+    def compare(self, state):
+        """Nombre d'entrées différentes entre un état reconstruit et l'état actuel, par collection."""
+        differences = {}
+        for name in ("balances", "loans", "pib"):
+            current = _keyed(name, self.store.collection(name).data)
+            rebuilt = _keyed(name, state[name])
+            if name == "balances":
+                keys = {k for k, v in current.items() if v} | set(rebuilt)
+                differences[name] = sum(1 for k in keys if current.get(k, 0) != rebuilt.get(k, 0))
+            else:
+                keys = set(current) | set(rebuilt)
+                differences[name] = sum(1 for k in keys if current.get(k) != rebuilt.get(k))
+        return differences
@@ -0,0 +1,161 @@
+"""
+Changements de saison : transformations de l'XP de tous les membres d'un serveur.
+
+Chaque opération travaille sur l'XP totale des membres (cumul de la courbe
+jusqu'à leur niveau, plus leur progression) et recalcule niveau et
+progression en un seul passage sur les colonnes de la table, avec NumPy
+s'il est installé. Le résultat est calculé à part : un aperçu ne touche à
+rien, et `apply` remplace les colonnes d'un coup. Les facteurs sont
+appliqués comme des fractions d'entiers : aucun arrondi flottant, même
+au-delà de 2**53.
+"""
+from array import array
+from fractions import Fraction
+
+from utils.guild_levels import INT64_MAX, LEVEL_MAX
+
+try:
+    import numpy as np
+except ImportError:  # NumPy est optionnel : repli sur une boucle Python
+    np = None
+
+OPERATIONS = {
+    "decroissance": "XP totale multipliée par un facteur entre 0 et 1",
+    "echelle": "XP totale multipliée par un facteur positif",
+    "plancher": "tout le monde repart au niveau indiqué, sans progression",
+    "courbe": "même XP totale, exprimée sur une autre courbe de niveaux",
+}
+# Tranches de niveaux du rapport (mêmes paliers que les grades)
+DISTRIBUTION_STEP = 10
+# Plus grand dénominateur retenu pour un facteur (0.1 devient 1/10)
+RATIO_DENOMINATOR = 10 ** 6
+
+
+class SeasonError(ValueError):
+    """Opération ou paramètre de changement de saison invalide."""
+
+
+class SeasonResult:
+    """Nouvelles colonnes (niveaux, XP) d'une table et répartition des niveaux avant et après."""
+
+    def __init__(self, table, levels, xps, before, after, changed):
+        self.table = table
+        self.levels = levels
+        self.xps = xps
+        self.before = before
+        self.after = after
+        # Nombre de membres dont le niveau change
+        self.changed = changed
+
+
+def distribution(levels, step=DISTRIBUTION_STEP):
+    """Nombre de membres par tranche de niveaux : {premier niveau de la tranche: nombre}."""
+    if np is not None:
+        buckets = np.bincount(np.asarray(levels, dtype=np.int64) // step) if len(levels) else []
+        return {bucket * step: int(count) for bucket, count in enumerate(list(buckets)) if count}
+    counts = {}
+    for level in levels:
+        bucket = (level // step) * step
+        counts[bucket] = counts.get(bucket, 0) + 1
+    return dict(sorted(counts.items()))
+
+
+def _ratio(value):
+    """Facteur sous forme (numérateur, dénominateur)."""
+    ratio = Fraction(value).limit_denominator(RATIO_DENOMINATOR)
+    return ratio.numerator, ratio.denominator
+
+
+def _int64_limit(curve):
+    """Dernier niveau dont toute l'XP totale (cumul plus seuil) tient dans un entier 64 bits."""
+    level = 1
+    while level < curve.max_level and curve.totals[level + 1] + curve.thresholds[level + 1] <= INT64_MAX:
+        level += 1
+    return level
+
+
+def _check(operation, value, curve, target_curve):
+    if operation not in OPERATIONS:
+        raise SeasonError(f"opération inconnue : {operation}")
+    if operation == "decroissance" and not 0 <= value <= 1:
+        raise SeasonError("le facteur de décroissance doit être compris entre 0 et 1")
+    if operation == "echelle" and value < 0:
+        raise SeasonError("le facteur d'échelle doit être positif")
+    if operation == "plancher" and not 1 <= value <= curve.max_level:
+        raise SeasonError(f"le niveau plancher doit être compris entre 1 et {curve.max_level}")
+    if operation == "courbe" and target_curve is None:
+        raise SeasonError("une courbe cible est nécessaire")
+
+
+def _scale_numpy(totals, num, den, ceiling):
+    """floor(totals * num / den) plafonné à `ceiling`, en entiers 64 bits sans dépassement (num * den < 2**63)."""
+    if num == 0:
+        return np.zeros_like(totals)
+    quotients, remainders = np.divmod(totals, den)
+    # Au-delà, quotient * num pourrait dépasser les 64 bits : ces membres sont au plafond (ou presque)
+    over = quotients >= ceiling // num
+    scaled = np.where(over, 0, quotients) * num + (remainders * num) // den
+    for i in np.flatnonzero(over):
+        scaled[i] = min(int(totals[i]) * num // den, ceiling)
+    return np.minimum(scaled, ceiling)
+
+
+def _transform_numpy(table, curve, new_curve, operation, value):
+    limit, new_limit = _int64_limit(curve), _int64_limit(new_curve)
+    old_levels = np.frombuffer(table.levels, dtype=np.uint16).astype(np.int64)
+    totals = np.asarray(curve.totals[:limit + 1], dtype=np.int64)[old_levels]
+    totals += np.frombuffer(table.xps, dtype=np.int64)
+    if operation != "courbe":
+        # Plafonné à la plus grande XP totale représentable sur la courbe
+        ceiling = new_curve.totals[new_limit] + new_curve.thresholds[new_limit] - 1
+        totals = _scale_numpy(totals, *_ratio(value), ceiling)
+    new_totals = np.asarray(new_curve.totals[:new_limit + 1], dtype=np.int64)
+    new_levels = np.clip(np.searchsorted(new_totals, totals, side="right") - 1, 1, new_limit)
+    new_xps = totals - new_totals[new_levels]
+    return (array("H", new_levels.astype(np.uint16).tobytes()), array("q", new_xps.tobytes()),
+            distribution(old_levels), distribution(new_levels), int(np.count_nonzero(old_levels != new_levels)))
+
+
+def _transform_python(table, curve, new_curve, operation, value):
+    levels, xps = array("H"), array("q")
+    num, den = _ratio(value) if operation != "courbe" else (1, 1)
+    for level, xp in zip(table.levels, table.xps):
+        total = curve.total_xp(level, xp)
+        if operation != "courbe":
+            total = total * num // den
+        new_level, new_xp = new_curve.level_from_total(total)
+        levels.append(min(new_level, LEVEL_MAX))
+        xps.append(min(new_xp, INT64_MAX))
+    changed = sum(1 for old, new in zip(table.levels, levels) if old != new)
+    return levels, xps, distribution(table.levels), distribution(levels), changed
+
+
+def transform(table, curve, operation, value=None, target_curve=None):
+    """
+    Calcule, sans l'appliquer, l'effet d'une opération de saison sur une table.
+
+    `curve` est la courbe actuelle ; `target_curve` ne sert qu'à l'opération « courbe ».
+    """
+    _check(operation, value, curve, target_curve)
+    count = len(table)
+    if operation == "plancher":
+        floor = int(value)
+        after = {(floor // DISTRIBUTION_STEP) * DISTRIBUTION_STEP: count} if count else {}
+        changed = count - table.levels.count(floor)
+        return SeasonResult(table, array("H", [floor]) * count, array("q", [0]) * count,
+                            distribution(table.levels), after, changed)
+    new_curve = target_curve if operation == "courbe" else curve
+    num, den = _ratio(value) if operation != "courbe" else (1, 1)
+    if (np is not None and count and num * den <= INT64_MAX
+            and int(np.frombuffer(table.levels, dtype=np.uint16).max()) <= _int64_limit(curve)):
+        columns = _transform_numpy(table, curve, new_curve, operation, value)
+    else:
+        # Niveaux ou facteur hors des entiers 64 bits (ou NumPy absent) : entiers Python
+        columns = _transform_python(table, curve, new_curve, operation, value)
+    return SeasonResult(table, *columns)
+
+
+def apply(result):
+    """Remplace d'un coup les colonnes de la table par celles du résultat. Retourne le nombre de niveaux changés."""
+    result.table.assign(result.levels, result.xps)
+    return result.changed
@@ -0,0 +1,148 @@
+"""
+Sauvegardes par instantanés, adressées par contenu et compressées.
+
+Chaque collection est stockée une seule fois sous forme de blob gzip nommé
+par l'empreinte SHA-256 de son contenu (objects/ab/abcd….json.gz). Un
+instantané n'est qu'un petit manifeste {collection: empreinte} ; une
+collection inchangée d'un instantané à l'autre ne coûte donc rien. La liste
+des instantanés est tenue dans index.json.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import time
+
+INDEX_FILENAME = "index.json"
+LEGACY_PATTERN = re.compile(r"^(?P<name>.+)_backup_(?P<id>\d+)\.json$")
+
+
+def _write_atomic(path, payload, mode="w"):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, mode) as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+class SnapshotStore:
+    """Dossier de sauvegardes : blobs dédupliqués, manifestes et index."""
+
+    def __init__(self, backup_dir):
+        self.backup_dir = backup_dir
+        self.objects_dir = os.path.join(backup_dir, "objects")
+        self.snapshots_dir = os.path.join(backup_dir, "snapshots")
+        self.index_path = os.path.join(backup_dir, INDEX_FILENAME)
+        # (collection, version) -> empreinte, pour ne pas resérialiser une collection inchangée
+        self._known = {}
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+        if not os.path.exists(self.index_path):
+            self._import_legacy()
+
+    # --- Blobs ---
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest + ".json.gz")
+
+    def put(self, data):
+        """Stocke un contenu s'il n'existe pas déjà et retourne son empreinte."""
+        payload = json.dumps(data, sort_keys=True).encode("utf-8")
+        digest = hashlib.sha256(payload).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _write_atomic(path, gzip.compress(payload), mode="wb")
+        return digest
+
+    def get(self, digest):
+        with open(self._object_path(digest), "rb") as f:
+            return json.loads(gzip.decompress(f.read()))
+
+    # --- Index ---
+
+    def list(self):
+        """Instantanés connus, du plus récent au plus ancien."""
+        try:
+            with open(self.index_path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def _add_to_index(self, entry):
+        # En tête avant le tri (stable) : le plus récent passe devant ceux de la même seconde
+        entries = [entry] + [e for e in self.list() if e["id"] != entry["id"]]
+        entries.sort(key=lambda e: e["timestamp"], reverse=True)
+        _write_atomic(self.index_path, json.dumps(entries, indent=2))
+
+    # --- Instantanés ---
+
+    def _manifest_path(self, snapshot_id):
+        return os.path.join(self.snapshots_dir, f"{snapshot_id}.json")
+
+    def save(self, datas, snapshot_time=None, meta=None):
+        """Crée un instantané à partir de données déjà copiées ({collection: données})."""
+        if snapshot_time is None:
+            snapshot_time = int(time.time())
+        collections = {name: self.put(data) for name, data in datas.items()}
+        return self._save_manifest(snapshot_time, collections, meta)
+
+    def create(self, store, names, snapshot_time=None):
+        """Crée un instantané des collections `names` d'un DataStore. Retourne son entrée d'index."""
+        if snapshot_time is None:
+            snapshot_time = int(time.time())
+        collections = {}
+        for name in names:
+            coll = store.collection(name)
+            key = (name, coll.version)
+            digest = self._known.get(key)
+            if digest is None or not os.path.exists(self._object_path(digest)):
+                digest = self.put(coll.data)
+                self._known = {k: v for k, v in self._known.items() if k[0] != name}
+                self._known[key] = digest
+            collections[name] = digest
+        return self._save_manifest(snapshot_time, collections)
+
+    def _save_manifest(self, snapshot_time, collections, meta=None):
+        entry = {
+            "id": str(snapshot_time),
+            "timestamp": snapshot_time,
+            "date": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(snapshot_time)),
+        }
+        # Plusieurs instantanés dans la même seconde : suffixe numéroté, pour ne pas écraser le précédent
+        n = 1
+        while os.path.exists(self._manifest_path(entry["id"])):
+            entry["id"] = f"{snapshot_time}-{n}"
+            n += 1
+        # Champs supplémentaires de l'index (peut remplacer l'identifiant)
+        entry.update(meta or {})
+        manifest = dict(entry, collections=collections)
+        _write_atomic(self._manifest_path(entry["id"]), json.dumps(manifest, indent=2))
+        self._add_to_index(entry)
+        return entry
+
+    def load(self, snapshot_id):
+        """Retourne {collection: données} d'un instantané, entièrement lu avant toute restauration."""
+        with open(self._manifest_path(snapshot_id), "r") as f:
+            manifest = json.load(f)
+        return {name: self.get(digest) for name, digest in manifest["collections"].items()}
+
+    def _import_legacy(self):
+        """Convertit les anciennes sauvegardes `<collection>_backup_<id>.json` en instantanés."""
+        groups = {}
+        for filename in os.listdir(self.backup_dir):
+            match = LEGACY_PATTERN.match(filename)
+            if match:
+                groups.setdefault(int(match.group("id")), []).append((match.group("name"), filename))
+        for snapshot_time, files in sorted(groups.items()):
+            collections = {}
+            for name, filename in files:
+                try:
+                    with open(os.path.join(self.backup_dir, filename), "r") as f:
+                        collections[name] = self.put(json.load(f))
+                except Exception as e:
+                    print(f"Sauvegarde {filename} illisible, ignorée : {e}")
+            if collections:
+                self._save_manifest(snapshot_time, collections)
+        if not groups:
+            _write_atomic(self.index_path, "[]")
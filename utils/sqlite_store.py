@@ -0,0 +1,200 @@
+"""
+Support d'écriture SQLite (mode WAL) pour le DataStore.
+
+Chaque collection est découpée en lignes : une par clé pour un dictionnaire,
+une par position pour une liste. Une sauvegarde compare les lignes à celles
+déjà écrites et n'envoie que les différences, dans une seule transaction.
+Au premier chargement d'une collection absente de la base, son ancien fichier
+JSON est importé.
+
+La synchronisation PostgreSQL et la restauration travaillent sur des fichiers
+JSON : avant chaque envoi, `export` réécrit le fichier des collections
+modifiées à partir des lignes déjà sérialisées (sans relire la copie en
+mémoire). Sur une base neuve, les fichiers restaurés sont importés au
+premier chargement.
+"""
+import contextlib
+import os
+import sqlite3
+import threading
+
+from utils import codec
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS collections (
+    name TEXT PRIMARY KEY,
+    kind TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    collection TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (collection, key)
+) WITHOUT ROWID;
+"""
+
+
+def _kind(data):
+    if isinstance(data, dict):
+        return "dict"
+    if isinstance(data, list):
+        return "list"
+    return "value"
+
+
+def _rows(data):
+    """Découpe une collection en {clé: valeur JSON}."""
+    if isinstance(data, dict):
+        return {str(k): codec.dumps(v) for k, v in data.items()}
+    if isinstance(data, list):
+        return {str(i): codec.dumps(v) for i, v in enumerate(data)}
+    return {"": codec.dumps(data)}
+
+
+class SqliteBackend:
+    """Collections du DataStore stockées ligne par ligne dans une base SQLite."""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA_SQL)
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._written = {}
+        self._kinds = {}
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Regroupe plusieurs écritures dans une seule transaction."""
+        with self._lock:
+            if self._depth == 0:
+                self._conn.execute("BEGIN")
+            self._depth += 1
+            try:
+                yield
+            except Exception:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._conn.execute("ROLLBACK")
+                    # L'état connu n'est plus fiable : il sera relu depuis la base
+                    self._written.clear()
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                self._conn.execute("COMMIT")
+
+    def read(self, coll):
+        with self._lock:
+            row = self._conn.execute("SELECT kind FROM collections WHERE name = ?", (coll.name,)).fetchone()
+            if row is None:
+                return self._import_json(coll)
+            kind = row[0]
+            order = "CAST(key AS INTEGER)" if kind == "list" else "key"
+            entries = self._conn.execute(
+                f"SELECT key, value FROM entries WHERE collection = ? ORDER BY {order}", (coll.name,)
+            ).fetchall()
+            self._written[coll.name] = dict(entries)
+            self._kinds[coll.name] = kind
+        if kind == "dict":
+            return True, {k: codec.loads(v) for k, v in entries}
+        if kind == "list":
+            return True, [codec.loads(v) for _, v in entries]
+        return True, codec.loads(entries[0][1]) if entries else None
+
+    def _import_json(self, coll):
+        """Importe l'ancien fichier JSON d'une collection encore absente de la base."""
+        if not os.path.exists(coll.path):
+            return False, None
+        try:
+            with open(coll.path, "r") as f:
+                data = codec.loads(f.read())
+        except Exception as e:
+            print(f"Erreur lors du chargement de {coll.filename}: {e}")
+            return True, None
+        self._store(coll.name, _kind(data), _rows(data))
+        print(f"[SQLITE] {coll.filename} importé dans {os.path.basename(self.path)}")
+        return True, data
+
+    def _store(self, name, kind, rows):
+        with self.batch():
+            self._conn.execute(
+                "INSERT INTO collections (name, kind) VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET kind = excluded.kind",
+                (name, kind),
+            )
+            known = self._written.get(name)
+            if known is None:
+                known = dict(self._conn.execute("SELECT key, value FROM entries WHERE collection = ?", (name,)).fetchall())
+            changed = [(name, k, v) for k, v in rows.items() if known.get(k) != v]
+            removed = [(name, k) for k in known if k not in rows]
+            if changed:
+                self._conn.executemany(
+                    "INSERT INTO entries (collection, key, value) VALUES (?, ?, ?) "
+                    "ON CONFLICT (collection, key) DO UPDATE SET value = excluded.value",
+                    changed,
+                )
+            if removed:
+                self._conn.executemany("DELETE FROM entries WHERE collection = ? AND key = ?", removed)
+            self._written[name] = rows
+            self._kinds[name] = kind
+
+    def encode(self, coll):
+        """Découpe la collection en lignes (à appeler depuis la boucle, ou quand elle ne tourne pas)."""
+        return _kind(coll.data), _rows(coll.data)
+
+    def write(self, coll, payload):
+        kind, rows = payload
+        self._store(coll.name, kind, rows)
+
+    def delete(self, coll):
+        # La collection reste déclarée : son ancien fichier JSON ne sera pas réimporté
+        with self.batch():
+            cur = self._conn.execute("DELETE FROM entries WHERE collection = ?", (coll.name,))
+            self._written[coll.name] = {}
+            self._kinds.pop(coll.name, None)
+        if os.path.exists(coll.path):
+            os.remove(coll.path)
+        return cur.rowcount > 0
+
+    def export(self, coll):
+        """Réécrit le fichier JSON d'une collection à partir des lignes écrites. Retourne False si rien à exporter."""
+        with self._lock:
+            kind = self._kinds.get(coll.name)
+            rows = self._written.get(coll.name)
+        if kind is None or rows is None:
+            return False
+        # Les valeurs sont déjà du JSON : il ne reste qu'à les assembler
+        if kind == "dict":
+            payload = "{" + ",".join(f"{codec.dumps(k)}:{v}" for k, v in rows.items()) + "}"
+        elif kind == "list":
+            payload = "[" + ",".join(rows[k] for k in sorted(rows, key=int)) + "]"
+        else:
+            payload = rows.get("", "null")
+        tmp_path = coll.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(payload)
+        os.replace(tmp_path, coll.path)
+        return True
+
+    def save_hotstart(self, collections):
+        # La base SQLite se charge déjà sans analyse des fichiers JSON
+        pass
+
+    def import_json_files(self, store):
+        """Réimporte les fichiers JSON existants de toutes les collections d'un DataStore."""
+        imported = []
+        with self.batch():
+            for name in store.names():
+                coll = store.collection(name)
+                if not os.path.exists(coll.path):
+                    continue
+                with open(coll.path, "r") as f:
+                    data = codec.loads(f.read())
+                self._store(name, _kind(data), _rows(data))
+                imported.append(coll.filename)
+        return imported
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
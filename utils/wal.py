@@ -0,0 +1,260 @@
+"""
+Journal d'écriture anticipée (WAL) des soldes.
+
+Chaque modification des soldes est ajoutée au journal sous forme d'une petite
+entrée numérotée contenant les nouvelles valeurs des comptes touchés. Le
+fichier complet des soldes n'est réécrit qu'aux points de contrôle
+périodiques ; au démarrage, les entrées restantes sont rejouées par-dessus.
+Les valeurs étant absolues, rejouer une entrée déjà incluse dans le point de
+contrôle est sans effet.
+
+Le journal reste local : il n'est jamais envoyé dans json_backups, où une
+copie périmée serait rejouée par-dessus un balances.json plus récent. Les
+entrées sont écrites aussitôt (un arrêt du processus ne perd rien) et forcées
+sur le disque par groupes : les ajouts rapprochés partagent un seul fsync,
+fait hors de la boucle d'événements.
+"""
+import asyncio
+import os
+import threading
+
+from utils import codec
+
+_MISSING = object()
+
+
+def trim_torn_tail(path):
+    """
+    Coupe la dernière ligne d'un fichier si elle n'est pas terminée par un saut de ligne.
+
+    Un arrêt brutal peut laisser une entrée à moitié écrite : sans cette coupe,
+    l'entrée suivante serait collée au fragment et illisible. Retourne le nombre d'octets retirés.
+    """
+    try:
+        with open(path, "r+b") as f:
+            size = f.seek(0, os.SEEK_END)
+            if not size:
+                return 0
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return 0
+            f.seek(0)
+            keep = f.read().rfind(b"\n") + 1
+            f.truncate(keep)
+            f.flush()
+            os.fsync(f.fileno())
+    except FileNotFoundError:
+        return 0
+    print(f"[WAL] Fin tronquée retirée de {os.path.basename(path)} ({size - keep} octet(s))")
+    return size - keep
+
+
+class TrackedDict(dict):
+    """Dictionnaire qui retient les clés modifiées depuis la dernière lecture de `take_changes()`."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.changed = set()
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.changed.add(key)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.changed.add(key)
+
+    def pop(self, key, default=_MISSING):
+        if key in self:
+            self.changed.add(key)
+        if default is _MISSING:
+            return super().pop(key)
+        return super().pop(key, default)
+
+    def popitem(self):
+        key, value = super().popitem()
+        self.changed.add(key)
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self.changed.add(key)
+        return super().setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        other = dict(*args, **kwargs)
+        super().update(other)
+        self.changed.update(other)
+
+    def clear(self):
+        self.changed.update(self.keys())
+        super().clear()
+
+    def take_changes(self):
+        """Retourne et oublie les clés modifiées."""
+        changed, self.changed = self.changed, set()
+        return changed
+
+
+class BalanceWAL:
+    """Journal `<nom>.wal` ; pendant un point de contrôle, l'ancien journal devient `<nom>.wal.old`."""
+
+    def __init__(self, path, sync_delay=0.05):
+        self.path = path
+        self.old_path = path + ".old"
+        # Délai (en secondes) pendant lequel les ajouts sont regroupés avant un fsync
+        self.sync_delay = sync_delay
+        self.next_seq = 1
+        self.pending = 0
+        self._file = None
+        self._unsynced = False
+        self._sync_scheduled = False
+        self._lock = threading.Lock()
+        self._checkpoint_lock = threading.Lock()
+
+    def _read(self, path):
+        trim_torn_tail(path)
+        entries = []
+        try:
+            with open(path, "rb") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        entries.append(codec.loads(line))
+                    except ValueError:
+                        # Entrée tronquée par un arrêt brutal : tout ce qui précède reste valable
+                        print(f"[WAL] Entrée illisible ignorée dans {os.path.basename(path)}")
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def replay(self, data):
+        """Rejoue le journal sur les données chargées du dernier point de contrôle. Retourne le nombre d'entrées."""
+        entries = self._read(self.old_path) + self._read(self.path)
+        for entry in entries:
+            for key, value in entry.get("set", {}).items():
+                dict.__setitem__(data, key, value)
+            for key in entry.get("del", []):
+                dict.pop(data, key, None)
+        if entries:
+            self.next_seq = entries[-1]["seq"] + 1
+        self.pending = len(entries)
+        return len(entries)
+
+    def append(self, data):
+        """Enregistre les comptes modifiés de `data` (un TrackedDict). Retourne le numéro d'entrée ou None."""
+        changed = data.take_changes()
+        if not changed:
+            return None
+        entry = {"seq": None, "set": {}, "del": []}
+        for key in changed:
+            value = data.get(key, _MISSING)
+            if value is _MISSING:
+                entry["del"].append(key)
+            else:
+                entry["set"][key] = value
+        with self._lock:
+            entry["seq"] = self.next_seq
+            self.next_seq += 1
+            if self._file is None:
+                # Journal ouvert sans `replay` préalable : on ne complète jamais une entrée tronquée
+                trim_torn_tail(self.path)
+                self._file = open(self.path, "a")
+            self._file.write(codec.dumps(entry) + "\n")
+            self._file.flush()
+            self._unsynced = True
+            self.pending += 1
+        self._schedule_sync()
+        return entry["seq"]
+
+    def _schedule_sync(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Hors de la boucle (démarrage, arrêt, scripts) : fsync immédiat
+            self.sync()
+            return
+        if not self._sync_scheduled:
+            self._sync_scheduled = True
+            loop.create_task(self._syncer())
+
+    async def _syncer(self):
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.sleep(self.sync_delay)
+            await loop.run_in_executor(None, self.sync)
+        except Exception as e:
+            print(f"[WAL] Erreur lors de la synchronisation de {os.path.basename(self.path)} : {e}")
+        finally:
+            self._sync_scheduled = False
+            if self._unsynced:
+                # Entrées ajoutées pendant le fsync
+                self._schedule_sync()
+
+    def sync(self):
+        """Force sur le disque les entrées écrites (appel bloquant). Retourne False s'il n'y avait rien à faire."""
+        with self._lock:
+            if not self._unsynced or self._file is None:
+                # Fichier fermé par une bascule : ses entrées sont reprises par le point de contrôle
+                self._unsynced = False
+                return False
+            self._unsynced = False
+            # Descripteur dupliqué : le fsync se fait sans bloquer les ajouts ni gêner une bascule
+            fd = os.dup(self._file.fileno())
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        return True
+
+    def rotate(self):
+        """
+        Bascule le journal : les entrées suivantes vont dans un nouveau fichier.
+
+        À appeler juste après avoir copié les soldes, sans modification entre les deux.
+        Retourne le nombre d'entrées absorbées, à passer à `complete`.
+        """
+        with self._lock:
+            absorbed = self.pending
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if os.path.exists(self.path):
+                if os.path.exists(self.old_path):
+                    # Point de contrôle précédent échoué : on complète l'ancien journal
+                    with open(self.path, "rb") as src, open(self.old_path, "ab") as dst:
+                        dst.write(src.read())
+                    os.remove(self.path)
+                else:
+                    os.replace(self.path, self.old_path)
+            self.pending = 0
+            return absorbed
+
+    def complete(self, absorbed, write_full):
+        """Écrit le fichier complet via `write_full()` (appel bloquant) puis supprime l'ancien journal."""
+        try:
+            write_full()
+        except Exception:
+            # Le fichier complet n'est pas à jour : l'ancien journal reste à rejouer
+            with self._lock:
+                self.pending += absorbed
+            raise
+        if os.path.exists(self.old_path):
+            os.remove(self.old_path)
+        return absorbed
+
+    def checkpoint(self, write_full):
+        """
+        Point de contrôle : bascule le journal, écrit le fichier complet via `write_full()`
+        (appel bloquant) puis supprime l'ancien journal. Retourne le nombre d'entrées absorbées.
+        """
+        with self._checkpoint_lock:
+            return self.complete(self.rotate(), write_full)
+
+    def close(self):
+        self.sync()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,82 @@
+"""
+Accumulateur des gains d'XP.
+
+Les messages mettent à jour les niveaux en mémoire (passages de niveau
+compris) ; la sauvegarde des tables de niveaux n'est demandée qu'à
+intervalle régulier ou quand assez de membres ont gagné de l'XP depuis la
+dernière.
+"""
+import os
+
+XP_FLUSH_INTERVAL = int(os.getenv("XP_FLUSH_INTERVAL", "15"))
+XP_FLUSH_THRESHOLD = int(os.getenv("XP_FLUSH_THRESHOLD", "200"))
+
+
+class XPAccumulator:
+    """Gains en attente par membre ; `save` est appelé au moment de la sauvegarde groupée."""
+
+    def __init__(self, save, threshold=XP_FLUSH_THRESHOLD):
+        self.save = save
+        self.threshold = threshold
+        self.pending = {}
+        self.flushes = 0
+
+    def add(self, user_id, xp):
+        """Enregistre un gain déjà appliqué en mémoire ; sauvegarde si le seuil est atteint."""
+        self.pending[user_id] = self.pending.get(user_id, 0) + xp
+        if len(self.pending) >= self.threshold:
+            self.flush()
+
+    def flush(self):
+        """Demande la sauvegarde si des gains sont en attente. Retourne le nombre de membres concernés."""
+        if not self.pending:
+            return 0
+        count = len(self.pending)
+        self.pending = {}
+        self.flushes += 1
+        self.save()
+        return count
+
+
+class XPBonusCache:
+    """
+    Bonus de grade et rôle spécial de chaque membre, calculés une fois par jeu de rôles.
+
+    `palier_roles` : {palier: id du rôle}, dans l'ordre des paliers ; le i-ème
+    grade possédé rapporte i XP par message. Le cache est tenu à jour par les
+    changements de rôles (`on_member_update`) et vidé au départ du membre.
+    """
+
+    def __init__(self, palier_roles, special_role_id):
+        self.weights = {role_id: i for i, role_id in enumerate(palier_roles.values(), start=1)}
+        self.special_role_id = special_role_id
+        self._cache = {}
+
+    def compute(self, role_ids):
+        """(bonus_grade, has_special) pour un ensemble d'IDs de rôles."""
+        weights = self.weights
+        bonus_grade = sum(weights.get(role_id, 0) for role_id in role_ids)
+        return bonus_grade, self.special_role_id in role_ids
+
+    def get(self, member):
+        """Bonus d'un membre : simple lecture du cache après le premier message."""
+        key = (member.guild.id, member.id)
+        cached = self._cache.get(key)
+        if cached is None:
+            cached = self._cache[key] = self.compute({role.id for role in member.roles})
+        return cached
+
+    def update(self, member, before_roles, after_roles):
+        """Met à jour un membre déjà en cache si ses grades ou son rôle spécial ont changé."""
+        key = (member.guild.id, member.id)
+        if key not in self._cache:
+            return
+        changed = before_roles ^ after_roles
+        if changed and (self.special_role_id in changed or any(role_id in self.weights for role_id in changed)):
+            self._cache[key] = self.compute(after_roles)
+
+    def evict(self, guild_id, member_id):
+        self._cache.pop((guild_id, member_id), None)
+
+    def __len__(self):
+        return len(self._cache)